@@ -0,0 +1,96 @@
+"""
+Elasticsearch-backed search and counts for the Django admin.
+"""
+from django.core.paginator import Paginator
+
+from .registries import registry
+
+
+class DocumentCountPaginator(Paginator):
+    """
+    Paginator counting the rows of an unfiltered changelist with the
+    number of documents of ``document`` in elasticsearch, instead of a
+    ``COUNT(*)``.
+
+    The count is an estimate: it doesn't include the rows not indexed yet,
+    or excluded by the ``get_queryset`` of the document. The filtered
+    changelists are still counted by the database.
+    """
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, document=None):
+        super(DocumentCountPaginator, self).__init__(
+            object_list, per_page, orphans, allow_empty_first_page
+        )
+        self.document = document
+        self._count = None
+
+    @property
+    def count(self):
+        if self._count is None:
+            if self.document is not None and not self.object_list.query.where:
+                self._count = self.document.search().count()
+            else:
+                self._count = self.object_list.count()
+        return self._count
+
+
+class DocumentSearchMixin(object):
+    """
+    ``ModelAdmin`` mixin searching the changelist with the document of the
+    model registered in elasticsearch, instead of ``icontains`` lookups.
+
+    The search term is matched against ``search_document_fields`` (all the
+    fields of the document by default) and the queryset is narrowed to the
+    ``search_max_hits`` best hits.
+    """
+    search_document = None
+    search_document_fields = None
+    search_max_hits = 1000
+    paginator = DocumentCountPaginator
+    # Counting the whole table on each page would defeat the paginator
+    show_full_result_count = False
+
+    def get_search_document(self):
+        """
+        Return the document searched, ``search_document`` or the document
+        of the model in the registry.
+        """
+        if self.search_document is not None:
+            return self.search_document
+        documents = sorted(
+            registry.get_documents([self.model]), key=lambda d: d.__name__
+        )
+        return documents[0] if documents else None
+
+    def get_search_query(self, search, search_term):
+        """
+        Return ``search`` filtered by ``search_term``.
+        """
+        query = {'query': search_term, 'lenient': True}
+        if self.search_document_fields:
+            query['fields'] = list(self.search_document_fields)
+        return search.query('multi_match', **query)
+
+    def get_search_results(self, request, queryset, search_term):
+        document = self.get_search_document()
+        if not search_term or document is None:
+            return super(DocumentSearchMixin, self).get_search_results(
+                request, queryset, search_term
+            )
+
+        s = self.get_search_query(document.search(), search_term)
+        response = s[:self.search_max_hits].source(
+            excludes=['*']
+        ).raw(as_dict=True).execute()
+        return queryset.filter(pk__in=response._get_ids()), False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        if not issubclass(self.paginator, DocumentCountPaginator):
+            return super(DocumentSearchMixin, self).get_paginator(
+                request, queryset, per_page, orphans, allow_empty_first_page
+            )
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            document=self.get_search_document()
+        )
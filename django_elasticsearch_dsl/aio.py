@@ -0,0 +1,240 @@
+"""
+Asyncio counterparts of the search and bulk API (Python 3.6+).
+
+The requests are sent with the ``AsyncElasticsearch`` client of the
+``elasticsearch-async`` package, which keeps a pool of aiohttp connections.
+The documents are prepared and serialized by the same code as the blocking
+API, in a worker thread so the database queries don't block the event loop.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer
+
+from django import db
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from elasticsearch.helpers import BulkIndexError, expand_action
+
+from .cache import get_search_hash
+from .metrics import record_search
+from .registries import registry
+from .tracing import span
+from .utils import get_doc_type
+
+
+class AsyncConnections(object):
+    """
+    The ``AsyncElasticsearch`` clients, configured like the blocking ones
+    with ``ELASTICSEARCH_DSL``.
+    """
+    def __init__(self):
+        self._conns = {}
+
+    def add_connection(self, alias, conn):
+        self._conns[alias] = conn
+
+    def remove_connection(self, alias):
+        return self._conns.pop(alias)
+
+    def get_connection(self, alias='default'):
+        if alias not in self._conns:
+            try:
+                from elasticsearch_async import AsyncElasticsearch
+            except ImportError:
+                raise ImproperlyConfigured(
+                    "The asyncio API requires the elasticsearch-async package"
+                )
+            self._conns[alias] = AsyncElasticsearch(
+                **settings.ELASTICSEARCH_DSL[alias]
+            )
+        return self._conns[alias]
+
+    async def close(self):
+        """
+        Close the connection pools of the clients.
+        """
+        for alias in list(self._conns):
+            await self.remove_connection(alias).transport.close()
+
+
+connections = AsyncConnections()
+
+
+def _chunk_actions(actions, chunk_size, serializer):
+    chunk = []
+    for action in actions:
+        op, data = expand_action(action)
+        chunk.append(serializer.dumps(op))
+        if data is not None:
+            chunk.append(serializer.dumps(data))
+        if len(chunk) >= chunk_size * 2:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _close_connections():
+    for connection in db.connections.all():
+        connection.close()
+
+
+async def bulk(client, actions, chunk_size=500, max_concurrency=4,
+               raise_on_error=True, **kwargs):
+    """
+    Send the bulk ``actions`` by chunks of ``chunk_size``, with at most
+    ``max_concurrency`` requests in flight, and return the number of
+    successful actions and the list of errors, like
+    ``elasticsearch.helpers.bulk``.
+
+    The actions are prepared and serialized one chunk at a time in a worker
+    thread, as the requests complete.
+    """
+    loop = asyncio.get_event_loop()
+    chunks = _chunk_actions(actions, chunk_size, client.transport.serializer)
+    # A single thread, the database cursors of a queryset can't be shared
+    # between threads.
+    executor = ThreadPoolExecutor(max_workers=1)
+    results = []
+
+    async def consume():
+        while True:
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+            if chunk is None:
+                return
+            response = await client.bulk('\n'.join(chunk) + '\n', **kwargs)
+            errors = []
+            for item in response['items']:
+                op_type, result = item.popitem()
+                if not 200 <= result.get('status', 500) < 300:
+                    errors.append({op_type: result})
+            results.append((len(response['items']) - len(errors), errors))
+
+    consumers = [
+        asyncio.ensure_future(consume()) for _ in range(max_concurrency)
+    ]
+    try:
+        await asyncio.gather(*consumers)
+    finally:
+        for consumer in consumers:
+            consumer.cancel()
+        executor.submit(_close_connections)
+        executor.shutdown(wait=False)
+
+    success = sum(count for count, errors in results)
+    errors = [error for count, errors in results for error in errors]
+    if errors and raise_on_error:
+        raise BulkIndexError(
+            '%i document(s) failed to index.' % len(errors), errors
+        )
+    return success, errors
+
+
+async def update(doc_instance, thing, refresh=None, action='index',
+                 **kwargs):
+    """
+    Asyncio counterpart of ``DocType.update``.
+    """
+    actions = doc_instance._get_actions(
+        doc_instance._get_object_list(thing), action
+    )
+    refresh = doc_instance._get_refresh_policy(refresh)
+    if refresh is True or refresh == 'wait_for':
+        kwargs['refresh'] = refresh
+
+    result = await bulk(
+        connections.get_connection(doc_instance._doc_type.using),
+        actions,
+        **kwargs
+    )
+    doc_instance._after_send(refresh)
+    return result
+
+
+async def _search(search):
+    es = connections.get_connection(search._using)
+
+    async def send():
+        start = default_timer()
+        data = await es.search(
+            index=search._index,
+            doc_type=get_doc_type(search),
+            body=search.to_dict(),
+            **search._params
+        )
+        elapsed = default_timer() - start
+        if registry.metrics is not None:
+            record_search(registry.metrics, search, data, elapsed)
+        if registry.slow_log is not None:
+            registry.slow_log.record(search, elapsed)
+        return data
+
+    if registry.single_flight is None:
+        return await send()
+
+    # The leader waits in a thread of the executor for the request sent by
+    # the event loop, so the identical searches of the other threads and
+    # coroutines share it.
+    loop = asyncio.get_event_loop()
+    return await registry.single_flight.do_async(
+        get_search_hash(search),
+        lambda: asyncio.run_coroutine_threadsafe(send(), loop).result(),
+        loop=loop
+    )
+
+
+async def execute(search):
+    """
+    Asyncio counterpart of ``Search.execute``.
+    """
+    index = ','.join(search._index) if search._index else '_all'
+    with span('ded.search.execute', index=index,
+              cached=False) as search_span:
+        search_cache = registry.search_cache if search._cached else None
+        data = None
+        if search_cache is not None:
+            key = search_cache.get_key(search)
+            data = search_cache.get(key)
+            search_span.set_attribute('cached', data is not None)
+
+        if data is None:
+            data = await _search(search)
+            if search_cache is not None:
+                search_cache.set(key, data, search._cache_timeout)
+
+        search._response = search._response_class(search, data)
+        search_span.set_attribute('hits', data['hits']['total'])
+        search_span.set_attribute('took', data.get('took'))
+
+    return search._response
+
+
+async def iterate(search, scroll='5m', size=1000, preserve_order=False):
+    """
+    Asyncio counterpart of ``Search.scan``: iterate over all the hits with
+    the scroll API, in index order unless ``preserve_order`` is set.
+    """
+    es = connections.get_connection(search._using)
+    body = search.to_dict()
+    if not preserve_order:
+        body['sort'] = '_doc'
+    response = await es.search(
+        index=search._index,
+        doc_type=get_doc_type(search),
+        body=body,
+        scroll=scroll,
+        size=size,
+        **search._params
+    )
+    scroll_id = response.get('_scroll_id')
+    try:
+        while response['hits']['hits']:
+            for hit in response['hits']['hits']:
+                yield search._get_result(hit)
+            response = await es.scroll(scroll_id=scroll_id, scroll=scroll)
+            scroll_id = response.get('_scroll_id')
+    finally:
+        if scroll_id:
+            await es.clear_scroll(
+                body={'scroll_id': [scroll_id]}, ignore=(404,)
+            )
@@ -1,5 +1,6 @@
 from django.apps import AppConfig
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 from elasticsearch_dsl.connections import connections
 
@@ -24,6 +25,86 @@ class DEDConfig(AppConfig):
             signal_processor_class = import_class(signal_processor_path)
             self.signal_processor = signal_processor_class(connections)
 
+        from .registries import registry
+
+        breaker_settings = self.circuit_breaker_settings()
+        if breaker_settings is not None:
+            from .breaker import CircuitBreaker, Spool
+
+            breaker_settings = dict(breaker_settings)
+            if 'spool_dir' not in breaker_settings:
+                raise ImproperlyConfigured(
+                    "ELASTICSEARCH_DSL_CIRCUIT_BREAKER requires a "
+                    "'spool_dir'"
+                )
+            spool = Spool(
+                breaker_settings.pop('spool_dir'),
+                max_bytes=breaker_settings.pop(
+                    'max_spool_bytes', 64 * 1024 * 1024
+                )
+            )
+            registry.circuit_breaker = CircuitBreaker(
+                spool, **breaker_settings
+            )
+
+        rate_limit_settings = self.rate_limit_settings()
+        if rate_limit_settings is not None:
+            from .ratelimit import RateLimiter
+
+            registry.rate_limiter = RateLimiter(
+                circuit_breaker=registry.circuit_breaker,
+                **rate_limit_settings
+            )
+
+        search_cache_settings = self.search_cache_settings()
+        if search_cache_settings is not None:
+            from .cache import SearchCache
+
+            search_cache_settings = dict(search_cache_settings)
+            backend_class = import_class(search_cache_settings.pop(
+                'backend', 'django_elasticsearch_dsl.cache.LRUCache'
+            ))
+            registry.search_cache = SearchCache(
+                backend_class(**search_cache_settings.pop('options', {})),
+                **search_cache_settings
+            )
+
+        single_flight_settings = self.single_flight_settings()
+        if single_flight_settings is not None:
+            from .singleflight import SingleFlight
+
+            registry.single_flight = SingleFlight(**single_flight_settings)
+
+        metrics_settings = self.metrics_settings()
+        if metrics_settings is not None:
+            metrics_settings = dict(metrics_settings)
+            exporter_class = import_class(metrics_settings.pop(
+                'exporter', 'django_elasticsearch_dsl.metrics.InMemoryExporter'
+            ))
+            registry.metrics = exporter_class(
+                **metrics_settings.pop('options', {})
+            )
+
+        slow_log_settings = self.slow_log_settings()
+        if slow_log_settings is not None:
+            from .slowlog import SlowLog
+
+            slow_log_settings = dict(slow_log_settings)
+            backend = None
+            if 'backend' in slow_log_settings:
+                backend = import_class(slow_log_settings.pop('backend'))(
+                    **slow_log_settings.pop('options', {})
+                )
+            registry.slow_log = SlowLog(backend, **slow_log_settings)
+
+        tracing_settings = self.tracing_settings()
+        if tracing_settings is not None:
+            tracing_settings = dict(tracing_settings)
+            tracer_class = import_class(tracing_settings.pop('tracer'))
+            registry.tracer = tracer_class(
+                **tracing_settings.pop('options', {})
+            )
+
     @classmethod
     def autosync_enabled(cls):
         return getattr(settings, 'ELASTICSEARCH_DSL_AUTOSYNC', True)
@@ -35,3 +116,45 @@ class DEDConfig(AppConfig):
     @classmethod
     def auto_refresh_enabled(cls):
         return getattr(settings, 'ELASTICSEARCH_DSL_AUTO_REFRESH', True)
+
+    @classmethod
+    def refresh_interval(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_REFRESH_INTERVAL', 1.0)
+
+    @classmethod
+    def circuit_breaker_settings(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_CIRCUIT_BREAKER', None)
+
+    @classmethod
+    def debounce_settings(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_DEBOUNCE', {})
+
+    @classmethod
+    def rate_limit_settings(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_RATE_LIMIT', None)
+
+    @classmethod
+    def search_cache_settings(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_SEARCH_CACHE', None)
+
+    @classmethod
+    def single_flight_settings(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_SINGLE_FLIGHT', None)
+
+    @classmethod
+    def metrics_settings(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_METRICS', None)
+
+    @classmethod
+    def slow_log_settings(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_SLOW_LOG', None)
+
+    @classmethod
+    def tracing_settings(cls):
+        return getattr(settings, 'ELASTICSEARCH_DSL_TRACING', None)
+
+    @classmethod
+    def case_ordering_max_hits(cls):
+        return getattr(
+            settings, 'ELASTICSEARCH_DSL_CASE_ORDERING_MAX_HITS', 100
+        )
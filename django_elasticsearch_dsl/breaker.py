@@ -0,0 +1,377 @@
+"""
+Circuit breaker for the realtime write path of the registry.
+
+After ``failure_threshold`` consecutive connection failures the breaker
+opens: the updates are not sent to elasticsearch anymore but prepared and
+appended to a local spool. A background thread replays the spool when the
+cluster is reachable again and then closes the breaker.
+"""
+import errno
+import io
+import json
+import logging
+import os
+import re
+import threading
+
+from django.utils import six
+from elasticsearch.exceptions import ConnectionError, TransportError
+from elasticsearch.helpers import bulk
+from elasticsearch_dsl.connections import connections
+
+from .registries import registry
+
+
+logger = logging.getLogger(__name__)
+
+
+def _is_alive(pid):
+    if os.name != 'posix':
+        # os.kill would terminate the process
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class Spool(object):
+    """
+    Append-only NDJSON spool of bulk actions.
+
+    The actions are written in segment files of at most ``max_bytes`` in
+    ``directory``, and replayed in the order they were written. The segments
+    are named after the pid of the process writing them, so the processes
+    sharing ``directory`` don't mix their segments. The segments left by the
+    processes which are not running anymore are adopted (renamed) by the
+    first process which finds them, and replayed with its own.
+
+    The lines which can't be parsed (written by a process killed during a
+    write...) are moved to ``rejected-<pid>.ndjson`` and not replayed.
+    """
+    segment_pattern = re.compile(r'^spool-(?:(\d+)-)?(\d+)\.ndjson$')
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        segments = self.segments()
+        self._current = self._get_number(segments[-1]) if segments else 0
+        self.adopt_orphans()
+
+    @property
+    def pid(self):
+        # Not cached, the spool can be created before a fork
+        return os.getpid()
+
+    def _parse(self, path):
+        match = self.segment_pattern.match(os.path.basename(path))
+        pid = match.group(1)
+        return int(pid) if pid is not None else None, int(match.group(2))
+
+    def _get_number(self, path):
+        return self._parse(path)[1]
+
+    def _get_path(self, number):
+        return os.path.join(
+            self.directory, 'spool-{}-{:010d}.ndjson'.format(self.pid, number)
+        )
+
+    def _list(self):
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if self.segment_pattern.match(name)
+        ]
+
+    def segments(self):
+        """
+        Return the paths of the segment files of the process, oldest first.
+        """
+        return sorted(
+            (path for path in self._list()
+             if self._parse(path)[0] == self.pid),
+            key=self._get_number
+        )
+
+    def adopt_orphans(self):
+        """
+        Rename the segments of the processes which are not running anymore
+        as segments of this process, after its current segment.
+        """
+        orphans = []
+        for path in self._list():
+            pid, number = self._parse(path)
+            if pid != self.pid and (pid is None or not _is_alive(pid)):
+                orphans.append((pid or 0, number, path))
+
+        for _, _, path in sorted(orphans):
+            self._current += 1
+            try:
+                os.rename(path, self._get_path(self._current))
+            except OSError:
+                # Adopted by another process
+                continue
+
+    def is_empty(self):
+        return not self.segments()
+
+    def rotate(self):
+        """
+        Close the current segment, the next writes go to a new one.
+        """
+        self._current += 1
+
+    def write(self, lines):
+        """
+        Append the serialized ``lines`` to the current segment.
+        """
+        path = self._get_path(self._current)
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            self.rotate()
+            path = self._get_path(self._current)
+
+        with io.open(path, 'ab') as spool_file:
+            for line in lines:
+                if isinstance(line, six.text_type):
+                    line = line.encode('utf-8')
+                spool_file.write(line + b'\n')
+
+    def read(self, path):
+        """
+        Yield the entries of the segment file at ``path``, rejecting the
+        lines which can't be parsed.
+        """
+        with io.open(path, 'rb') as spool_file:
+            for line in spool_file:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line.decode('utf-8'))
+                except ValueError:
+                    self.reject(line)
+
+    def reject(self, line):
+        """
+        Move an invalid ``line`` of a segment to the rejected lines file.
+        """
+        path = os.path.join(
+            self.directory, 'rejected-{}.ndjson'.format(self.pid)
+        )
+        logger.warning("Invalid spool line moved to %s: %r", path, line)
+        if isinstance(line, six.text_type):
+            line = line.encode('utf-8')
+        with io.open(path, 'ab') as rejected_file:
+            rejected_file.write(line.rstrip(b'\n') + b'\n')
+
+
+class CircuitBreaker(object):
+    """
+    Send the updates of the registry to elasticsearch, or to the ``spool``
+    while the cluster is unreachable.
+
+    The spool is replayed in bulk requests of at most ``replay_batch_size``
+    actions, each waiting for the limits of ``registry.rate_limiter`` if
+    any.
+    """
+    replay_batch_size = 500
+
+    def __init__(self, spool, failure_threshold=5, reset_timeout=30.0):
+        self.spool = spool
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._lock = threading.RLock()
+        # A single replay at a time
+        self._replay_lock = threading.Lock()
+        self._replayer = None
+        self._spilling = False
+        self._stopped = threading.Event()
+        # Updates spooled by a previous process must be replayed before
+        # sending new ones.
+        self._open = not spool.is_empty()
+        if self._open:
+            self._start_replayer()
+
+    @property
+    def is_open(self):
+        return self._open
+
+    @property
+    def is_spilling(self):
+        """
+        ``True`` from a ``spill`` until the spool is replayed.
+        """
+        return self._spilling
+
+    def send(self, doc_instance, actions, **kwargs):
+        """
+        Send the prepared bulk ``actions`` of ``doc_instance``, or append
+        them to the spool if the breaker is open or updates were spilled (a
+        spooled update must not overwrite a more recent one when it is
+        replayed).
+        """
+        if not self._open and not self._spilling:
+            try:
+                result = doc_instance._send_actions(actions, **kwargs)
+            except ConnectionError:
+                if not self.record_failure():
+                    raise
+            else:
+                self._failures = 0
+                return result
+
+        with self._lock:
+            if self._open or self._spilling:
+                self._write(doc_instance, actions)
+                return None
+
+        return self.send(doc_instance, actions, **kwargs)
+
+    def spill(self, doc_instance, actions):
+        """
+        Append the prepared bulk ``actions`` to the spool without trying to
+        send them, to be replayed right away. The breaker stays closed, but
+        the next updates are spooled too until the spool is replayed, so they
+        are sent in order.
+        """
+        with self._lock:
+            self._write(doc_instance, actions)
+            self._spilling = True
+            self._start_replayer()
+
+    def _write(self, doc_instance, actions):
+        using = doc_instance._doc_type.using
+        serializer = connections.get_connection(using).transport.serializer
+        self.spool.write([
+            serializer.dumps({'using': using, 'action': action})
+            for action in actions
+        ])
+
+    def record_failure(self):
+        """
+        Count a connection failure and return ``True`` if the breaker is
+        open.
+        """
+        with self._lock:
+            self._failures += 1
+            if not self._open and self._failures >= self.failure_threshold:
+                logger.warning(
+                    "Elasticsearch unreachable after %s failures, spooling "
+                    "the updates to %s",
+                    self._failures, self.spool.directory
+                )
+                self._open = True
+                self._start_replayer()
+            return self._open
+
+    def _start_replayer(self):
+        if self._replayer is None or not self._replayer.is_alive():
+            self._stopped.clear()
+            self._replayer = threading.Thread(target=self._run)
+            self._replayer.daemon = True
+            self._replayer.start()
+
+    def _run(self):
+        # Spilled updates are replayed right away, the cluster is reachable
+        timeout = self.reset_timeout if self._open else 0
+        while not self._stopped.wait(timeout):
+            timeout = self.reset_timeout
+            try:
+                if self.replay():
+                    return
+            except Exception:
+                logger.exception(
+                    "Replay of the spool failed, retrying in %s seconds",
+                    self.reset_timeout
+                )
+
+    def stop(self):
+        """
+        Stop the background replayer.
+        """
+        self._stopped.set()
+
+    def replay(self):
+        """
+        Send the spooled updates to elasticsearch and close the breaker once
+        the spool is empty. Return ``True`` if the breaker is closed.
+        """
+        with self._replay_lock:
+            return self._replay()
+
+    def _replay(self):
+        while True:
+            # The segments written during the previous pass are replayed
+            # right away, the breaker closes once the spool is empty.
+            with self._lock:
+                self.spool.adopt_orphans()
+                self.spool.rotate()
+                segments = self.spool.segments()
+                if not segments:
+                    if self._open:
+                        logger.info("Spool replayed, circuit breaker closed")
+                    self._open = False
+                    self._spilling = False
+                    self._failures = 0
+                    # A spill after this point starts a new replayer
+                    self._replayer = None
+                    return True
+
+            try:
+                for path in segments:
+                    self._replay_segment(path)
+                    os.remove(path)
+            except TransportError:
+                logger.info(
+                    "Elasticsearch still unreachable, replay postponed"
+                )
+                return False
+
+    def _get_batches(self, actions):
+        # Consecutive actions of the same index, so the replay goes through
+        # the limits of the index.
+        batch = []
+        for action in actions:
+            if batch and (
+                    len(batch) >= self.replay_batch_size or
+                    action.get('_index') != batch[0].get('_index')):
+                yield batch
+                batch = []
+            batch.append(action)
+        if batch:
+            yield batch
+
+    def _replay_segment(self, path):
+        actions = {}
+        for entry in self.spool.read(path):
+            if not isinstance(entry, dict) or \
+                    not isinstance(entry.get('action'), dict):
+                self.spool.reject(json.dumps(entry))
+                continue
+            actions.setdefault(entry.get('using', 'default'), []).append(
+                entry['action']
+            )
+
+        for using, using_actions in six.iteritems(actions):
+            client = connections.get_connection(using)
+            for batch in self._get_batches(using_actions):
+                if registry.rate_limiter is not None:
+                    registry.rate_limiter.acquire(
+                        batch[0].get('_index'), batch,
+                        client.transport.serializer
+                    )
+                bulk(client=client, actions=batch, raise_on_error=False)
+
+        if registry.search_cache is not None:
+            indices = set(
+                action.get('_index')
+                for using_actions in six.itervalues(actions)
+                for action in using_actions
+            )
+            for index in indices - {None}:
+                registry.search_cache.invalidate(index)
@@ -0,0 +1,166 @@
+"""
+Cache of the responses of ``Search.execute``, invalidated per index by the
+writes of the documents.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from django.utils.six import string_types
+from django.utils.six.moves import cPickle as pickle
+
+from .utils import get_doc_type
+
+
+def get_search_hash(search, **extra):
+    """
+    Return a hash of the request sent by ``search``, which doesn't depend on
+    the order of the keys of its body.
+    """
+    data = {
+        'using': search._using,
+        'index': sorted(search._index or []),
+        'doc_type': sorted(get_doc_type(search)),
+        'body': search.to_dict(),
+        'params': search._params,
+    }
+    data.update(extra)
+    return hashlib.sha1(json.dumps(
+        data, sort_keys=True, separators=(',', ':'), default=str
+    ).encode('utf-8')).hexdigest()
+
+
+class LRUCache(object):
+    """
+    In-process cache of at most ``max_entries`` entries, the least recently
+    used entries are evicted first.
+
+    Like the local memory cache of Django, the values are stored pickled, so
+    a change of a returned value (a hit of a cached response...) isn't seen
+    by the next ``get``.
+    """
+    def __init__(self, max_entries=1000, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires = self._entries.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires <= self.clock():
+                return default
+            self._entries[key] = (value, expires)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        expires = None if timeout is None else self.clock() + timeout
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCache(object):
+    """
+    Cache stored in the ``alias`` Django cache, shared by the processes.
+    """
+    def __init__(self, alias='default'):
+        from django.core.cache import caches
+
+        self.cache = caches[alias]
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default)
+
+    def set(self, key, value, timeout=None):
+        self.cache.set(key, value, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class SearchCache(object):
+    """
+    Cache the raw responses of the searches in ``backend`` for ``timeout``
+    seconds.
+
+    The key of a search is a hash of its body, parameters and indices, and
+    of the generation of these indices. ``invalidate`` replaces the
+    generation of an index by a new random one, so the cached responses of
+    the searches on this index are not used anymore (even if the generation
+    is evicted from the backend). The searches on all the indices (or with
+    a wildcard) use a global generation replaced by every invalidation.
+    """
+    all_indices = '_all'
+
+    def __init__(self, backend=None, timeout=60, key_prefix='ded:search'):
+        self.backend = backend if backend is not None else LRUCache()
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    def _get_generation_key(self, index):
+        return '{}:generation:{}'.format(self.key_prefix, index)
+
+    def _get_indices(self, search):
+        index = search._index
+        if not index:
+            return [self.all_indices]
+        indices = [index] if isinstance(index, string_types) else index
+        indices = [i for name in indices for i in name.split(',')]
+        if any('*' in name or name == self.all_indices for name in indices):
+            indices.append(self.all_indices)
+        return sorted(set(indices))
+
+    def _get_generation(self, index):
+        key = self._get_generation_key(index)
+        generation = self.backend.get(key)
+        if generation is None:
+            generation = self._new_generation(index)
+        return generation
+
+    def _new_generation(self, index):
+        generation = uuid.uuid4().hex
+        self.backend.set(self._get_generation_key(index), generation, None)
+        return generation
+
+    def get_key(self, search):
+        generations = [
+            self._get_generation(index)
+            for index in self._get_indices(search)
+        ]
+        return '{}:{}'.format(
+            self.key_prefix, get_search_hash(search, generations=generations)
+        )
+
+    def get(self, key):
+        """
+        Return the cached raw response with the ``key`` of a search, or
+        ``None``.
+        """
+        return self.backend.get(key)
+
+    def set(self, key, response, timeout=None):
+        self.backend.set(
+            key, response, self.timeout if timeout is None else timeout
+        )
+
+    def invalidate(self, index):
+        """
+        Forget the cached responses of the searches on ``index``.
+        """
+        self._new_generation(index)
+        if index != self.all_indices:
+            self._new_generation(self.all_indices)
@@ -0,0 +1,166 @@
+"""
+Debouncing of the realtime updates of frequently saved rows.
+"""
+from collections import defaultdict
+import logging
+import threading
+import time
+
+from django.db import close_old_connections, models
+from django.utils.six import iteritems
+
+from .registries import registry
+
+
+logger = logging.getLogger(__name__)
+
+
+class Debouncer(object):
+    """
+    Keep only the latest pending action per (document, pk) and send them
+    together once the row hasn't been saved for ``window`` seconds.
+
+    A pending action is never delayed for more than ``max_latency`` seconds,
+    and all the pending actions are sent at once when there are more than
+    ``max_pending`` of them. The window can be overridden per document with
+    the ``debounce_window`` Meta option.
+    """
+    def __init__(self, window=1.0, max_latency=5.0, max_pending=10000,
+                 clock=time.time):
+        self.window = window
+        self.max_latency = max_latency
+        self.max_pending = max_pending
+        self.clock = clock
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        """
+        Start the background thread sending the pending actions.
+        """
+        with self._condition:
+            self._stopped = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread and send the pending actions.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.flush(force=True)
+
+    def _get_window(self, doc):
+        window = doc._doc_type.debounce_window
+        return self.window if window is None else window
+
+    def add(self, doc, pk, action='index'):
+        """
+        Replace the pending action of the ``doc`` document with id ``pk``.
+        """
+        now = self.clock()
+        with self._condition:
+            key = (doc, pk)
+            first_seen = self._pending[key][1] if key in self._pending else now
+            deadline = min(
+                now + self._get_window(doc), first_seen + self.max_latency
+            )
+            self._pending[key] = (action, first_seen, deadline)
+            overflow = len(self._pending) >= self.max_pending
+            self._condition.notify()
+
+        if overflow:
+            self.flush(force=True)
+
+    def add_instance(self, instance, action='index'):
+        """
+        Add an action for each document attached to the model of
+        ``instance`` (if their ignore_signals flag allows it)
+        """
+        for doc in registry.get_documents([instance.__class__]):
+            if not doc._doc_type.ignore_signals:
+                self.add(doc, instance.pk, action)
+
+    def add_all(self, doc_pks, action='index'):
+        """
+        Add an action for each (document, pk) of ``doc_pks``.
+        """
+        for doc, pk in doc_pks:
+            self.add(doc, pk, action)
+
+    def get_related_pks(self, instance):
+        """
+        Return the (document, pk) of the instances related to ``instance``
+        in docs that have related_models.
+        """
+        doc_pks = []
+        for doc in registry._get_related_doc(instance):
+            related = doc().get_instances_from_related(instance)
+            if related is None:
+                continue
+            if isinstance(related, models.Model):
+                related = [related]
+            doc_pks.extend((doc, obj.pk) for obj in related)
+        return doc_pks
+
+    def _pop_due(self, force):
+        now = self.clock()
+        due = [
+            (key, entry) for key, entry in iteritems(self._pending)
+            if force or entry[2] <= now
+        ]
+        for key, entry in due:
+            del self._pending[key]
+        return due
+
+    def flush(self, force=False):
+        """
+        Send the pending actions which reached their deadline, or all of
+        them with ``force``.
+        """
+        with self._condition:
+            due = self._pop_due(force)
+
+        grouped = defaultdict(list)
+        for (doc, pk), (action, first_seen, deadline) in due:
+            grouped[(doc, action)].append(pk)
+
+        for (doc, action), pks in iteritems(grouped):
+            kwargs = {'raise_on_error': False} if action == 'delete' else {}
+            doc_instance = doc()
+            registry._update_doc(
+                doc_instance,
+                doc_instance._get_object_list_by_pks(pks, action),
+                action=action,
+                **kwargs
+            )
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                if self._pending:
+                    timeout = max(0, min(
+                        entry[2] for entry in self._pending.values()
+                    ) - self.clock())
+                else:
+                    timeout = None
+                self._condition.wait(timeout)
+                if self._stopped:
+                    return
+            # The thread lives as long as the process, its database
+            # connections must not outlive CONN_MAX_AGE or a server restart.
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to send the debounced updates")
+            finally:
+                close_old_connections()
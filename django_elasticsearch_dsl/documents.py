@@ -3,7 +3,7 @@ from __future__ import unicode_literals
 from django.db import models
 from django.core.paginator import Paginator
 from django.utils.six import add_metaclass, iteritems
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import BulkIndexError, bulk
 from elasticsearch_dsl import DocType as DSLDocType
 from elasticsearch_dsl.document import DocTypeMeta as DSLDocTypeMeta
 from elasticsearch_dsl.field import Field
@@ -16,15 +16,21 @@ from .fields import (
     DEDField,
     DoubleField,
     FileField,
+    FileFieldMixin,
     IntegerField,
     KeywordField,
     LongField,
+    ObjectField,
     ShortField,
     TextField,
 )
 from .indices import Index
+from .metrics import MeasuredClient
+from .profiling import get_profiler
+from .refresh import get_refresh_policy, refresher
 from .registries import registry
 from .search import Search
+from .tracing import span
 
 model_field_class_to_field_class = {
     models.AutoField: IntegerField,
@@ -65,14 +71,15 @@ class DocTypeMeta(DSLDocTypeMeta):
         model = attrs['Meta'].model
 
         ignore_signals = getattr(attrs['Meta'], "ignore_signals", False)
-        auto_refresh = getattr(
+        auto_refresh = get_refresh_policy(getattr(
             attrs['Meta'], 'auto_refresh', DEDConfig.auto_refresh_enabled()
-        )
+        ))
         model_field_names = getattr(attrs['Meta'], "fields", [])
         related_models = getattr(attrs['Meta'], "related_models", [])
         queryset_pagination = getattr(
             attrs['Meta'], "queryset_pagination", None
         )
+        debounce_window = getattr(attrs['Meta'], "debounce_window", None)
 
         class_fields = set(
             name for name, field in iteritems(attrs)
@@ -86,6 +93,7 @@ class DocTypeMeta(DSLDocTypeMeta):
         cls._doc_type.auto_refresh = auto_refresh
         cls._doc_type.related_models = related_models
         cls._doc_type.queryset_pagination = queryset_pagination
+        cls._doc_type.debounce_window = debounce_window
 
         fields = model._meta.get_fields()
         fields_lookup = dict((field.name, field) for field in fields)
@@ -104,6 +112,28 @@ class DocTypeMeta(DSLDocTypeMeta):
         cls._doc_type._fields = (
             lambda: cls._doc_type.mapping.properties.properties.to_dict())
 
+        # Map the ES fields storing a concrete model field value as is, to
+        # build model instances from the _source of the hits
+        concrete_fields = {}
+        for field in model._meta.concrete_fields:
+            concrete_fields[field.name] = field
+            concrete_fields[field.attname] = field
+        cls._doc_type.model_fields = {}
+        for field_name, field in iteritems(cls._doc_type._fields()):
+            if (not isinstance(field, DEDField) or
+                    isinstance(field, (ObjectField, FileFieldMixin)) or
+                    len(field._path) > 1 or
+                    hasattr(cls, 'prepare_%s' % field_name) or
+                    hasattr(cls, 'prepare_%s_with_related' % field_name)):
+                continue
+            attr = field._path[0] if field._path else field_name
+            model_field = concrete_fields.get(attr)
+            # A relation is stored as is only through its attname (car_id)
+            if model_field is not None and (
+                    not model_field.is_relation or
+                    model_field.attname == attr):
+                cls._doc_type.model_fields[field_name] = model_field
+
         if getattr(cls._doc_type, 'index'):
             index = Index(cls._doc_type.index)
             index.doc_type(cls)
@@ -144,6 +174,7 @@ class DocType(DSLDocType):
         Take a model instance, and turn it into a dict that can be serialized
         based on the fields defined on this DocType subclass
         """
+        profiler = get_profiler()
         data = {}
         for name, field in iteritems(self._doc_type._fields()):
             if not isinstance(field, DEDField):
@@ -152,25 +183,31 @@ class DocType(DSLDocType):
             if field._path == []:
                 field._path = [name]
 
-            prep_func = getattr(self, 'prepare_%s_with_related' % name, None)
-            if prep_func:
-                field_value = prep_func(
-                    instance,
-                    related_to_ignore=self._related_instance_to_ignore
-                )
+            if profiler is None:
+                data[name] = self._prepare_field(name, field, instance)
             else:
-                prep_func = getattr(self, 'prepare_%s' % name, None)
-                if prep_func:
-                    field_value = prep_func(instance)
-                else:
-                    field_value = field.get_value_from_instance(
-                        instance, self._related_instance_to_ignore
-                    )
-
-            data[name] = field_value
+                data[name] = profiler.call(
+                    self.__class__.__name__, name,
+                    self._prepare_field, name, field, instance
+                )
 
         return data
 
+    def _prepare_field(self, name, field, instance):
+        prep_func = getattr(self, 'prepare_%s_with_related' % name, None)
+        if prep_func:
+            return prep_func(
+                instance, related_to_ignore=self._related_instance_to_ignore
+            )
+
+        prep_func = getattr(self, 'prepare_%s' % name, None)
+        if prep_func:
+            return prep_func(instance)
+
+        return field.get_value_from_instance(
+            instance, self._related_instance_to_ignore
+        )
+
     @classmethod
     def to_field(cls, field_name, model_field):
         """
@@ -188,19 +225,66 @@ class DocType(DSLDocType):
             )
 
     def bulk(self, actions, **kwargs):
-        return bulk(client=self.connection, actions=actions, **kwargs)
+        if registry.metrics is None and registry.tracer is None:
+            return bulk(client=self.connection, actions=actions, **kwargs)
+
+        document = self.__class__.__name__
+        client = MeasuredClient(
+            self.connection, registry.metrics, document=document
+        )
+        with span('ded.bulk', document=document,
+                  index=str(self._doc_type.index)) as bulk_span:
+            try:
+                success, errors = bulk(
+                    client=client, actions=actions, **kwargs
+                )
+            except BulkIndexError as e:
+                self._record_bulk(bulk_span, 0, len(e.errors))
+                raise
+            self._record_bulk(
+                bulk_span, success,
+                errors if isinstance(errors, int) else len(errors)
+            )
+        return success, errors
+
+    def _record_bulk(self, bulk_span, success, failed):
+        bulk_span.set_attribute('success', success)
+        bulk_span.set_attribute('errors', failed)
+        metrics = registry.metrics
+        if metrics is not None:
+            document = self.__class__.__name__
+            metrics.inc(
+                'ded_documents_indexed_total', success, document=document
+            )
+            if failed:
+                metrics.inc(
+                    'ded_bulk_item_errors_total', failed, document=document
+                )
 
     def _prepare_action(self, object_instance, action):
+        source = None
+        if action != 'delete':
+            document = self.__class__.__name__
+            with span('ded.prepare', document=document,
+                      pk=object_instance.pk):
+                source = self.prepare(object_instance)
+            if registry.metrics is not None:
+                registry.metrics.inc(
+                    'ded_documents_prepared_total', document=document
+                )
         return {
             '_op_type': action,
             '_index': str(self._doc_type.index),
             '_type': self._doc_type.mapping.doc_type,
             '_id': object_instance.pk,
-            '_source': (
-                self.prepare(object_instance) if action != 'delete' else None
-            ),
+            '_source': source,
         }
 
+    def _get_object_list(self, thing):
+        if isinstance(thing, models.Model):
+            return [thing]
+        return thing
+
     def _get_actions(self, object_list, action):
         if self._doc_type.queryset_pagination is not None:
             paginator = Paginator(
@@ -216,17 +300,64 @@ class DocType(DSLDocType):
     def update(self, thing, refresh=None, action='index', **kwargs):
         """
         Update each document in ES for a model, iterable of models or queryset
+
+        ``refresh`` overrides the ``auto_refresh`` policy of the doc type, it
+        can be ``True``, ``False``, ``'wait_for'`` or ``'coalesced'``.
         """
-        if refresh is True or (
-            refresh is None and self._doc_type.auto_refresh
-        ):
-            kwargs['refresh'] = True
+        return self._send_actions(
+            self._get_actions(self._get_object_list(thing), action),
+            refresh=refresh, **kwargs
+        )
 
-        if isinstance(thing, models.Model):
-            object_list = [thing]
-        else:
-            object_list = thing
+    def _send_actions(self, actions, refresh=None, **kwargs):
+        """
+        Send prepared bulk actions, applying the refresh policy.
+        """
+        refresh = self._get_refresh_policy(refresh)
+        if refresh is True or refresh == 'wait_for':
+            kwargs['refresh'] = refresh
+
+        result = self.bulk(actions, **kwargs)
+        self._after_send(refresh)
+        return result
+
+    def _get_refresh_policy(self, refresh=None):
+        return get_refresh_policy(
+            self._doc_type.auto_refresh if refresh is None else refresh
+        )
 
-        return self.bulk(
-            self._get_actions(object_list, action), **kwargs
+    def _after_send(self, refresh):
+        index = str(self._doc_type.index)
+        if refresh == 'coalesced':
+            refresher.schedule(self.connection, index)
+        if registry.search_cache is not None:
+            registry.search_cache.invalidate(index)
+            if refresh is False:
+                # Invalidate again after the periodic refresh of the index
+                refresher.schedule(self.connection, index, refresh=False)
+
+    def aupdate(self, thing, refresh=None, action='index', **kwargs):
+        """
+        Asyncio counterpart of ``update`` (Python 3.6+), to be awaited.
+        """
+        from . import aio
+
+        return aio.update(
+            self, thing, refresh=refresh, action=action, **kwargs
+        )
+
+    def _get_object_list_by_pks(self, pks, action):
+        if action == 'delete':
+            model = self._doc_type.model
+            return [model(pk=pk) for pk in pks]
+        return self.get_queryset().filter(pk__in=pks)
+
+    def update_by_pks(self, pks, action='index', **kwargs):
+        """
+        Update the documents of the model instances with the given primary
+        keys. The instances are fetched with ``get_queryset`` (the ones which
+        don't exist anymore are skipped), except for a delete.
+        """
+        return self.update(
+            self._get_object_list_by_pks(pks, action), action=action, **kwargs
         )
@@ -26,6 +26,7 @@ from elasticsearch_dsl.field import (
     Short,
 )
 from .exceptions import VariableLookupError
+from .profiling import get_profiler
 
 
 class DEDField(Field):
@@ -92,25 +93,25 @@ class ObjectField(DEDField, Object):
         data = {}
 
         if hasattr(self, 'properties'):
-            for name, field in self.properties.to_dict().items():
-                if not isinstance(field, DEDField):
-                    continue
+            properties = self.properties.to_dict()
+        else:
+            properties = self._doc_class._doc_type.mapping.properties._params.get('properties', {})  # noqa
+
+        profiler = get_profiler()
+        for name, field in properties.items():
+            if not isinstance(field, DEDField):
+                continue
 
-                if field._path == []:
-                    field._path = [name]
+            if field._path == []:
+                field._path = [name]
 
+            if profiler is None:
                 data[name] = field.get_value_from_instance(
                     obj, field_value_to_ignore
                 )
-        else:
-            for name, field in self._doc_class._doc_type.mapping.properties._params.get('properties', {}).items(): # noqa
-                if not isinstance(field, DEDField):
-                    continue
-
-                if field._path == []:
-                    field._path = [name]
-
-                data[name] = field.get_value_from_instance(
+            else:
+                data[name] = profiler.call(
+                    None, name, field.get_value_from_instance,
                     obj, field_value_to_ignore
                 )
 
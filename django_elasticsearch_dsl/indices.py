@@ -1,12 +1,31 @@
 from copy import deepcopy
+import hashlib
+import json
 
 from django.utils.encoding import python_2_unicode_compatible
+from django.utils.six import itervalues
+from elasticsearch.exceptions import NotFoundError
 from elasticsearch_dsl import Index as DSLIndex
 
 from .apps import DEDConfig
 from .registries import registry
 
 
+FINGERPRINT_META_KEY = 'ded_fingerprint'
+
+INDEX_MISSING = 'missing'
+INDEX_UP_TO_DATE = 'up to date'
+INDEX_MAPPINGS_CHANGED = 'mappings changed'
+INDEX_SETTINGS_CHANGED = 'settings changed'
+INDEX_UNKNOWN = 'no fingerprint'
+
+
+def _hash(data):
+    return hashlib.sha1(json.dumps(
+        data, sort_keys=True, separators=(',', ':'), default=str
+    ).encode('utf-8')).hexdigest()
+
+
 @python_2_unicode_compatible
 class Index(DSLIndex):
     def __init__(self, name, using='default'):
@@ -21,5 +40,94 @@ class Index(DSLIndex):
         registry.register(self, doc_type)
         return doc_type
 
+    def get_fingerprint(self):
+        """
+        Return the hashes of the mappings and of the settings (with the
+        analysis and the aliases) of the registered doc types.
+        """
+        data = deepcopy(super(Index, self).to_dict())
+        mappings = data.pop('mappings', {})
+        return {'mappings': _hash(mappings), 'settings': _hash(data)}
+
+    def to_dict(self):
+        """
+        Extend to store the fingerprint in the ``_meta`` of the mappings.
+        """
+        out = super(Index, self).to_dict()
+        fingerprint = self.get_fingerprint()
+        for mapping in itervalues(out.get('mappings', {})):
+            mapping.setdefault('_meta', {})[FINGERPRINT_META_KEY] = (
+                fingerprint
+            )
+        return out
+
+    def get_stored_fingerprint(self):
+        """
+        Return the fingerprint stored in the index, ``None`` if the index
+        doesn't exist, or an empty dict if it was created without one.
+        """
+        try:
+            response = self.connection.indices.get_mapping(index=self._name)
+        except NotFoundError:
+            return None
+        for index in itervalues(response):
+            for mapping in itervalues(index['mappings']):
+                fingerprint = mapping.get('_meta', {}).get(
+                    FINGERPRINT_META_KEY
+                )
+                if fingerprint:
+                    return fingerprint
+        return {}
+
+    def get_status(self):
+        """
+        Compare the stored fingerprint to the one of the registered doc
+        types, and return one of the ``INDEX_*`` statuses.
+        """
+        stored = self.get_stored_fingerprint()
+        if stored is None:
+            return INDEX_MISSING
+        if not stored:
+            return INDEX_UNKNOWN
+        fingerprint = self.get_fingerprint()
+        if stored.get('settings') != fingerprint['settings']:
+            return INDEX_SETTINGS_CHANGED
+        if stored.get('mappings') != fingerprint['mappings']:
+            return INDEX_MAPPINGS_CHANGED
+        return INDEX_UP_TO_DATE
+
+    def get_concrete_names(self):
+        """
+        Return the names of the indices of the alias named like the index
+        (see ``search_index --reindex-from-source``), or the name of the
+        index if it isn't an alias.
+        """
+        try:
+            return sorted(
+                self.connection.indices.get_alias(name=self._name)
+            )
+        except NotFoundError:
+            return [self._name]
+
+    def delete(self, **kwargs):
+        """
+        Extend to delete the indices of an alias named like the index, which
+        elasticsearch refuses to delete by the alias.
+        """
+        return self.connection.indices.delete(
+            index=','.join(self.get_concrete_names()), **kwargs
+        )
+
+    def put_mappings(self):
+        """
+        Update the mappings of the existing index, and its fingerprint.
+        Raise ``RequestError`` if a change is not compatible with the
+        existing mappings (a field type changed...).
+        """
+        for doc_type, mapping in self.to_dict().get('mappings', {}).items():
+            self.connection.indices.put_mapping(
+                index=self._name, doc_type=doc_type, body=mapping
+            )
+
     def __str__(self):
         return self._name
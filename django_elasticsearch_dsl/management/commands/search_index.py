@@ -1,9 +1,20 @@
 from __future__ import unicode_literals, absolute_import
+from copy import deepcopy
+from datetime import datetime
+import logging
+import time
+
 from django.core.management.base import BaseCommand, CommandError
 from django.utils.six.moves import input
+from elasticsearch.exceptions import RequestError
+from ... import outbox, profiling
+from ...indices import INDEX_MISSING, INDEX_MAPPINGS_CHANGED, INDEX_UP_TO_DATE
 from ...registries import registry
 
 
+logger = logging.getLogger(__name__)
+
+
 class Command(BaseCommand):
     help = 'Manage elasticsearch index.'
 
@@ -43,6 +54,80 @@ class Command(BaseCommand):
             const='rebuild',
             help="Delete the indices and then recreate and populate them"
         )
+        parser.add_argument(
+            '--check',
+            action='store_const',
+            dest='action',
+            const='check',
+            help="Show the indices whose mappings or settings differ from "
+                 "their documents, and fail if there are some"
+        )
+        parser.add_argument(
+            '--rebuild-changed',
+            action='store_const',
+            dest='action',
+            const='rebuild_changed',
+            help="Create the missing indices, update the mappings of the "
+                 "indices with compatible changes and rebuild the others"
+        )
+        parser.add_argument(
+            '--reindex-from-source',
+            action='store_const',
+            dest='action',
+            const='reindex_from_source',
+            help="Copy the documents of the indices into new indices with the "
+                 "current mappings, with the reindex API, and point the index "
+                 "names (as aliases) to the new indices"
+        )
+        parser.add_argument(
+            '--drain-outbox',
+            action='store_const',
+            dest='action',
+            const='drain_outbox',
+            help="Send the pending updates of the outbox to elasticsearch"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of outbox entries claimed at once, or of documents "
+                 "copied per batch by --reindex-from-source (default: 1000)"
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help="Keep draining the outbox, waiting for new entries every "
+                 "POLL_INTERVAL seconds, or poll the progress of "
+                 "--reindex-from-source every POLL_INTERVAL seconds "
+                 "(default: 5)"
+        )
+        parser.add_argument(
+            '--slices',
+            default='auto',
+            help="Number of parallel slices of --reindex-from-source "
+                 "(default: auto, one per shard)"
+        )
+        parser.add_argument(
+            '--requests-per-second',
+            type=float,
+            default=None,
+            help="Throttle --reindex-from-source to REQUESTS_PER_SECOND "
+                 "documents per second (default: unthrottled)"
+        )
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help="Measure the time and SQL queries spent preparing each "
+                 "field of the documents while populating"
+        )
+        parser.add_argument(
+            '--profile-output',
+            metavar='PATH',
+            default='search_index_profile.json',
+            help="File of the JSON report of --profile "
+                 "(default: search_index_profile.json)"
+        )
         parser.add_argument(
             '-f',
             action='store_true',
@@ -83,8 +168,10 @@ class Command(BaseCommand):
             self.stdout.write("Creating index '{}'".format(index))
             index.create()
 
-    def _populate(self, models, options):
+    def _populate(self, models, options, index=None):
         for doc in registry.get_documents(models):
+            if index is not None and doc._doc_type.index != str(index):
+                continue
             qs = doc().get_queryset()
             self.stdout.write("Indexing {} '{}' objects".format(
                 qs.count(), doc._doc_type.model.__name__)
@@ -114,26 +201,201 @@ class Command(BaseCommand):
         self._create(models, options)
         self._populate(models, options)
 
+    def _check(self, models, options):
+        changed = []
+        for index in sorted(registry.get_indices(models), key=str):
+            status = index.get_status()
+            self.stdout.write("Index '{}': {}".format(index, status))
+            if status != INDEX_UP_TO_DATE:
+                changed.append(str(index))
+        if changed:
+            raise CommandError("The indices '{}' are not up to date".format(
+                ", ".join(changed)
+            ))
+
+    def _rebuild_changed(self, models, options):
+        to_rebuild = []
+        for index in sorted(registry.get_indices(models), key=str):
+            status = index.get_status()
+            if status == INDEX_UP_TO_DATE:
+                self.stdout.write("Index '{}' is up to date".format(index))
+            elif status == INDEX_MISSING:
+                self.stdout.write("Creating index '{}'".format(index))
+                index.create()
+                self._populate(models, options, index=index)
+            elif status == INDEX_MAPPINGS_CHANGED:
+                try:
+                    index.put_mappings()
+                except RequestError as e:
+                    self.stdout.write(
+                        "The mappings of '{}' can't be updated: {}".format(
+                            index, e.info
+                        )
+                    )
+                    to_rebuild.append(index)
+                else:
+                    self.stdout.write(
+                        "Updated the mappings of '{}' (the existing "
+                        "documents get the new fields when updated or "
+                        "populated)".format(index)
+                    )
+            else:
+                self.stdout.write("Index '{}': {}".format(index, status))
+                to_rebuild.append(index)
+
+        if not to_rebuild:
+            return
+        if not options['force']:
+            response = input(
+                "Are you sure you want to rebuild "
+                "the '{}' indexes? [n/Y]: ".format(
+                    ", ".join(str(index) for index in to_rebuild)
+                ))
+            if response.lower() != 'y':
+                self.stdout.write('Aborted')
+                return
+        for index in to_rebuild:
+            self.stdout.write("Rebuilding index '{}'".format(index))
+            index.delete(ignore=404)
+            index.create()
+            self._populate(models, options, index=index)
+
+    def _reindex_from_source(self, models, options):
+        indices = sorted(registry.get_indices(models), key=str)
+        if not options['force']:
+            response = input(
+                "Are you sure you want to reindex the '{}' indexes? "
+                "The old indexes are deleted after the copy. [n/Y]: ".format(
+                    ", ".join(str(index) for index in indices)
+                ))
+            if response.lower() != 'y':
+                self.stdout.write('Aborted')
+                return
+
+        for index in indices:
+            self._reindex_index(index, options)
+
+    def _reindex_index(self, index, options):
+        es = index.connection
+        alias = str(index)
+        if not es.indices.exists(index=alias):
+            raise CommandError(
+                "The index '{}' doesn't exist, create it first".format(alias)
+            )
+        # A concrete index is replaced by an alias of the same name
+        sources = index.get_concrete_names()
+
+        new = '{}-{}'.format(alias, datetime.now().strftime('%Y%m%d%H%M%S%f'))
+        self.stdout.write("Creating index '{}'".format(new))
+        body = deepcopy(index.to_dict())
+        settings = body.setdefault('settings', {})
+        restored = {
+            'refresh_interval': settings.get('refresh_interval'),
+            'number_of_replicas': settings.get('number_of_replicas'),
+        }
+        # Copy faster, without refreshes nor replicas
+        settings.update(refresh_interval='-1', number_of_replicas=0)
+        es.indices.create(index=new, body=body)
+
+        task = es.reindex(body={
+            'source': {
+                'index': ','.join(sources), 'size': options['batch_size']
+            },
+            'dest': {'index': new},
+        }, wait_for_completion=False, slices=options['slices'],
+            requests_per_second=options['requests_per_second'] or -1
+        )['task']
+        interval = options['poll_interval'] or 5
+        while True:
+            result = es.tasks.get(task_id=task)
+            status = result['task']['status']
+            self.stdout.write("Copied {}/{} documents into '{}'".format(
+                status['created'] + status['updated'], status['total'], new
+            ))
+            if result.get('completed'):
+                break
+            time.sleep(interval)
+
+        failures = result.get('error') or \
+            result.get('response', {}).get('failures')
+        if failures:
+            es.indices.delete(index=new)
+            raise CommandError("The reindex of '{}' failed: {}".format(
+                alias, failures
+            ))
+
+        es.indices.put_settings(index=new, body=restored)
+        es.indices.refresh(index=new)
+        es.indices.update_aliases(body={'actions': [
+            {'add': {'index': new, 'alias': alias}}
+        ] + [{'remove_index': {'index': source}} for source in sources]})
+        self.stdout.write("Index '{}' now points to '{}'".format(alias, new))
+
+    def _profile(self, func, models, options):
+        if not options['profile']:
+            return func(models, options)
+
+        with profiling.profile() as profiler:
+            func(models, options)
+        profiler.write_table(self.stdout)
+        profiler.write_json(options['profile_output'])
+        self.stdout.write(
+            "Profile written to '{}'".format(options['profile_output'])
+        )
+
+    def _drain_outbox(self, models, options):
+        while True:
+            try:
+                count = outbox.drain(batch_size=options['batch_size'])
+            except Exception:
+                if options['poll_interval'] is None:
+                    raise
+                # The worker keeps running, the entries are kept
+                logger.exception("Failed to drain the outbox")
+                count = 0
+            if count:
+                self.stdout.write("Sent {} outbox entries".format(count))
+            elif options['poll_interval'] is None:
+                return
+            else:
+                time.sleep(options['poll_interval'])
+
     def handle(self, *args, **options):
         if not options['action']:
             raise CommandError(
                 "No action specified. Must be one of"
-                " '--create','--populate', '--delete' or '--rebuild' ."
+                " '--create','--populate', '--delete', '--rebuild',"
+                " '--check', '--rebuild-changed', '--reindex-from-source'"
+                " or '--drain-outbox' ."
             )
 
         action = options['action']
         models = self._get_models(options['models'])
 
+        if options['profile'] and action not in ('populate', 'rebuild'):
+            raise CommandError(
+                "--profile can only be used with '--populate' or '--rebuild'"
+            )
+
         if action == 'create':
             self._create(models, options)
         elif action == 'populate':
-            self._populate(models, options)
+            self._profile(self._populate, models, options)
         elif action == 'delete':
             self._delete(models, options)
         elif action == 'rebuild':
-            self._rebuild(models, options)
+            self._profile(self._rebuild, models, options)
+        elif action == 'check':
+            self._check(models, options)
+        elif action == 'rebuild_changed':
+            self._rebuild_changed(models, options)
+        elif action == 'reindex_from_source':
+            self._reindex_from_source(models, options)
+        elif action == 'drain_outbox':
+            self._drain_outbox(models, options)
         else:
             raise CommandError(
                 "Invalid action. Must be one of"
-                " '--create','--populate', '--delete' or '--rebuild' ."
+                " '--create','--populate', '--delete', '--rebuild'"
+                " or '--drain-outbox' ."
             )
@@ -0,0 +1,50 @@
+from __future__ import unicode_literals, absolute_import
+
+from django.core.management.base import BaseCommand, CommandError
+from ...registries import registry
+
+
+class Command(BaseCommand):
+    help = 'Show the search fingerprints taking the most time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help="Number of fingerprints shown (default: 10)"
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help="Forget the recorded searches"
+        )
+
+    def handle(self, *args, **options):
+        slow_log = registry.slow_log
+        if slow_log is None:
+            raise CommandError(
+                "The slow log is disabled, see ELASTICSEARCH_DSL_SLOW_LOG"
+            )
+
+        if options['reset']:
+            slow_log.reset()
+            self.stdout.write("Slow log reset")
+            return
+
+        row = "{:<16} {:<30} {:>8} {:>10} {:>10} {:>10} {:>10}\n"
+        self.stdout.write(row.format(
+            "Fingerprint", "Index", "Count", "Total (s)", "Mean (s)",
+            "p99 (s)", "Max (s)"
+        ))
+        stats = slow_log.get_stats(options['limit'])
+        for result in stats:
+            self.stdout.write(row.format(
+                result['fingerprint'], result['index'], result['count'],
+                *['{:.3f}'.format(result[key])
+                  for key in ('total', 'mean', 'p99', 'max')]
+            ))
+        for result in stats:
+            self.stdout.write("\n{}: {}".format(
+                result['fingerprint'], result['query']
+            ))
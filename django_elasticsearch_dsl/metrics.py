@@ -0,0 +1,229 @@
+"""
+Counters and histograms of the indexing and the searches, enabled with the
+``ELASTICSEARCH_DSL_METRICS`` setting.
+
+The measures are sent to an exporter (``registry.metrics``):
+
+- ``ded_documents_prepared_total{document}``: documents prepared.
+- ``ded_documents_indexed_total{document}``: bulk items sent successfully.
+- ``ded_bulk_item_errors_total{document}``: bulk items failed.
+- ``ded_bulk_request_bytes{document}``: size of the bulk requests.
+- ``ded_bulk_request_seconds{document}``: latency of the bulk requests.
+- ``ded_signal_handler_seconds{signal,model}``: time added by the signal
+  processor to the saves and deletes.
+- ``ded_search_seconds{index}``: wall time of the searches sent.
+- ``ded_search_took_seconds{index}``: ``took`` of the searches, the time
+  spent by elasticsearch.
+"""
+from collections import OrderedDict
+import threading
+from timeit import default_timer
+
+from django.utils.six import text_type
+
+from .tracing import span
+
+
+TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0,
+)
+BYTES_BUCKETS = (
+    1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216,
+)
+
+
+class MetricsExporter(object):
+    """
+    Receiver of the measures, to be subclassed to forward them to a
+    monitoring system.
+    """
+    def inc(self, name, value=1, **labels):
+        """
+        Increment the counter ``name`` by ``value``.
+        """
+        raise NotImplementedError
+
+    def observe(self, name, value, **labels):
+        """
+        Record ``value`` in the histogram ``name``.
+        """
+        raise NotImplementedError
+
+
+def _escape(value):
+    return text_type(value).replace('\\', '\\\\').replace(
+        '"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(name, _escape(value)) for name, value in labels
+    ))
+
+
+def _format_value(value):
+    return repr(float(value))
+
+
+class InMemoryExporter(MetricsExporter):
+    """
+    Keep the measures in memory, to be rendered in the Prometheus text
+    format by ``render``.
+
+    ``buckets`` are the upper bounds of the histogram buckets by metric
+    name, the ``*_bytes`` metrics use ``BYTES_BUCKETS`` and the others
+    ``TIME_BUCKETS`` by default.
+    """
+    def __init__(self, buckets=None):
+        self.buckets = dict(buckets or {})
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = OrderedDict()
+            self._histograms = OrderedDict()
+
+    def get_buckets(self, name):
+        if name in self.buckets:
+            return tuple(self.buckets[name])
+        return BYTES_BUCKETS if name.endswith('_bytes') else TIME_BUCKETS
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = {
+                    'buckets': [0] * len(self.get_buckets(name)),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            histogram = self._histograms[key]
+            for i, bound in enumerate(self.get_buckets(name)):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def get_counter(self, name, **labels):
+        """
+        Return the value of a counter, ``0`` if it was never incremented.
+        """
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def get_histogram(self, name, **labels):
+        """
+        Return the ``count``, ``sum`` and cumulative ``buckets`` counts of a
+        histogram, or ``None`` if nothing was recorded.
+        """
+        histogram = self._histograms.get(
+            (name, tuple(sorted(labels.items())))
+        )
+        if histogram is None:
+            return None
+        return {
+            'count': histogram['count'],
+            'sum': histogram['sum'],
+            'buckets': list(zip(self.get_buckets(name),
+                                histogram['buckets'])),
+        }
+
+    def render(self):
+        """
+        Return the measures in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [
+                (key, dict(value, buckets=list(value['buckets'])))
+                for key, value in self._histograms.items()
+            ]
+
+        for metric_type, items in (('counter', counters),
+                                   ('histogram', histograms)):
+            names = sorted(set(name for (name, labels), v in items))
+            for name in names:
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+                for (item_name, labels), value in items:
+                    if item_name != name:
+                        continue
+                    if metric_type == 'counter':
+                        lines.append('{}{} {}'.format(
+                            name, _format_labels(labels),
+                            _format_value(value)
+                        ))
+                        continue
+                    bounds = self.get_buckets(name)
+                    for bound, count in zip(bounds, value['buckets']):
+                        lines.append('{}_bucket{} {}'.format(
+                            name,
+                            _format_labels(labels + (('le', bound),)),
+                            count
+                        ))
+                    lines.append('{}_bucket{} {}'.format(
+                        name, _format_labels(labels + (('le', '+Inf'),)),
+                        value['count']
+                    ))
+                    lines.append('{}_sum{} {}'.format(
+                        name, _format_labels(labels),
+                        _format_value(value['sum'])
+                    ))
+                    lines.append('{}_count{} {}'.format(
+                        name, _format_labels(labels), value['count']
+                    ))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+class MeasuredClient(object):
+    """
+    Proxy of an ``Elasticsearch`` client recording the size and latency of
+    the bulk requests in ``exporter`` (if not ``None``) and in a
+    ``ded.bulk.request`` span.
+    """
+    def __init__(self, client, exporter, **labels):
+        self._client = client
+        self._exporter = exporter
+        self._labels = labels
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def bulk(self, body, *args, **kwargs):
+        size = len(body.encode('utf-8') if isinstance(body, text_type)
+                   else body)
+        start = default_timer()
+        try:
+            with span('ded.bulk.request', bytes=size, **self._labels):
+                return self._client.bulk(body, *args, **kwargs)
+        finally:
+            if self._exporter is not None:
+                self._exporter.observe(
+                    'ded_bulk_request_seconds', default_timer() - start,
+                    **self._labels
+                )
+                self._exporter.observe(
+                    'ded_bulk_request_bytes', size, **self._labels
+                )
+
+
+def record_search(exporter, search, response, elapsed):
+    """
+    Record the wall time and the ``took`` of a search response.
+    """
+    index = search._index
+    index = ','.join(index) if isinstance(index, (list, tuple)) else index
+    labels = {'index': index or '_all'}
+    exporter.observe('ded_search_seconds', elapsed, **labels)
+    if 'took' in response:
+        exporter.observe(
+            'ded_search_took_seconds', response['took'] / 1000.0, **labels
+        )
@@ -0,0 +1,24 @@
+from django.db import models
+from django.utils.encoding import python_2_unicode_compatible
+
+
+@python_2_unicode_compatible
+class OutboxEntry(models.Model):
+    """
+    A pending update of an elasticsearch document, written by the
+    ``OutboxSignalProcessor`` and sent by ``search_index --drain-outbox``.
+    """
+    document = models.CharField(max_length=255)
+    object_id = models.CharField(max_length=255)
+    action = models.CharField(max_length=16)
+    created = models.DateTimeField(auto_now_add=True)
+    # The failed sends of the entry, and the last error
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        app_label = 'django_elasticsearch_dsl'
+        ordering = ['pk']
+
+    def __str__(self):
+        return '{} {} {}'.format(self.action, self.document, self.object_id)
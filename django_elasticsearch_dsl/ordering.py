@@ -0,0 +1,111 @@
+"""
+Strategies used by ``Search.to_queryset`` to return the model instances in
+the order of the elasticsearch hits.
+"""
+from django.db import connections
+from django.db.models import Case, When
+from django.db.models.expressions import RawSQL
+
+from .apps import DEDConfig
+
+try:
+    from django.db.models.query import ModelIterable
+except ImportError:  # django < 1.9
+    ModelIterable = None
+
+
+class OrderingStrategy(object):
+    """
+    Order a queryset filtered on ``pks`` like the ``pks`` list.
+    """
+    def is_available(self, queryset):
+        return True
+
+    def order(self, queryset, pks):
+        raise NotImplementedError
+
+
+class CaseOrdering(OrderingStrategy):
+    """
+    ``ORDER BY CASE WHEN pk=... THEN 0 ...`` with one ``WHEN`` per hit.
+
+    Works on every database, but the cost of parsing and planning the query
+    grows with the number of hits.
+    """
+    def order(self, queryset, pks):
+        return queryset.order_by(
+            Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(pks)])
+        )
+
+
+class PythonOrdering(OrderingStrategy):
+    """
+    Sort the fetched rows in Python.
+
+    The SQL query isn't ordered, so slicing the returned queryset slices the
+    unordered rows.
+    """
+    def is_available(self, queryset):
+        return ModelIterable is not None
+
+    def order(self, queryset, pks):
+        positions = dict((str(pk), pos) for pos, pk in enumerate(pks))
+
+        class PreservedOrderIterable(ModelIterable):
+            def __iter__(self):
+                objs = list(super(PreservedOrderIterable, self).__iter__())
+                objs.sort(key=lambda obj: positions.get(str(obj.pk)))
+                return iter(objs)
+
+        queryset = queryset.order_by()
+        queryset._iterable_class = PreservedOrderIterable
+        return queryset
+
+
+class ArrayPositionOrdering(OrderingStrategy):
+    """
+    ``ORDER BY array_position(ARRAY[...], pk::text)`` (PostgreSQL >= 9.5).
+    """
+    def is_available(self, queryset):
+        return connections[queryset.db].vendor == 'postgresql'
+
+    def order(self, queryset, pks):
+        opts = queryset.model._meta
+        quote_name = connections[queryset.db].ops.quote_name
+        column = '{}.{}'.format(
+            quote_name(opts.db_table), quote_name(opts.pk.column)
+        )
+        return queryset.annotate(
+            _es_position=RawSQL(
+                'array_position(%s, {}::text)'.format(column),
+                ([str(pk) for pk in pks],)
+            )
+        ).order_by('_es_position')
+
+
+ordering_strategies = {
+    'case': CaseOrdering(),
+    'python': PythonOrdering(),
+    'array_position': ArrayPositionOrdering(),
+}
+
+
+def get_ordering_strategy(keep_order, queryset, pks):
+    """
+    Return the ``OrderingStrategy`` for the ``keep_order`` argument of
+    ``to_queryset``: a strategy, the name of a strategy, or ``True`` to
+    choose one from the number of hits and the database.
+
+    The ``'python'`` strategy is never chosen: its SQL query is not ordered,
+    so a slice of the queryset would not be in the order of the hits.
+    """
+    if isinstance(keep_order, OrderingStrategy):
+        return keep_order
+    if keep_order is not True:
+        return ordering_strategies[keep_order]
+
+    if len(pks) > DEDConfig.case_ordering_max_hits():
+        array_position = ordering_strategies['array_position']
+        if array_position.is_available(queryset):
+            return array_position
+    return ordering_strategies['case']
@@ -0,0 +1,183 @@
+"""
+Transactional outbox for the elasticsearch updates.
+
+Instead of calling elasticsearch during the save, the pending updates are
+written to the ``OutboxEntry`` table in the same database transaction, and
+sent later in bulk by ``drain``.
+"""
+from collections import defaultdict
+import json
+import logging
+
+from django.db import connections, models, transaction
+from django.utils.six import iteritems
+from elasticsearch.exceptions import TransportError
+
+from .apps import DEDConfig
+from .models import OutboxEntry
+from .registries import registry
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_document_path(doc):
+    return '{}.{}'.format(doc.__module__, doc.__name__)
+
+
+def _get_pks(thing):
+    if isinstance(thing, models.Model):
+        return [thing.pk]
+    return [instance.pk for instance in thing]
+
+
+def _create_entries(doc_pks, action):
+    OutboxEntry.objects.bulk_create([
+        OutboxEntry(
+            document=get_document_path(doc),
+            object_id=str(pk),
+            action=action,
+        )
+        for doc, pks in doc_pks for pk in pks
+    ])
+
+
+def enqueue(instance, action='index'):
+    """
+    Write an outbox entry for each document attached to the model of
+    ``instance`` (if their ignore_signals flag allows it)
+    """
+    if not DEDConfig.autosync_enabled():
+        return
+
+    _create_entries(
+        [
+            (doc, [instance.pk])
+            for doc in registry.get_documents([instance.__class__])
+            if not doc._doc_type.ignore_signals
+        ],
+        action
+    )
+
+
+def enqueue_related(instance):
+    """
+    Write an outbox entry for the instances related to ``instance`` in docs
+    that have related_models.
+    """
+    if not DEDConfig.autosync_enabled():
+        return
+
+    doc_pks = []
+    for doc in registry._get_related_doc(instance):
+        related = doc().get_instances_from_related(instance)
+        if related is not None:
+            doc_pks.append((doc, _get_pks(related)))
+
+    _create_entries(doc_pks, 'index')
+
+
+def _claim(batch_size, using, max_attempts):
+    qs = OutboxEntry.objects.using(using).filter(
+        attempts__lt=max_attempts
+    ).order_by('pk')
+    features = connections[using].features
+
+    if getattr(features, 'has_select_for_update_skip_locked', False):
+        qs = qs.select_for_update(skip_locked=True)
+    elif features.has_select_for_update:
+        qs = qs.select_for_update()
+
+    return list(qs[:batch_size])
+
+
+def _send(doc, pks, action):
+    """
+    Send ``action`` for the documents of ``pks`` and return the errors of
+    the ones which failed, by pk. A failure of the whole request (to prepare
+    a document...) is retried pk by pk to find the failed ones, except a
+    transport error which is raised.
+    """
+    try:
+        success, errors = doc().update_by_pks(
+            pks, action=action, raise_on_error=False
+        )
+    except TransportError:
+        raise
+    except Exception as e:
+        if len(pks) == 1:
+            logger.exception("Failed to send the outbox entry %s %s %s",
+                             action, get_document_path(doc), pks[0])
+            return {pks[0]: repr(e)}
+        failed = {}
+        for pk in pks:
+            failed.update(_send(doc, [pk], action))
+        return failed
+
+    failed = {}
+    for error in errors:
+        result = next(iter(error.values()))
+        if action == 'delete' and result.get('status') == 404:
+            continue
+        failed[str(result.get('_id'))] = json.dumps(
+            result.get('error', result), default=str
+        )
+    return failed
+
+
+def drain(batch_size=1000, using='default', max_attempts=5):
+    """
+    Send one batch of outbox entries to elasticsearch and return the number
+    of entries processed.
+
+    Only the last action is kept when an object has several entries in the
+    batch, and each document receives a single bulk request per action. The
+    entries of the documents which failed are kept with their number of
+    attempts and their last error, the others are deleted. After
+    ``max_attempts`` failures an entry is not sent anymore, it stays in the
+    table for inspection. If elasticsearch is unreachable, the transaction
+    is rolled back and the entries are kept for the next drain.
+    """
+    documents = dict(
+        (get_document_path(doc), doc) for doc in registry.get_documents()
+    )
+
+    with transaction.atomic(using=using):
+        entries = _claim(batch_size, using, max_attempts)
+        if not entries:
+            return 0
+
+        # The last entry of each object, in pk order
+        pending = {}
+        for entry in entries:
+            pending[(entry.document, entry.object_id)] = entry
+
+        grouped = defaultdict(list)
+        for (document, object_id), entry in iteritems(pending):
+            if document in documents:
+                grouped[(document, entry.action)].append(object_id)
+
+        failed = {}
+        for (document, action), pks in iteritems(grouped):
+            for pk, error in iteritems(
+                    _send(documents[document], pks, action)):
+                failed[(document, pk)] = error
+
+        retried = []
+        for key, error in iteritems(failed):
+            entry = pending[key]
+            entry.attempts += 1
+            entry.error = error
+            entry.save(using=using, update_fields=['attempts', 'error'])
+            retried.append(entry.pk)
+            if entry.attempts >= max_attempts:
+                logger.error(
+                    "Outbox entry %s failed %s times, it won't be sent "
+                    "anymore: %s", entry, entry.attempts, error
+                )
+
+        OutboxEntry.objects.using(using).filter(
+            pk__in=[entry.pk for entry in entries]
+        ).exclude(pk__in=retried).delete()
+
+    return len(entries)
@@ -0,0 +1,174 @@
+"""
+Paginators of the hits of a ``Search``.
+"""
+import base64
+import binascii
+import json
+
+from django.core.paginator import (
+    EmptyPage,
+    InvalidPage,
+    Page,
+    PageNotAnInteger,
+    Paginator,
+)
+
+
+class CursorPage(object):
+    """
+    A page of hits of ``ESCursorPaginator``.
+    """
+    def __init__(self, object_list, cursor, next_cursor, paginator,
+                 response):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.paginator = paginator
+        self.response = response
+
+    def __repr__(self):
+        return '<CursorPage {!r}>'.format(self.cursor)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def total(self):
+        return self.response.hits.total
+
+    def to_queryset(self, keep_order=True, **kwargs):
+        """
+        Return a queryset of the model instances of the hits of the page,
+        see ``Search.to_queryset``.
+        """
+        return self.paginator.search._get_queryset(
+            [hit.meta.id for hit in self.object_list], keep_order, **kwargs
+        )
+
+
+class ESCursorPaginator(object):
+    """
+    Paginate the hits of ``search`` with ``search_after``, so the cost of a
+    page doesn't depend on its depth and the pages are not limited by the
+    ``max_result_window`` of the index.
+
+    The hits are sorted by the sort of the search and ``tiebreaker``, and a
+    page is identified by an opaque cursor (``None`` is the first page).
+    """
+    def __init__(self, search, per_page, tiebreaker='_id'):
+        self.per_page = int(per_page)
+        sort = list(search._sort)
+        if not any(tiebreaker in key if isinstance(key, dict)
+                   else key.lstrip('-') == tiebreaker for key in sort):
+            sort.append({tiebreaker: 'asc'})
+        self.search = search.sort(*sort)
+
+    def encode_cursor(self, sort_values):
+        return base64.urlsafe_b64encode(
+            json.dumps(sort_values, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            sort_values = json.loads(base64.urlsafe_b64decode(
+                str(cursor + padding)
+            ).decode('utf-8'))
+        except (TypeError, ValueError, binascii.Error):
+            raise InvalidPage("Invalid cursor")
+        if not isinstance(sort_values, list):
+            raise InvalidPage("Invalid cursor")
+        return sort_values
+
+    def page(self, cursor=None):
+        """
+        Return the ``CursorPage`` following ``cursor``.
+        """
+        s = self.search.extra(size=self.per_page + 1)
+        if cursor:
+            s = s.extra(search_after=self.decode_cursor(cursor))
+
+        response = s.execute()
+        hits = list(response)
+        next_cursor = None
+        if len(hits) > self.per_page:
+            hits = hits[:self.per_page]
+            next_cursor = self.encode_cursor(list(hits[-1].meta.sort))
+
+        return CursorPage(hits, cursor, next_cursor, self, response)
+
+
+class ESPaginator(Paginator):
+    """
+    ``Paginator`` of the hits of ``search`` for page number views.
+
+    The count is the ``hits.total`` of the page requested, so a page costs a
+    single search request, and the pages stop at the ``max_result_window``
+    of the index.
+    """
+    def __init__(self, search, per_page, orphans=0,
+                 allow_empty_first_page=True, max_result_window=10000):
+        super(ESPaginator, self).__init__(
+            search, per_page, orphans, allow_empty_first_page
+        )
+        self.max_result_window = max_result_window
+        self._total = None
+
+    @property
+    def total(self):
+        """
+        The number of hits, even beyond the ``max_result_window``.
+        """
+        if self._total is None:
+            self._total = self.object_list.count()
+        return self._total
+
+    @property
+    def count(self):
+        return min(self.total, self.max_result_window)
+
+    @property
+    def num_pages(self):
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        hits = max(1, self.count - self.orphans)
+        return (hits + self.per_page - 1) // self.per_page
+
+    def page(self, number):
+        """
+        Return the ``Page`` of hits with the 1-based ``number``.
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+
+        bottom = (number - 1) * self.per_page
+        top = min(bottom + self.per_page, self.max_result_window)
+        if bottom >= self.max_result_window:
+            raise EmptyPage("That page is beyond the max result window")
+
+        response = self.object_list[bottom:top].execute()
+        self._total = response.hits.total
+        if number > self.num_pages:
+            raise EmptyPage("That page contains no results")
+
+        hits = list(response)
+        if number == self.num_pages and top < self.count:
+            # The orphans of the last page are fetched with it
+            hits.extend(self.object_list[top:self.count].execute())
+
+        page = Page(hits, number, self)
+        page.response = response
+        return page
@@ -0,0 +1,139 @@
+"""
+Opt-in profiling of ``DocType.prepare``: the time, calls and SQL queries
+spent on each field of each document, including the inner fields of the
+``ObjectField`` s.
+
+The measures are inclusive: the time of an ``ObjectField`` includes the time
+of its inner fields.
+"""
+from contextlib import contextmanager
+import json
+import threading
+from timeit import default_timer
+
+from django.db import connections
+
+
+_profiler = None
+
+
+def get_profiler():
+    """
+    Return the active ``Profiler``, or ``None`` when not profiling.
+    """
+    return _profiler
+
+
+class Profiler(object):
+    """
+    Cumulative time, calls and SQL queries by (document, field path).
+
+    Without ``count_queries`` (the queries can't be counted before django
+    2.0), the queries of the results are ``None``.
+    """
+    def __init__(self, count_queries=True):
+        self.count_queries = count_queries
+        self.stats = {}
+        self.queries = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _get_stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def count_query(self, execute, sql, params, many, context):
+        # Signature of the django >= 2.0 database execute wrappers
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def call(self, document, field, func, *args, **kwargs):
+        """
+        Call ``func`` and record it for the ``field`` of ``document``, or for
+        a path below the field being measured if ``document`` is ``None``.
+        """
+        stack = self._get_stack()
+        if document is None:
+            if not stack:
+                return func(*args, **kwargs)
+            document, path = stack[-1]
+            field = '{}.{}'.format(path, field)
+
+        key = (document, field)
+        stack.append(key)
+        queries = self.queries
+        start = default_timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = default_timer() - start
+            stack.pop()
+            with self._lock:
+                stats = self.stats.setdefault(key, [0, 0.0, 0])
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] += self.queries - queries
+
+    def get_results(self):
+        """
+        Return the measures of the fields, the slowest first.
+        """
+        results = [
+            {
+                'document': document,
+                'field': field,
+                'calls': calls,
+                'time': elapsed,
+                'queries': queries if self.count_queries else None,
+            }
+            for (document, field), (calls, elapsed, queries)
+            in self.stats.items()
+        ]
+        return sorted(
+            results, key=lambda r: (-r['time'], r['document'], r['field'])
+        )
+
+    def write_table(self, stdout, limit=None):
+        """
+        Write the measures, the slowest first, as a table.
+        """
+        row = "{:<30} {:<30} {:>8} {:>10} {:>10} {:>8}\n"
+        stdout.write(row.format(
+            "Document", "Field", "Calls", "Time (s)", "Per call", "Queries"
+        ))
+        for result in self.get_results()[:limit]:
+            stdout.write(row.format(
+                result['document'], result['field'], result['calls'],
+                '{:.3f}'.format(result['time']),
+                '{:.3f}ms'.format(result['time'] / result['calls'] * 1000),
+                '?' if result['queries'] is None else result['queries']
+            ))
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.get_results(), f, indent=2)
+
+
+@contextmanager
+def profile():
+    """
+    Profile the documents prepared in the block, and yield the
+    ``Profiler``. The SQL queries are counted with django >= 2.0.
+    """
+    global _profiler
+
+    wrapped = [
+        connection for connection in connections.all()
+        if hasattr(connection, 'execute_wrappers')
+    ]
+    profiler = Profiler(count_queries=bool(wrapped))
+    for connection in wrapped:
+        connection.execute_wrappers.append(profiler.count_query)
+    _profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _profiler = None
+        for connection in wrapped:
+            connection.execute_wrappers.remove(profiler.count_query)
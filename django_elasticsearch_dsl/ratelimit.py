@@ -0,0 +1,233 @@
+"""
+Token bucket rate limiting of the realtime write path of the registry.
+"""
+import logging
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.six import iteritems
+from django.utils.six.moves import queue
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """
+    A bucket of ``capacity`` tokens refilled with ``rate`` tokens per second.
+
+    A request bigger than the capacity is allowed when the bucket is full,
+    the level then goes negative and the next requests wait for the debt to
+    be refilled.
+    """
+    def __init__(self, rate, capacity=None, clock=time.time):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    @property
+    def level(self):
+        self._refill()
+        return self._tokens
+
+    def can_consume(self, amount):
+        self._refill()
+        return self._tokens >= min(amount, self.capacity)
+
+    def consume(self, amount):
+        """
+        Take ``amount`` tokens and return the number of seconds to wait
+        before they are really available.
+        """
+        self._refill()
+        wait = 0
+        needed = min(amount, self.capacity)
+        if self._tokens < needed:
+            wait = (needed - self._tokens) / self.rate
+        self._tokens -= amount
+        return wait
+
+
+class RateLimiter(object):
+    """
+    Limit the documents/sec and bytes/sec sent by the registry, globally and
+    per index.
+
+    When a write is over the limit, the ``mode`` decides what happens:
+
+    - ``'block'``: the caller waits for the tokens.
+    - ``'queue'``: the write is queued and sent by a background thread as soon
+      as the limit allows it, the caller waits only if ``max_queue`` writes
+      are already queued.
+    - ``'spill'``: the write is appended to the spool of the circuit breaker
+      and replayed right away, through the limits. The next writes are
+      spooled too until the spool is replayed, so they are sent in order.
+    """
+    modes = ('block', 'queue', 'spill')
+
+    def __init__(self, docs_per_second=None, bytes_per_second=None,
+                 burst=1.0, mode='block', indices=None, max_queue=10000,
+                 circuit_breaker=None, clock=time.time, sleep=time.sleep):
+        if mode not in self.modes:
+            raise ImproperlyConfigured(
+                "Invalid rate limit mode {!r}, must be one of {}".format(
+                    mode, ", ".join(self.modes)
+                )
+            )
+        if mode == 'spill' and circuit_breaker is None:
+            raise ImproperlyConfigured(
+                "The 'spill' rate limit mode requires "
+                "ELASTICSEARCH_DSL_CIRCUIT_BREAKER"
+            )
+
+        self.mode = mode
+        self.circuit_breaker = circuit_breaker
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets = {
+            None: self._create_buckets(
+                docs_per_second, bytes_per_second, burst
+            )
+        }
+        for index, options in iteritems(indices or {}):
+            self._buckets[index] = self._create_buckets(
+                options.get('docs_per_second'),
+                options.get('bytes_per_second'),
+                options.get('burst', burst)
+            )
+
+        self._queue = queue.Queue(max_queue)
+        self._worker = None
+
+    def _create_buckets(self, docs_per_second, bytes_per_second, burst):
+        buckets = {}
+        if docs_per_second:
+            buckets['docs'] = TokenBucket(
+                docs_per_second, docs_per_second * burst, self.clock
+            )
+        if bytes_per_second:
+            buckets['bytes'] = TokenBucket(
+                bytes_per_second, bytes_per_second * burst, self.clock
+            )
+        return buckets
+
+    def _get_buckets(self, index, docs, size):
+        buckets = []
+        for key in (None, index):
+            for name, amount in (('docs', docs), ('bytes', size)):
+                bucket = self._buckets.get(key, {}).get(name)
+                if bucket is not None:
+                    buckets.append((bucket, amount))
+        return buckets
+
+    def _needs_size(self, index):
+        return any(
+            'bytes' in self._buckets.get(key, {}) for key in (None, index)
+        )
+
+    def get_levels(self):
+        """
+        Return the current level of each bucket, by index (``None`` is the
+        global limit) and unit, and the size of the queue.
+        """
+        with self._lock:
+            levels = dict(
+                (index, dict(
+                    (name, bucket.level) for name, bucket in iteritems(buckets)
+                ))
+                for index, buckets in iteritems(self._buckets)
+            )
+        levels['queued'] = self._queue.qsize()
+        return levels
+
+    def _acquire(self, buckets):
+        with self._lock:
+            wait = max([bucket.consume(amount) for bucket, amount in buckets]
+                       or [0])
+        if wait > 0:
+            self.sleep(wait)
+
+    def _try_acquire(self, buckets):
+        with self._lock:
+            if not all(bucket.can_consume(amount)
+                       for bucket, amount in buckets):
+                return False
+            for bucket, amount in buckets:
+                bucket.consume(amount)
+            return True
+
+    def _get_action_buckets(self, index, actions, serializer):
+        size = 0
+        if self._needs_size(index):
+            size = sum(len(serializer.dumps(action)) for action in actions)
+        return self._get_buckets(index, len(actions), size)
+
+    def acquire(self, index, actions, serializer):
+        """
+        Wait until the limits allow sending the bulk ``actions`` to
+        ``index``, whatever the mode.
+        """
+        self._acquire(self._get_action_buckets(index, actions, serializer))
+
+    def send(self, doc_instance, actions, send, **kwargs):
+        """
+        Send the prepared bulk ``actions`` of ``doc_instance`` with the
+        ``send(doc_instance, actions, **kwargs)`` callable once the limits
+        allow it.
+        """
+        if self.mode == 'spill' and self.circuit_breaker.is_spilling:
+            # The replay of the spool consumes the tokens
+            return self.circuit_breaker.spill(doc_instance, actions)
+
+        index = str(doc_instance._doc_type.index)
+        buckets = self._get_action_buckets(
+            index, actions, doc_instance.connection.transport.serializer
+        )
+
+        if self.mode == 'block':
+            self._acquire(buckets)
+        elif self._queue.empty() and self._try_acquire(buckets):
+            pass
+        elif self.mode == 'spill':
+            return self.circuit_breaker.spill(doc_instance, actions)
+        else:
+            self._start_worker()
+            self._queue.put((buckets, send, doc_instance, actions, kwargs))
+            return None
+
+        return send(doc_instance, actions, **kwargs)
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run)
+                self._worker.daemon = True
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            buckets, send, doc_instance, actions, kwargs = self._queue.get()
+            try:
+                self._acquire(buckets)
+                send(doc_instance, actions, **kwargs)
+            except Exception:
+                logger.exception("Failed to send a rate limited update")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """
+        Wait until all the queued writes are sent.
+        """
+        self._queue.join()
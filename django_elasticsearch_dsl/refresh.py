@@ -0,0 +1,105 @@
+"""
+Refresh policies applied by ``DocType.update`` after a bulk request.
+"""
+import logging
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .apps import DEDConfig
+from .registries import registry
+
+
+logger = logging.getLogger(__name__)
+
+REFRESH_POLICIES = (True, False, 'wait_for', 'coalesced')
+
+
+def get_refresh_policy(value):
+    """
+    Normalize a refresh setting to one of ``REFRESH_POLICIES``.
+    """
+    if value in ('true', 'false'):
+        return value == 'true'
+    if value not in REFRESH_POLICIES:
+        raise ImproperlyConfigured(
+            "Invalid refresh policy {!r}, must be one of {}".format(
+                value, ", ".join(repr(p) for p in REFRESH_POLICIES)
+            )
+        )
+    return value
+
+
+class CoalescedRefresher(object):
+    """
+    Send at most one ``_refresh`` per index every ``interval`` seconds.
+
+    Writes only mark their index as dirty, a background timer then refreshes
+    all the dirty indices at once, and invalidates their cached searches.
+    Without an explicit ``interval`` the ``ELASTICSEARCH_DSL_REFRESH_INTERVAL``
+    setting is used.
+    """
+    def __init__(self, interval=None):
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+    @property
+    def interval(self):
+        if self._interval is not None:
+            return self._interval
+        return DEDConfig.refresh_interval()
+
+    def schedule(self, connection, index, refresh=True):
+        """
+        Schedule a refresh of ``index`` on the ``connection`` client. With
+        ``refresh=False`` only the cached searches are invalidated, once the
+        periodic refresh of the index made the writes visible.
+        """
+        with self._lock:
+            key = (id(connection), index)
+            if key in self._pending:
+                refresh = refresh or self._pending[key][2]
+            self._pending[key] = (connection, index, refresh)
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """
+        Refresh immediately all the indices with pending writes.
+        """
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        for connection, index, refresh in pending:
+            # Runs in the timer thread, a failure must not prevent the
+            # refresh of the other indices.
+            try:
+                if refresh:
+                    connection.indices.refresh(index=index, ignore=404)
+                # The searches cached between the write and the refresh are
+                # stale.
+                if registry.search_cache is not None:
+                    registry.search_cache.invalidate(index)
+            except Exception:
+                logger.exception("Failed to refresh the index %s", index)
+
+    def cancel(self):
+        """
+        Drop the pending refreshes without sending them.
+        """
+        with self._lock:
+            self._pending.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+refresher = CoalescedRefresher()
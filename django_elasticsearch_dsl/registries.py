@@ -14,6 +14,13 @@ class DocumentRegistry(object):
         self._indices = defaultdict(set)
         self._models = defaultdict(set)
         self._related_models = defaultdict(set)
+        self.circuit_breaker = None
+        self.rate_limiter = None
+        self.search_cache = None
+        self.single_flight = None
+        self.metrics = None
+        self.tracer = None
+        self.slow_log = None
 
     def register(self, index, doc_class):
         """Register the model with the registry"""
@@ -29,6 +36,38 @@ class DocumentRegistry(object):
 
         self._indices[index].add(doc_class)
 
+    def _update_doc(self, doc_instance, thing, **kwargs):
+        """
+        Send an update of the realtime write path to elasticsearch.
+        """
+        if self.circuit_breaker is None and self.rate_limiter is None:
+            return doc_instance.update(thing, **kwargs)
+
+        action = kwargs.pop('action', 'index')
+        actions = list(doc_instance._get_actions(
+            doc_instance._get_object_list(thing), action
+        ))
+        if self.rate_limiter is not None:
+            return self.rate_limiter.send(
+                doc_instance, actions, self._send_actions, **kwargs
+            )
+        return self._send_actions(doc_instance, actions, **kwargs)
+
+    def _send_actions(self, doc_instance, actions, **kwargs):
+        if self.circuit_breaker is not None:
+            return self.circuit_breaker.send(doc_instance, actions, **kwargs)
+        return doc_instance._send_actions(actions, **kwargs)
+
+    def _span(self, name, instance, action='index'):
+        from .tracing import Span
+
+        opts = instance._meta
+        return Span(self.tracer, name, {
+            'model': '{}.{}'.format(opts.app_label, opts.object_name),
+            'action': action,
+            'documents': 0,
+        })
+
     def _get_related_doc(self, instance):
         for model in self._related_models.get(instance.__class__, []):
             for doc in self._models[model]:
@@ -42,11 +81,13 @@ class DocumentRegistry(object):
         if not DEDConfig.autosync_enabled():
             return
 
-        for doc in self._get_related_doc(instance):
-            doc_instance = doc()
-            related = doc_instance.get_instances_from_related(instance)
-            if related is not None:
-                doc_instance.update(related, **kwargs)
+        with self._span('ded.registry.update_related', instance) as s:
+            for doc in self._get_related_doc(instance):
+                doc_instance = doc()
+                related = doc_instance.get_instances_from_related(instance)
+                if related is not None:
+                    self._update_doc(doc_instance, related, **kwargs)
+                    s.attributes['documents'] += 1
 
     def delete_related(self, instance, **kwargs):
         """
@@ -55,11 +96,13 @@ class DocumentRegistry(object):
         if not DEDConfig.autosync_enabled():
             return
 
-        for doc in self._get_related_doc(instance):
-            doc_instance = doc(related_instance_to_ignore=instance)
-            related = doc_instance.get_instances_from_related(instance)
-            if related is not None:
-                doc_instance.update(related, **kwargs)
+        with self._span('ded.registry.delete_related', instance) as s:
+            for doc in self._get_related_doc(instance):
+                doc_instance = doc(related_instance_to_ignore=instance)
+                related = doc_instance.get_instances_from_related(instance)
+                if related is not None:
+                    self._update_doc(doc_instance, related, **kwargs)
+                    s.attributes['documents'] += 1
 
     def update(self, instance, **kwargs):
         """
@@ -70,9 +113,12 @@ class DocumentRegistry(object):
             return
 
         if instance.__class__ in self._models:
-            for doc in self._models[instance.__class__]:
-                if not doc._doc_type.ignore_signals:
-                    doc().update(instance, **kwargs)
+            with self._span('ded.registry.update', instance,
+                            kwargs.get('action', 'index')) as s:
+                for doc in self._models[instance.__class__]:
+                    if not doc._doc_type.ignore_signals:
+                        self._update_doc(doc(), instance, **kwargs)
+                        s.attributes['documents'] += 1
 
     def delete(self, instance, **kwargs):
         """
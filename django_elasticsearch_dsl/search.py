@@ -1,38 +1,498 @@
-from django.db.models import Case, When
+from timeit import default_timer
 
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import router
+from django.utils.six import iteritems
+from elasticsearch.exceptions import TransportError
+from elasticsearch.helpers import scan
+from elasticsearch_dsl import MultiSearch as DSLMultiSearch
 from elasticsearch_dsl import Search as DSLSearch
+from elasticsearch_dsl.connections import connections
+from elasticsearch_dsl.response import Hit, Response as DSLResponse
+
+from .cache import get_search_hash
+from .exceptions import ReadOnlyInstanceError
+from .metrics import record_search
+from .ordering import get_ordering_strategy
+from .registries import registry
+from .tracing import span
+from .utils import get_doc_type
+
+
+def _read_only(*args, **kwargs):
+    raise ReadOnlyInstanceError(
+        "Model instances built from the _source of the hits are read only"
+    )
+
+
+class Response(DSLResponse):
+    def _get_ids(self):
+        return [hit.meta.id for hit in self.hits]
+
+    def to_queryset(self, keep_order=True, **kwargs):
+        """
+        Return a django queryset of the model instances of the hits, see
+        ``Search.to_queryset``.
+        """
+        return self._search._get_queryset(
+            self._get_ids(), keep_order, **kwargs
+        )
+
+
+class RawHit(object):
+    """
+    A hit of a ``raw()`` search, without conversion of its ``_source``.
+    """
+    __slots__ = ('_index', '_type', '_id', '_score', '_source', 'sort')
+
+    def __init__(self, hit):
+        self._index = hit.get('_index')
+        self._type = hit.get('_type')
+        self._id = hit['_id']
+        self._score = hit.get('_score')
+        self._source = hit.get('_source')
+        self.sort = hit.get('sort')
+
+    def __repr__(self):
+        return '<RawHit {}/{}>'.format(self._index, self._id)
+
+    def to_dict(self):
+        return dict(
+            (name, getattr(self, name)) for name in self.__slots__
+            if getattr(self, name) is not None
+        )
+
+
+class RawHits(list):
+    """
+    The hits of a ``RawResponse``, with the ``total`` of the search like the
+    hits of a ``Response``.
+    """
+    def __init__(self, hits, total):
+        super(RawHits, self).__init__(hits)
+        self.total = total
+
+
+class RawResponse(object):
+    """
+    The response of a ``raw()`` search: the hits are plain dicts or
+    ``RawHit`` records, and the rest of the response is the raw dict.
+    """
+    def __init__(self, search, response):
+        self._search = search
+        self._d_ = response
+        self.hits = RawHits(
+            [search._get_result(hit) for hit in response['hits']['hits']],
+            response['hits']['total']
+        )
+
+    def __iter__(self):
+        return iter(self.hits)
+
+    def __len__(self):
+        return len(self.hits)
+
+    def __getitem__(self, key):
+        return self.hits[key]
+
+    @property
+    def total(self):
+        return self._d_['hits']['total']
+
+    @property
+    def aggregations(self):
+        return self._d_.get('aggregations', {})
+
+    def to_dict(self):
+        return self._d_
+
+    def _get_ids(self):
+        return [
+            hit['_id'] if isinstance(hit, dict) else hit._id
+            for hit in self.hits
+        ]
+
+    def to_queryset(self, keep_order=True, **kwargs):
+        """
+        Return a django queryset of the model instances of the hits, see
+        ``Search.to_queryset``.
+        """
+        return self._search._get_queryset(
+            self._get_ids(), keep_order, **kwargs
+        )
 
 
 class Search(DSLSearch):
     def __init__(self, **kwargs):
         self._model = kwargs.pop('model', None)
+        self._cache_timeout = None
+        self._cached = False
+        self._raw = None
         super(Search, self).__init__(**kwargs)
+        self._response_class = Response
 
     def _clone(self):
         s = super(Search, self)._clone()
         s._model = self._model
+        s._cache_timeout = self._cache_timeout
+        s._cached = self._cached
+        s._raw = self._raw
         return s
 
-    def to_queryset(self, keep_order=True):
+    def raw(self, as_dict=False):
+        """
+        Return the hits without wrapping them in documents: ``RawHit``
+        records with the ``_id``, ``_score`` and ``_source`` of the hits, or
+        the hits dicts of the response with ``as_dict``. ``execute`` returns
+        a ``RawResponse``, and ``scan`` yields the raw hits.
+        """
+        s = self._clone()
+        s._raw = 'dict' if as_dict else 'record'
+        s._response_class = RawResponse
+        return s
+
+    def _get_result(self, hit, *args, **kwargs):
+        if self._raw == 'dict':
+            return hit
+        if self._raw == 'record':
+            return RawHit(hit)
+        if hasattr(DSLSearch, '_get_result'):
+            return super(Search, self)._get_result(hit, *args, **kwargs)
+        # Before elasticsearch-dsl 6.0, like Search.scan
+        callback = self._doc_type_map.get(hit['_type'], Hit)
+        callback = getattr(callback, 'from_es', callback)
+        return callback(hit)
+
+    def scan(self):
+        """
+        Extend to yield the raw hits of a ``raw()`` search, which
+        elasticsearch-dsl < 6.0 always wraps.
+        """
+        if self._raw is None:
+            for hit in super(Search, self).scan():
+                yield hit
+            return
+
+        es = connections.get_connection(self._using)
+        for hit in scan(es, query=self.to_dict(), index=self._index,
+                        doc_type=get_doc_type(self), **self._params):
+            yield self._get_result(hit)
+
+    def cache(self, timeout=None, enabled=True):
+        """
+        Cache the response of the search in the
+        ``ELASTICSEARCH_DSL_SEARCH_CACHE`` for ``timeout`` seconds (the
+        timeout of the cache by default).
+
+        The cached responses of the searches on an index are invalidated by
+        the updates of the documents of this index.
+        """
+        if enabled and registry.search_cache is None:
+            raise ImproperlyConfigured(
+                "Search.cache() requires ELASTICSEARCH_DSL_SEARCH_CACHE"
+            )
+        s = self._clone()
+        s._cached = enabled
+        s._cache_timeout = timeout
+        return s
+
+    def execute(self, ignore_cache=False):
+        """
+        Execute the search, or return its cached response if ``cache()`` was
+        called.
+
+        With ``ELASTICSEARCH_DSL_SINGLE_FLIGHT``, an identical search already
+        in flight in the process is waited for and its response is shared.
+        """
+        if not ignore_cache and hasattr(self, '_response'):
+            return self._response
+
+        index = ','.join(self._index) if self._index else '_all'
+        with span('ded.search.execute', index=index,
+                  cached=False) as search_span:
+            search_cache = registry.search_cache if self._cached else None
+            if search_cache is None and registry.single_flight is None:
+                # Nothing to share with other searches, the request of
+                # elasticsearch-dsl is sent.
+                data = self._measure(lambda: super(Search, self).execute(
+                    ignore_cache=True
+                ).to_dict())
+            else:
+                data = None
+                if search_cache is not None:
+                    key = search_cache.get_key(self)
+                    data = search_cache.get(key)
+                    search_span.set_attribute('cached', data is not None)
+
+                if data is None:
+                    data = self._search()
+                    if search_cache is not None:
+                        search_cache.set(key, data, self._cache_timeout)
+                self._response = self._response_class(self, data)
+
+            search_span.set_attribute('hits', data['hits']['total'])
+            search_span.set_attribute('took', data.get('took'))
+
+        return self._response
+
+    def aexecute(self):
+        """
+        Asyncio counterpart of ``execute`` (Python 3.6+), to be awaited.
+        """
+        from . import aio
+
+        return aio.execute(self)
+
+    def aiterate(self, size=1000, preserve_order=False):
+        """
+        Asyncio counterpart of ``scan`` (Python 3.6+), to be iterated with
+        ``async for``.
+        """
+        from . import aio
+
+        return aio.iterate(self, size=size, preserve_order=preserve_order)
+
+    def _measure(self, send):
+        """
+        Return the response of ``send()``, recording its duration in the
+        metrics and the slow log.
+        """
+        start = default_timer()
+        data = send()
+        elapsed = default_timer() - start
+        if registry.metrics is not None:
+            record_search(registry.metrics, self, data, elapsed)
+        if registry.slow_log is not None:
+            registry.slow_log.record(self, elapsed)
+        return data
+
+    def _search(self):
+        es = connections.get_connection(self._using)
+
+        def search():
+            return self._measure(lambda: es.search(
+                index=self._index,
+                doc_type=get_doc_type(self),
+                body=self.to_dict(),
+                **self._params
+            ))
+
+        if registry.single_flight is None:
+            return search()
+        return registry.single_flight.do(get_search_hash(self), search)
+
+    def to_queryset(self, keep_order=True, queryset=None,
+                    select_related=None, prefetch_related=None, only=None):
         """
         This method return a django queryset from the an elasticsearch result.
         It cost a query to the sql db.
+
+        ``keep_order`` can be ``False``, ``True`` to choose the ordering
+        strategy from the number of hits and the database, or the name of a
+        strategy (``'case'``, ``'python'``, ``'array_position'``).
+
+        The instances are fetched from ``queryset``, by default the
+        ``get_queryset()`` of the document of the model, with the
+        ``select_related`` (a list of fields or ``True``),
+        ``prefetch_related`` and ``only`` options.
         """
-        s = self
+        with span('ded.search.to_queryset') as queryset_span:
+            # Do not query again if the es result is already cached
+            if hasattr(self, '_response'):
+                response = self._response
+            else:
+                # We only need the ids of the hits
+                response = self.source(excludes=['*']).raw(
+                    as_dict=True
+                ).execute()
+
+            pks = response._get_ids()
+            queryset = self._get_queryset(
+                pks, keep_order, queryset=queryset,
+                select_related=select_related,
+                prefetch_related=prefetch_related, only=only
+            )
+            opts = queryset.model._meta
+            queryset_span.set_attribute(
+                'model', '{}.{}'.format(opts.app_label, opts.object_name)
+            )
+            queryset_span.set_attribute('pk_count', len(pks))
+        return queryset
 
-        # Do not query again if the es result is already cached
-        if not hasattr(self, '_response'):
-            # We only need the meta fields with the models ids
-            s = self.source(excludes=['*'])
+    def _get_base_queryset(self, queryset=None, select_related=None,
+                           prefetch_related=None, only=None):
+        if queryset is None:
+            doc = self._get_model_doc(required=False)
+            if doc is not None:
+                queryset = doc().get_queryset()
+            else:
+                queryset = self._model._default_manager.all()
 
-        pks = [result._id for result in s]
+        if select_related is True:
+            queryset = queryset.select_related()
+        elif select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if only:
+            queryset = queryset.only(*only)
+        return queryset
 
-        qs = self._model.objects.filter(pk__in=pks)
+    def _get_queryset(self, pks, keep_order=True, **kwargs):
+        qs = self._get_base_queryset(**kwargs).filter(pk__in=pks)
 
         if keep_order:
-            preserved_order = Case(
-                *[When(pk=pk, then=pos) for pos, pk in enumerate(pks)]
-            )
-            qs = qs.order_by(preserved_order)
+            qs = get_ordering_strategy(keep_order, qs, pks).order(qs, pks)
 
         return qs
+
+    def to_models(self, from_source=False, keep_order=True, **kwargs):
+        """
+        Return the list of the model instances of the hits.
+
+        By default the instances are fetched from the sql db with
+        ``to_queryset``. With ``from_source`` they are built from the
+        ``_source`` of the hits without any sql query: only the fields
+        indexed as is (see ``model_fields`` of the doc type) are set, the
+        other fields are deferred and loaded from the sql db when they are
+        accessed. These instances are read only.
+
+        The other ``kwargs`` are passed to ``to_queryset``.
+        """
+        if not from_source:
+            return list(self.to_queryset(keep_order=keep_order, **kwargs))
+
+        model = self._model
+        model_fields = self._get_model_doc()._doc_type.model_fields
+
+        if hasattr(self, '_response'):
+            hits = self._response.to_dict()['hits']['hits']
+        else:
+            s = self.raw(as_dict=True)
+            if self._source is None:
+                # We only need the fields that can be set on the models
+                s = s.source(sorted(model_fields))
+            hits = s.execute().hits
+
+        db = router.db_for_read(model)
+        pk = model._meta.pk
+        instances = []
+        for hit in hits:
+            values = {pk.attname: pk.to_python(hit['_id'])}
+            for name, value in iteritems(hit.get('_source', {})):
+                field = model_fields.get(name)
+                if field is None or field.attname in values:
+                    continue
+                try:
+                    values[field.attname] = field.to_python(value)
+                except ValidationError:
+                    pass
+
+            # from_db defers the missing fields, the loaded ones must be in
+            # the order of the concrete fields
+            attnames = [
+                field.attname for field in model._meta.concrete_fields
+                if field.attname in values
+            ]
+            instance = model.from_db(
+                db, attnames, [values[attname] for attname in attnames]
+            )
+            instance.save = instance.delete = _read_only
+            instances.append(instance)
+
+        return instances
+
+    def _get_model_doc(self, required=True):
+        # Before elasticsearch-dsl 6, _doc_type holds the names of the doc
+        # types and the classes are in _doc_type_map.
+        docs = list(self._doc_type)
+        docs.extend(getattr(self, '_doc_type_map', {}).values())
+        for doc in docs:
+            doc_type = getattr(doc, '_doc_type', None)
+            if getattr(doc_type, 'model', None) is self._model:
+                return doc
+        if not required:
+            return None
+        raise ValueError(
+            "The search has no document of {}".format(self._model.__name__)
+        )
+
+    def iterate_models(self, batch_size=1000, preserve_order=False,
+                       **kwargs):
+        """
+        Iterate over the model instances of all the hits matching the search,
+        in the order of the hits.
+
+        The hits are scrolled without their ``_source`` and the instances are
+        fetched from the sql db by batches of ``batch_size`` ids, so the
+        memory used doesn't depend on the number of hits. By default the
+        hits are scrolled in index order, use ``preserve_order`` to keep the
+        sort of the search (slower). The ``kwargs`` (``queryset``,
+        ``select_related``...) are the options of ``to_queryset``.
+        """
+        s = self.source(excludes=['*']).params(
+            size=batch_size, preserve_order=preserve_order
+        ).raw(as_dict=True)
+
+        pks = []
+        for hit in s.scan():
+            pks.append(hit['_id'])
+            if len(pks) >= batch_size:
+                for instance in self._get_models_by_pks(pks, **kwargs):
+                    yield instance
+                pks = []
+
+        for instance in self._get_models_by_pks(pks, **kwargs):
+            yield instance
+
+    def _get_models_by_pks(self, pks, **kwargs):
+        if not pks:
+            return []
+
+        instances = dict(
+            (str(instance.pk), instance)
+            for instance in self._get_queryset(pks, keep_order=False, **kwargs)
+        )
+        return [instances[pk] for pk in pks if pk in instances]
+
+
+class MultiSearch(DSLMultiSearch):
+    """
+    Send several searches, of any documents and indices, in a single
+    ``_msearch`` request.
+
+    Each search of the multi search gets its response, so ``to_queryset``
+    can be called on the search or on its response.
+    """
+    def execute(self, ignore_cache=False, raise_on_error=True):
+        """
+        Execute the multi search request and return the list of the
+        responses of the searches (``None`` for the failed searches if
+        ``raise_on_error`` is ``False``).
+        """
+        if ignore_cache or not hasattr(self, '_response'):
+            es = connections.get_connection(self._using)
+
+            responses = es.msearch(
+                index=self._index,
+                doc_type=get_doc_type(self),
+                body=self.to_dict(),
+                **self._params
+            )
+
+            out = []
+            for s, r in zip(self._searches, responses['responses']):
+                if r.get('error', False):
+                    if raise_on_error:
+                        raise TransportError(
+                            'N/A', r['error']['type'], r['error']
+                        )
+                    r = None
+                else:
+                    r = getattr(s, '_response_class', DSLResponse)(s, r)
+                    s._response = r
+                out.append(r)
+
+            self._response = out
+
+        return self._response
@@ -6,9 +6,16 @@ cause things to index.
 
 from __future__ import absolute_import
 
-from django.db import models
+import atexit
+from timeit import default_timer
 
+from django.db import models, transaction
+
+from . import outbox
+from .apps import DEDConfig
+from .debounce import Debouncer
 from .registries import registry
+from .tracing import span
 
 
 class BaseSignalProcessor(object):
@@ -42,6 +49,47 @@ class BaseSignalProcessor(object):
         """
         # Do nothing.
 
+    def _measure(self, signal_name, handler, sender, **kwargs):
+        """
+        Call the ``handler`` of the signal, recording its duration with
+        ``ELASTICSEARCH_DSL_METRICS`` and ``ELASTICSEARCH_DSL_TRACING``.
+        """
+        metrics = registry.metrics
+        if metrics is None and registry.tracer is None:
+            return handler(sender, **kwargs)
+
+        model = '{}.{}'.format(
+            sender._meta.app_label, sender._meta.object_name
+        )
+        start = default_timer()
+        try:
+            with span('ded.signal', signal=signal_name, model=model):
+                return handler(sender, **kwargs)
+        finally:
+            if metrics is not None:
+                metrics.observe(
+                    'ded_signal_handler_seconds', default_timer() - start,
+                    signal=signal_name, model=model
+                )
+
+    def on_post_save(self, sender, **kwargs):
+        return self._measure('post_save', self.handle_save, sender, **kwargs)
+
+    def on_post_delete(self, sender, **kwargs):
+        return self._measure(
+            'post_delete', self.handle_delete, sender, **kwargs
+        )
+
+    def on_pre_delete(self, sender, **kwargs):
+        return self._measure(
+            'pre_delete', self.handle_pre_delete, sender, **kwargs
+        )
+
+    def on_m2m_changed(self, sender, **kwargs):
+        return self._measure(
+            'm2m_changed', self.handle_m2m_changed, sender, **kwargs
+        )
+
     def handle_m2m_changed(self, sender, instance, action, **kwargs):
         if action in ('post_add', 'post_remove', 'post_clear'):
             self.handle_save(sender, instance)
@@ -81,16 +129,90 @@ class RealTimeSignalProcessor(BaseSignalProcessor):
 
     def setup(self):
         # Listen to all model saves.
-        models.signals.post_save.connect(self.handle_save)
-        models.signals.post_delete.connect(self.handle_delete)
+        models.signals.post_save.connect(self.on_post_save)
+        models.signals.post_delete.connect(self.on_post_delete)
 
         # Use to manage related objects update
-        models.signals.m2m_changed.connect(self.handle_m2m_changed)
-        models.signals.pre_delete.connect(self.handle_pre_delete)
+        models.signals.m2m_changed.connect(self.on_m2m_changed)
+        models.signals.pre_delete.connect(self.on_pre_delete)
 
     def teardown(self):
         # Listen to all model saves.
-        models.signals.post_save.disconnect(self.handle_save)
-        models.signals.post_delete.disconnect(self.handle_delete)
-        models.signals.m2m_changed.disconnect(self.handle_m2m_changed)
-        models.signals.pre_delete.disconnect(self.handle_pre_delete)
+        models.signals.post_save.disconnect(self.on_post_save)
+        models.signals.post_delete.disconnect(self.on_post_delete)
+        models.signals.m2m_changed.disconnect(self.on_m2m_changed)
+        models.signals.pre_delete.disconnect(self.on_pre_delete)
+
+
+class OutboxSignalProcessor(RealTimeSignalProcessor):
+    """Outbox signal processor.
+
+    Writes the updates to the ``OutboxEntry`` table in the same transaction
+    as the model change instead of calling elasticsearch. The entries are
+    sent with ``search_index --drain-outbox``.
+    """
+
+    def handle_save(self, sender, instance, **kwargs):
+        outbox.enqueue(instance)
+        outbox.enqueue_related(instance)
+
+    def handle_pre_delete(self, sender, instance, **kwargs):
+        outbox.enqueue_related(instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        outbox.enqueue(instance, action='delete')
+
+
+class DebouncedSignalProcessor(RealTimeSignalProcessor):
+    """Debounced signal processor.
+
+    Collects the updates of the saved and deleted rows once their
+    transaction is committed, and sends only the latest one per document and
+    object after a quiet window (see ``ELASTICSEARCH_DSL_DEBOUNCE``). The
+    pending updates are sent when the interpreter exits.
+    """
+
+    def setup(self):
+        self.debouncer = Debouncer(**DEDConfig.debounce_settings())
+        self.debouncer.start()
+        atexit.register(self.debouncer.stop)
+        super(DebouncedSignalProcessor, self).setup()
+
+    def teardown(self):
+        super(DebouncedSignalProcessor, self).teardown()
+        # atexit.unregister is not available with python 2
+        if hasattr(atexit, 'unregister'):
+            atexit.unregister(self.debouncer.stop)
+        self.debouncer.stop()
+
+    def _on_commit(self, func):
+        # transaction.on_commit is not available with django < 1.9
+        if hasattr(transaction, 'on_commit'):
+            transaction.on_commit(func)
+        else:
+            func()
+
+    def handle_save(self, sender, instance, **kwargs):
+        if not DEDConfig.autosync_enabled():
+            return
+
+        def add():
+            self.debouncer.add_instance(instance)
+            self.debouncer.add_all(self.debouncer.get_related_pks(instance))
+        self._on_commit(add)
+
+    def handle_pre_delete(self, sender, instance, **kwargs):
+        if not DEDConfig.autosync_enabled():
+            return
+
+        # The relations don't exist anymore once the transaction is committed
+        related_pks = self.debouncer.get_related_pks(instance)
+        self._on_commit(lambda: self.debouncer.add_all(related_pks))
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if not DEDConfig.autosync_enabled():
+            return
+
+        self._on_commit(
+            lambda: self.debouncer.add_instance(instance, action='delete')
+        )
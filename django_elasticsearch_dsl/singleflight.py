@@ -0,0 +1,78 @@
+"""
+Single-flight deduplication of identical concurrent searches.
+"""
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight(object):
+    """
+    Run only one call at a time per key: the callers of ``do`` with the key
+    of a call in flight wait for it and share its result (or exception)
+    instead of running their own.
+
+    A follower doesn't wait more than ``max_wait`` seconds, it then runs its
+    own call.
+    """
+    def __init__(self, max_wait=None):
+        self.max_wait = max_wait
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, max_wait=None):
+        """
+        Return the result of ``fn()``, or of the call in flight with the same
+        ``key``.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(self.max_wait if max_wait is None else max_wait):
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do_async(self, key, fn, max_wait=None, loop=None):
+        """
+        Return an asyncio future of ``do(key, fn, max_wait)`` run in the
+        default executor of ``loop``, so the asyncio callers share the calls
+        in flight with the other threads.
+        """
+        import asyncio
+
+        loop = loop or asyncio.get_event_loop()
+        return loop.run_in_executor(None, self.do, key, fn, max_wait)
+
+    def in_flight(self):
+        """
+        Return the number of followers waiting for each call in flight.
+        """
+        with self._lock:
+            return dict(
+                (key, call.followers) for key, call in self._calls.items()
+            )
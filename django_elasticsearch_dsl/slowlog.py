@@ -0,0 +1,163 @@
+"""
+Opt-in log of the slow searches, enabled with the
+``ELASTICSEARCH_DSL_SLOW_LOG`` setting.
+
+The searches are grouped by fingerprint: a hash of their body with the
+literal values replaced by ``?``, so the searches only differing by the
+user input share their latency histogram. The body of a search slower than
+the threshold is logged in full.
+"""
+import hashlib
+import json
+import logging
+import threading
+
+from django.utils.six import iteritems
+
+from .cache import LRUCache
+from .metrics import TIME_BUCKETS
+
+
+logger = logging.getLogger(__name__)
+
+# Keys whose values are names of fields or options rather than user input
+STRUCTURAL_KEYS = frozenset([
+    '_source', 'boost_mode', 'default_operator', 'excludes', 'field',
+    'fields', 'format', 'includes', 'mode', 'operator', 'order', 'path',
+    'score_mode', 'sort', 'type',
+])
+
+
+def normalize(value, structural=False):
+    """
+    Return ``value`` with the literal values replaced by ``'?'``, except
+    below the ``STRUCTURAL_KEYS``. A list of literals is replaced by a single
+    ``'?'``, whatever its length.
+    """
+    if isinstance(value, dict):
+        return dict(
+            (key, normalize(item, structural or key in STRUCTURAL_KEYS))
+            for key, item in iteritems(value)
+        )
+    if isinstance(value, (list, tuple)):
+        if not structural and not any(
+                isinstance(item, (dict, list, tuple)) for item in value):
+            return '?'
+        return [normalize(item, structural) for item in value]
+    return value if structural else '?'
+
+
+def get_fingerprint(body):
+    """
+    Return the fingerprint of the body of a search and its normalized body.
+    """
+    normalized = json.dumps(
+        normalize(body), sort_keys=True, separators=(',', ':'), default=str
+    )
+    fingerprint = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+    return fingerprint, normalized
+
+
+class SlowLog(object):
+    """
+    Keep the count, total and max time and histogram of the searches by
+    fingerprint in ``backend`` (an in-process ``LRUCache`` by default, or a
+    ``DjangoCache`` to share them between the processes), and log the
+    searches taking ``threshold`` seconds or more.
+
+    At most ``max_fingerprints`` fingerprints are recorded, the searches of
+    the others are only logged.
+    """
+    def __init__(self, backend=None, threshold=1.0, buckets=TIME_BUCKETS,
+                 max_fingerprints=1000, key_prefix='ded:slowlog'):
+        if backend is None:
+            backend = LRUCache(max_entries=max_fingerprints + 1)
+        self.backend = backend
+        self.threshold = threshold
+        self.buckets = tuple(buckets)
+        self.max_fingerprints = max_fingerprints
+        self.key_prefix = key_prefix
+        self._lock = threading.Lock()
+
+    def _get_key(self, fingerprint=None):
+        if fingerprint is None:
+            return '{}:fingerprints'.format(self.key_prefix)
+        return '{}:{}'.format(self.key_prefix, fingerprint)
+
+    def record(self, search, elapsed):
+        """
+        Record a search which took ``elapsed`` seconds.
+        """
+        body = search.to_dict()
+        fingerprint, normalized = get_fingerprint(body)
+        index = search._index
+        index = ','.join(index) if index else '_all'
+
+        if elapsed >= self.threshold:
+            logger.warning(
+                "Slow search (%.3fs) on %s, fingerprint %s: %s",
+                elapsed, index, fingerprint,
+                json.dumps(body, sort_keys=True, default=str)
+            )
+
+        # The updates of a shared backend are not atomic between the
+        # processes, a few measures may be lost.
+        with self._lock:
+            fingerprints = self.backend.get(self._get_key()) or []
+            if fingerprint not in fingerprints:
+                if len(fingerprints) >= self.max_fingerprints:
+                    return
+                fingerprints.append(fingerprint)
+                self.backend.set(self._get_key(), fingerprints, None)
+
+            key = self._get_key(fingerprint)
+            stats = self.backend.get(key) or {
+                'fingerprint': fingerprint,
+                'index': index,
+                'query': normalized,
+                'count': 0,
+                'total': 0.0,
+                'max': 0.0,
+                'buckets': [0] * len(self.buckets),
+            }
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+            for i, bound in enumerate(self.buckets):
+                if elapsed <= bound:
+                    stats['buckets'][i] += 1
+            self.backend.set(key, stats, None)
+
+    def get_percentile(self, stats, percentile):
+        """
+        Return the upper bound of the histogram bucket of ``percentile``
+        (between 0 and 100), or the max time if it is above the buckets.
+        """
+        rank = stats['count'] * percentile / 100.0
+        for bound, count in zip(self.buckets, stats['buckets']):
+            if count >= rank:
+                return bound
+        return stats['max']
+
+    def get_stats(self, limit=None):
+        """
+        Return the stats of the fingerprints, by total time descending.
+        """
+        fingerprints = self.backend.get(self._get_key()) or []
+        results = []
+        for fingerprint in fingerprints:
+            stats = self.backend.get(self._get_key(fingerprint))
+            if stats is not None:
+                results.append(dict(
+                    stats, mean=stats['total'] / stats['count'],
+                    p99=self.get_percentile(stats, 99)
+                ))
+        results.sort(key=lambda s: (-s['total'], s['fingerprint']))
+        return results[:limit]
+
+    def reset(self):
+        with self._lock:
+            fingerprints = self.backend.get(self._get_key()) or []
+            for fingerprint in fingerprints:
+                self.backend.set(self._get_key(fingerprint), None, 0)
+            self.backend.set(self._get_key(), [], None)
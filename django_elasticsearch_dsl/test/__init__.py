@@ -1,4 +1,8 @@
-from .testcases import ESTestCase
+from .fake import FakeCluster, FakeConnection, FakeConnections, fake_cluster
+from .testcases import ESTestCase, ESTestRunner
 
 
-__all__ = ['ESTestCase']
+__all__ = [
+    'ESTestCase', 'ESTestRunner', 'FakeCluster', 'FakeConnection',
+    'FakeConnections', 'fake_cluster',
+]
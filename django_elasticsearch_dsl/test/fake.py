@@ -0,0 +1,1170 @@
+"""
+In-memory stand-in for an elasticsearch cluster, to run the tests and the
+benchmarks without a server::
+
+    from elasticsearch_dsl.connections import connections
+    from django_elasticsearch_dsl.test import FakeConnection
+
+    connections.configure(default={'connection_class': FakeConnection})
+
+The documents are kept in the memory of the process, in a ``FakeCluster``
+shared by the connections (``fake_cluster`` unless a ``cluster`` is given
+to the connection). It supports the index, mapping, alias, document, bulk,
+refresh, search, count, scroll, delete by query and reindex (and its task)
+APIs with the common
+queries (``match_all``, ``term``, ``terms``, ``ids``, ``match``,
+``multi_match``, ``range``, ``exists``, ``bool``) and the ``terms``
+aggregation, without text analysis nor scoring. Like elasticsearch, the
+documents are searchable only after a refresh.
+
+``FakeConnections`` configures the connections for the duration of a test
+and restores them afterwards.
+
+Each request is recorded, with the bytes sent and received, for the
+performance assertions::
+
+    fake_cluster.reset_stats()
+    car.save()
+    self.assertEqual(fake_cluster.count('bulk'), 1)
+"""
+from collections import namedtuple, OrderedDict
+from fnmatch import fnmatch
+from functools import cmp_to_key
+import copy
+import itertools
+import json
+import re
+import threading
+import uuid
+
+from django.utils.six import string_types, text_type
+from django.utils.six.moves.urllib.parse import unquote
+from elasticsearch import Connection
+from elasticsearch_dsl.connections import connections
+
+
+FakeRequest = namedtuple(
+    'FakeRequest', 'method path endpoint status bytes_sent bytes_received'
+)
+FakeResponse = namedtuple('FakeResponse', 'status data')
+
+
+class FakeError(Exception):
+    """
+    Error response of the fake cluster.
+    """
+    def __init__(self, status, error_type, reason):
+        super(FakeError, self).__init__(reason)
+        self.status = status
+        self.error_type = error_type
+        self.reason = reason
+
+    def to_dict(self):
+        return {
+            'error': {'type': self.error_type, 'reason': self.reason},
+            'status': self.status,
+        }
+
+
+def _unsupported(what):
+    return FakeError(
+        400, 'parsing_exception', 'Unsupported by the fake cluster: %s' % what
+    )
+
+
+def _merge(target, data):
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _tokens(value):
+    return re.findall(r'\w+', text_type(value).lower(), re.UNICODE)
+
+
+def _get_values(source, path):
+    """
+    Return the values of the dotted ``path`` in ``source``, the lists are
+    flattened. The sub-fields of a multi-field (``name.raw``) resolve to the
+    values of the field.
+    """
+    values = [source]
+    for key in path.split('.'):
+        found = []
+        for value in values:
+            if isinstance(value, dict) and key in value:
+                found.extend(_as_list(value[key]))
+        values = found
+    if not values and '.' in path:
+        return _get_values(source, path.rsplit('.', 1)[0])
+    return [value for value in values if value is not None]
+
+
+def _all_values(value):
+    if isinstance(value, dict):
+        return [v for item in value.values() for v in _all_values(item)]
+    if isinstance(value, list):
+        return [v for item in value for v in _all_values(item)]
+    return [] if value is None else [value]
+
+
+def _term_matches(value, term):
+    if value == term or text_type(value) == text_type(term):
+        return True
+    if isinstance(value, bool) or isinstance(term, bool):
+        return text_type(value).lower() == text_type(term).lower()
+    if isinstance(value, string_types):
+        return text_type(term).lower() in _tokens(value) + [value.lower()]
+    return False
+
+
+def _compare(a, b):
+    if a == b:
+        return 0
+    try:
+        return -1 if a < b else 1
+    except TypeError:
+        return -1 if text_type(a) < text_type(b) else 1
+
+
+def _filter_source(source, spec):
+    if spec is None or spec is True or spec == 'true':
+        return source
+    if spec is False or spec == 'false':
+        return None
+    if isinstance(spec, dict):
+        includes = _as_list(spec.get('includes', spec.get('include')))
+        excludes = _as_list(spec.get('excludes', spec.get('exclude')))
+    else:
+        includes = _as_list(spec)
+        if len(includes) == 1 and isinstance(includes[0], string_types):
+            includes = includes[0].split(',')
+        excludes = []
+
+    def matches(key, patterns):
+        return any(
+            fnmatch(key, p) or p.startswith(key + '.') for p in patterns
+        )
+
+    return dict(
+        (key, value) for key, value in source.items()
+        if (not includes or matches(key, includes)) and
+        not any(fnmatch(key, p) for p in excludes)
+    )
+
+
+class FakeIndex(object):
+    """
+    An index of the fake cluster. ``docs`` are the documents written and
+    ``searchable`` the documents of the last refresh.
+    """
+    def __init__(self, name, settings=None, mappings=None):
+        self.name = name
+        self.settings = {}
+        self.mappings = {}
+        self.aliases = set()
+        self.docs = OrderedDict()
+        self.searchable = OrderedDict()
+        if settings:
+            self.put_settings(settings)
+        if mappings:
+            for doc_type, mapping in mappings.items():
+                self.put_mapping(doc_type, mapping)
+
+    def put_settings(self, settings):
+        settings = copy.deepcopy(settings)
+        index_settings = settings.pop('index', {})
+        _merge(self.settings, settings)
+        _merge(self.settings, index_settings)
+
+    def put_mapping(self, doc_type, mapping):
+        current = self.mappings.setdefault(doc_type, {})
+        self._check_properties(
+            current.get('properties', {}), mapping.get('properties', {})
+        )
+        _merge(current, mapping)
+
+    def _check_properties(self, current, new, prefix=''):
+        for name, field in new.items():
+            if name not in current:
+                continue
+            old_type = current[name].get('type', 'object')
+            new_type = field.get('type', 'object')
+            if old_type != new_type:
+                raise FakeError(
+                    400, 'illegal_argument_exception',
+                    'mapper [%s%s] of different type, current_type [%s], '
+                    'merged_type [%s]' % (prefix, name, old_type, new_type)
+                )
+            self._check_properties(
+                current[name].get('properties', {}),
+                field.get('properties', {}),
+                prefix + name + '.'
+            )
+
+    def refresh(self):
+        self.searchable = OrderedDict(self.docs)
+
+
+class FakeCluster(object):
+    """
+    In-memory indices answering the requests of ``FakeConnection``.
+    """
+    version = '6.8.0'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Delete all the indices and forget the recorded requests.
+        """
+        with self._lock:
+            self.indices = OrderedDict()
+            self.scrolls = {}
+            self.tasks = {}
+            self._seq_no = itertools.count()
+            self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Forget the recorded requests.
+        """
+        self.requests = []
+
+    def _get_requests(self, endpoint):
+        return [
+            r for r in self.requests
+            if endpoint is None or r.endpoint == endpoint
+        ]
+
+    def count(self, endpoint=None):
+        """
+        Return the number of requests recorded (to ``endpoint``).
+        """
+        return len(self._get_requests(endpoint))
+
+    def bytes_sent(self, endpoint=None):
+        return sum(r.bytes_sent for r in self._get_requests(endpoint))
+
+    def bytes_received(self, endpoint=None):
+        return sum(r.bytes_received for r in self._get_requests(endpoint))
+
+    def record(self, request):
+        self.requests.append(request)
+
+    # Indices
+
+    def _resolve(self, names, allow_missing=False):
+        """
+        Return the indices of the comma separated ``names``, which may be
+        wildcards or aliases.
+        """
+        if names in (None, '', '_all', '*'):
+            return list(self.indices.values())
+        result = []
+        for name in names.split(','):
+            if '*' in name or '?' in name:
+                result.extend(
+                    index for index in self.indices.values()
+                    if fnmatch(index.name, name) or
+                    any(fnmatch(alias, name) for alias in index.aliases)
+                )
+            elif name in self.indices:
+                result.append(self.indices[name])
+            else:
+                aliased = [
+                    index for index in self.indices.values()
+                    if name in index.aliases
+                ]
+                if not aliased and not allow_missing:
+                    raise FakeError(
+                        404, 'index_not_found_exception',
+                        'no such index [%s]' % name
+                    )
+                result.extend(aliased)
+        return list(OrderedDict((index.name, index) for index in result)
+                    .values())
+
+    def _get_write_index(self, name):
+        if name in self.indices:
+            return self.indices[name]
+        aliased = [i for i in self.indices.values() if name in i.aliases]
+        if len(aliased) > 1:
+            raise FakeError(
+                400, 'illegal_argument_exception',
+                'no write index is defined for alias [%s]' % name
+            )
+        if aliased:
+            return aliased[0]
+        self.indices[name] = FakeIndex(name)
+        return self.indices[name]
+
+    def create_index(self, name, body):
+        if name in self.indices:
+            raise FakeError(
+                400, 'resource_already_exists_exception',
+                'index [%s] already exists' % name
+            )
+        body = body or {}
+        index = FakeIndex(name, body.get('settings'), body.get('mappings'))
+        index.aliases.update(body.get('aliases', {}))
+        self.indices[name] = index
+        return {'acknowledged': True, 'index': name}
+
+    def delete_index(self, names):
+        # Like elasticsearch 6, the wildcards only match the concrete
+        # indices, and an alias is refused.
+        indices = []
+        for name in (names or '_all').split(','):
+            if name in ('_all', '*') or '*' in name or '?' in name:
+                indices.extend(
+                    index for index in self.indices.values()
+                    if name == '_all' or fnmatch(index.name, name)
+                )
+            elif name in self.indices:
+                indices.append(self.indices[name])
+            elif any(name in index.aliases for index in self.indices.values()):
+                raise FakeError(
+                    400, 'illegal_argument_exception',
+                    'The provided expression [%s] matches an alias, specify '
+                    'the corresponding concrete indices instead.' % name
+                )
+            else:
+                raise FakeError(
+                    404, 'index_not_found_exception',
+                    'no such index [%s]' % name
+                )
+        for index in indices:
+            self.indices.pop(index.name, None)
+        return {'acknowledged': True}
+
+    def get_mapping(self, names, doc_type=None):
+        return dict(
+            (index.name, {'mappings': dict(
+                (name, copy.deepcopy(mapping))
+                for name, mapping in index.mappings.items()
+                if doc_type is None or name in doc_type.split(',')
+            )})
+            for index in self._resolve(names)
+        )
+
+    def put_mapping(self, names, doc_type, body):
+        indices = self._resolve(names)
+        for index in indices:
+            index._check_properties(
+                index.mappings.get(doc_type, {}).get('properties', {}),
+                body.get('properties', {})
+            )
+        for index in indices:
+            index.put_mapping(doc_type, body)
+        return {'acknowledged': True}
+
+    def get_settings(self, names):
+        return dict(
+            (index.name, {
+                'settings': {'index': copy.deepcopy(index.settings)}
+            })
+            for index in self._resolve(names)
+        )
+
+    def put_settings(self, names, body):
+        for index in self._resolve(names):
+            index.put_settings(body)
+        return {'acknowledged': True}
+
+    def refresh(self, names):
+        indices = self._resolve(names)
+        for index in indices:
+            index.refresh()
+        return {'_shards': {
+            'total': len(indices), 'successful': len(indices), 'failed': 0
+        }}
+
+    # Aliases
+
+    def get_aliases(self, names, alias=None):
+        result = {}
+        for index in self._resolve(names, allow_missing=True):
+            aliases = [
+                name for name in sorted(index.aliases)
+                if alias is None or
+                any(fnmatch(name, a) for a in alias.split(','))
+            ]
+            if aliases or alias is None:
+                result[index.name] = {
+                    'aliases': dict((name, {}) for name in aliases)
+                }
+        if alias is not None and not result:
+            raise FakeError(
+                404, 'aliases_not_found_exception',
+                'aliases [%s] missing' % alias
+            )
+        return result
+
+    def update_aliases(self, body):
+        actions = []
+        for action in body.get('actions', []):
+            (op, options), = action.items()
+            names = options.get('index', options.get('indices'))
+            indices = self._resolve(','.join(_as_list(names)))
+            aliases = _as_list(options.get('alias', options.get('aliases')))
+            actions.append((op, indices, aliases))
+        for op, indices, aliases in actions:
+            for index in indices:
+                if op == 'add':
+                    index.aliases.update(aliases)
+                elif op == 'remove':
+                    index.aliases.difference_update(aliases)
+                elif op == 'remove_index':
+                    self.indices.pop(index.name, None)
+                else:
+                    raise _unsupported('alias action %s' % op)
+        return {'acknowledged': True}
+
+    # Documents
+
+    def _write(self, index, doc_type, doc_id, source, op_type='index'):
+        current = index.docs.get(doc_id)
+        if op_type == 'create' and current is not None:
+            raise FakeError(
+                409, 'version_conflict_engine_exception',
+                '[%s][%s]: version conflict, document already exists' % (
+                    doc_type, doc_id
+                )
+            )
+        version = current['_version'] + 1 if current else 1
+        index.docs[doc_id] = {
+            '_type': doc_type,
+            '_id': doc_id,
+            '_version': version,
+            '_seq_no': next(self._seq_no),
+            '_source': source,
+        }
+        return self._write_result(
+            index, index.docs[doc_id], 'updated' if current else 'created',
+            200 if current else 201
+        )
+
+    def _write_result(self, index, record, result, status):
+        return {
+            '_index': index.name,
+            '_type': record['_type'],
+            '_id': record['_id'],
+            '_version': record['_version'],
+            'result': result,
+            '_shards': {'total': 1, 'successful': 1, 'failed': 0},
+            'status': status,
+        }
+
+    def index_doc(self, name, doc_type, doc_id, source, op_type='index'):
+        index = self._get_write_index(name)
+        if doc_id is None:
+            doc_id = uuid.uuid4().hex
+        return self._write(index, doc_type, text_type(doc_id), source,
+                           op_type)
+
+    def update_doc(self, name, doc_type, doc_id, body):
+        index = self._get_write_index(name)
+        doc_id = text_type(doc_id)
+        if 'script' in body:
+            raise _unsupported('update scripts')
+        current = index.docs.get(doc_id)
+        if current is None:
+            if body.get('doc_as_upsert'):
+                return self._write(index, doc_type, doc_id, body['doc'])
+            if 'upsert' in body:
+                return self._write(index, doc_type, doc_id, body['upsert'])
+            raise FakeError(
+                404, 'document_missing_exception',
+                '[%s][%s]: document missing' % (doc_type, doc_id)
+            )
+        source = _merge(copy.deepcopy(current['_source']), body.get('doc', {}))
+        if source == current['_source']:
+            return self._write_result(index, current, 'noop', 200)
+        return self._write(index, current['_type'], doc_id, source)
+
+    def delete_doc(self, name, doc_type, doc_id):
+        index = self._get_write_index(name)
+        doc_id = text_type(doc_id)
+        record = index.docs.pop(doc_id, None)
+        if record is None:
+            return self._write_result(index, {
+                '_type': doc_type, '_id': doc_id, '_version': 1
+            }, 'not_found', 404)
+        record = dict(record, _version=record['_version'] + 1)
+        return self._write_result(index, record, 'deleted', 200)
+
+    def get_doc(self, name, doc_type, doc_id, source=None):
+        doc_id = text_type(doc_id)
+        for index in self._resolve(name):
+            record = index.docs.get(doc_id)
+            if record is not None and doc_type in (None, '_all', '_doc',
+                                                   record['_type']):
+                result = {
+                    '_index': index.name,
+                    '_type': record['_type'],
+                    '_id': doc_id,
+                    '_version': record['_version'],
+                    'found': True,
+                }
+                data = _filter_source(record['_source'], source)
+                if data is not None:
+                    result['_source'] = data
+                return result
+        return {'_index': name, '_type': doc_type, '_id': doc_id,
+                'found': False}
+
+    def mget(self, name, doc_type, body, source=None):
+        docs = body.get('docs') or [{'_id': i} for i in body.get('ids', [])]
+        return {'docs': [
+            self.get_doc(
+                doc.get('_index', name), doc.get('_type', doc_type),
+                doc['_id'], doc.get('_source', source)
+            ) for doc in docs
+        ]}
+
+    def bulk(self, name, doc_type, lines):
+        items = []
+        lines = iter(lines)
+        for line in lines:
+            (op, meta), = line.items()
+            index = meta.get('_index', name)
+            type_ = meta.get('_type', doc_type)
+            doc_id = meta.get('_id')
+            try:
+                if op in ('index', 'create'):
+                    result = self.index_doc(
+                        index, type_, doc_id, next(lines), op
+                    )
+                elif op == 'update':
+                    result = self.update_doc(index, type_, doc_id, next(lines))
+                elif op == 'delete':
+                    result = self.delete_doc(index, type_, doc_id)
+                else:
+                    raise _unsupported('bulk action %s' % op)
+            except FakeError as e:
+                result = {
+                    '_index': index, '_type': type_, '_id': doc_id,
+                    'status': e.status, 'error': e.to_dict()['error'],
+                }
+            items.append({op: result})
+        return {
+            'took': 1,
+            'errors': any('error' in item[op] for item in items
+                          for op in item),
+            'items': items,
+        }
+
+    # Search
+
+    def _match(self, record, query):
+        if not query:
+            return True
+        (kind, options), = query.items()
+        source = record['_source']
+
+        if kind == 'match_all':
+            return True
+        if kind == 'match_none':
+            return False
+        if kind == 'ids':
+            return record['_id'] in [
+                text_type(i) for i in _as_list(options.get('values'))
+            ]
+        if kind == 'bool':
+            must = _as_list(options.get('must')) + \
+                _as_list(options.get('filter'))
+            should = _as_list(options.get('should'))
+            minimum = options.get('minimum_should_match',
+                                  0 if must else min(len(should), 1))
+            return (
+                all(self._match(record, q) for q in must) and
+                not any(self._match(record, q)
+                        for q in _as_list(options.get('must_not'))) and
+                sum(1 for q in should if self._match(record, q)) >=
+                int(minimum)
+            )
+        if kind == 'constant_score':
+            return self._match(record, options.get('filter'))
+        if kind == 'exists':
+            return bool(_get_values(source, options['field']))
+        if kind == 'multi_match':
+            fields = options.get('fields')
+            values = (
+                [v for f in fields for v in _get_values(source, f)]
+                if fields else _all_values(source)
+            )
+            return self._match_text(values, options['query'],
+                                    options.get('operator', 'or'))
+
+        field, value = [
+            (k, v) for k, v in options.items() if not k.startswith('_')
+        ][0]
+        values = _get_values(source, field)
+        if kind == 'term':
+            term = value.get('value') if isinstance(value, dict) else value
+            return any(_term_matches(v, term) for v in values)
+        if kind == 'terms':
+            return any(_term_matches(v, t) for v in values for t in value)
+        if kind in ('match', 'match_phrase'):
+            if not isinstance(value, dict):
+                value = {'query': value}
+            return self._match_text(
+                values, value['query'], value.get('operator', 'or')
+            )
+        if kind == 'prefix':
+            prefix = value.get('value') if isinstance(value, dict) else value
+            return any(text_type(v).lower().startswith(text_type(prefix)
+                                                       .lower())
+                       for v in values)
+        if kind == 'range':
+            return any(self._in_range(v, value) for v in values)
+        raise _unsupported('%s query' % kind)
+
+    def _match_text(self, values, text, operator):
+        tokens = set(t for v in values for t in _tokens(v))
+        query_tokens = _tokens(text)
+        check = all if operator.lower() == 'and' else any
+        return bool(query_tokens) and check(t in tokens for t in query_tokens)
+
+    def _in_range(self, value, bounds):
+        checks = {
+            'gt': lambda c: c > 0, 'gte': lambda c: c >= 0,
+            'lt': lambda c: c < 0, 'lte': lambda c: c <= 0,
+        }
+        return all(
+            checks[op](_compare(value, bound))
+            for op, bound in bounds.items() if op in checks
+        )
+
+    def _get_sort(self, sort):
+        result = []
+        for key in _as_list(sort):
+            if isinstance(key, string_types):
+                for name in key.split(','):
+                    field, _, order = name.partition(':')
+                    default = 'desc' if field == '_score' else 'asc'
+                    result.append((field, order or default))
+            else:
+                (field, order), = key.items()
+                if isinstance(order, dict):
+                    order = order.get('order', 'asc')
+                result.append((field, order))
+        return result
+
+    def _get_sort_values(self, record, sort):
+        values = []
+        for field, order in sort:
+            if field == '_score':
+                values.append(1.0)
+            elif field == '_doc':
+                values.append(record['_seq_no'])
+            elif field in ('_id', '_uid'):
+                values.append(record['_id'])
+            else:
+                found = _get_values(record['_source'], field)
+                if not found:
+                    values.append(None)
+                else:
+                    values.append((min if order == 'asc' else max)(
+                        found, key=cmp_to_key(_compare)
+                    ))
+        return values
+
+    def _compare_sort_values(self, a, b, sort):
+        for (field, order), x, y in zip(sort, a, b):
+            # The missing values are last in both orders
+            if x is None or y is None:
+                result = (x is None) - (y is None)
+            else:
+                result = _compare(x, y)
+                if order == 'desc':
+                    result = -result
+            if result:
+                return result
+        return 0
+
+    def _aggregate(self, records, aggs):
+        result = {}
+        for name, agg in aggs.items():
+            agg = dict(agg)
+            sub_aggs = agg.pop('aggs', agg.pop('aggregations', None))
+            agg.pop('meta', None)
+            (kind, options), = agg.items()
+            if kind == 'value_count':
+                result[name] = {'value': sum(
+                    len(_get_values(r['_source'], options['field']))
+                    for r in records
+                )}
+                continue
+            if kind != 'terms':
+                raise _unsupported('%s aggregation' % kind)
+            buckets = OrderedDict()
+            for record in records:
+                keys = OrderedDict.fromkeys(
+                    _get_values(record['_source'], options['field'])
+                )
+                for key in keys:
+                    buckets.setdefault(key, []).append(record)
+            ordered = sorted(
+                buckets.items(),
+                key=cmp_to_key(lambda a, b: (len(b[1]) - len(a[1])) or
+                               _compare(a[0], b[0]))
+            )
+            size = options.get('size', 10)
+            result[name] = {
+                'doc_count_error_upper_bound': 0,
+                'sum_other_doc_count': sum(len(r) for k, r in ordered[size:]),
+                'buckets': [],
+            }
+            for key, bucket_records in ordered[:size]:
+                bucket = {'key': key, 'doc_count': len(bucket_records)}
+                if sub_aggs:
+                    bucket.update(self._aggregate(bucket_records, sub_aggs))
+                result[name]['buckets'].append(bucket)
+        return result
+
+    def _find(self, names, doc_type, query):
+        doc_types = doc_type.split(',') if doc_type else None
+        return [
+            (index, record)
+            for index in self._resolve(names)
+            for record in index.searchable.values()
+            if (doc_types is None or record['_type'] in doc_types) and
+            self._match(record, query)
+        ]
+
+    def _get_hits(self, names, doc_type, body, params):
+        found = self._find(names, doc_type, body.get('query'))
+        sort = self._get_sort(body.get('sort', params.get('sort')))
+        hits = []
+        for index, record in found:
+            hit = {
+                '_index': index.name,
+                '_type': record['_type'],
+                '_id': record['_id'],
+                '_score': None if sort else 1.0,
+            }
+            source = _filter_source(
+                record['_source'],
+                body.get('_source', params.get('_source'))
+            )
+            if source is not None:
+                hit['_source'] = source
+            if sort:
+                hit['sort'] = self._get_sort_values(record, sort)
+            hits.append(hit)
+
+        if sort:
+            hits.sort(key=cmp_to_key(
+                lambda a, b: self._compare_sort_values(a['sort'], b['sort'],
+                                                       sort)
+            ))
+        if 'search_after' in body:
+            hits = [
+                hit for hit in hits if self._compare_sort_values(
+                    hit['sort'], body['search_after'], sort
+                ) > 0
+            ]
+        aggs = body.get('aggs', body.get('aggregations'))
+        aggregations = (
+            self._aggregate([r for i, r in found], aggs) if aggs else None
+        )
+        return len(found), hits, aggregations
+
+    def _search_response(self, total, hits, aggregations=None,
+                         scroll_id=None):
+        response = {
+            'took': 1,
+            'timed_out': False,
+            '_shards': {'total': 1, 'successful': 1, 'skipped': 0,
+                        'failed': 0},
+            'hits': {'total': total, 'max_score': 1.0 if hits else None,
+                     'hits': hits},
+        }
+        if aggregations is not None:
+            response['aggregations'] = aggregations
+        if scroll_id is not None:
+            response['_scroll_id'] = scroll_id
+        return response
+
+    def search(self, names, doc_type, body, params):
+        body = body or {}
+        total, hits, aggregations = self._get_hits(
+            names, doc_type, body, params
+        )
+        size = int(body.get('size', params.get('size', 10)))
+        if 'scroll' in params:
+            scroll_id = uuid.uuid4().hex
+            self.scrolls[scroll_id] = (total, hits[size:], size)
+            return self._search_response(
+                total, hits[:size], aggregations, scroll_id
+            )
+        start = int(body.get('from', params.get('from', 0)))
+        return self._search_response(
+            total, hits[start:start + size], aggregations
+        )
+
+    def scroll(self, scroll_id):
+        if scroll_id not in self.scrolls:
+            raise FakeError(
+                404, 'search_context_missing_exception',
+                'No search context found for id [%s]' % scroll_id
+            )
+        total, hits, size = self.scrolls[scroll_id]
+        self.scrolls[scroll_id] = (total, hits[size:], size)
+        return self._search_response(total, hits[:size], None, scroll_id)
+
+    def clear_scroll(self, scroll_ids):
+        freed = [self.scrolls.pop(i, None) for i in scroll_ids]
+        freed = len([scroll for scroll in freed if scroll is not None])
+        return {'succeeded': True, 'num_freed': freed}
+
+    def count_docs(self, names, doc_type, body):
+        query = (body or {}).get('query')
+        return {'count': len(self._find(names, doc_type, query)),
+                '_shards': {'total': 1, 'successful': 1, 'failed': 0}}
+
+    def msearch(self, name, doc_type, lines):
+        responses = []
+        for header, body in zip(lines[::2], lines[1::2]):
+            try:
+                response = self.search(
+                    ','.join(_as_list(header.get('index', name))) or None,
+                    header.get('type', doc_type), body, {}
+                )
+                response['status'] = 200
+            except FakeError as e:
+                response = e.to_dict()
+            responses.append(response)
+        return {'took': 1, 'responses': responses}
+
+    def delete_by_query(self, names, doc_type, body):
+        found = self._find(names, doc_type, (body or {}).get('query'))
+        for index, record in found:
+            index.docs.pop(record['_id'], None)
+        return {
+            'took': 1, 'timed_out': False, 'total': len(found),
+            'deleted': len(found), 'batches': 1, 'version_conflicts': 0,
+            'noops': 0, 'failures': [],
+        }
+
+    def reindex(self, body, params):
+        """
+        Copy the searchable documents of the source indices, at once. Without
+        ``wait_for_completion`` the result is kept as a completed task.
+        """
+        source, dest = body['source'], body['dest']
+        found = self._find(
+            ','.join(_as_list(source['index'])), source.get('type'),
+            source.get('query')
+        )
+        dest_index = self._get_write_index(dest['index'])
+        created = updated = 0
+        failures = []
+        for index, record in found:
+            try:
+                result = self._write(
+                    dest_index, dest.get('type', record['_type']),
+                    record['_id'], copy.deepcopy(record['_source']),
+                    dest.get('op_type', 'index')
+                )
+            except FakeError as e:
+                failures.append(dict(
+                    e.to_dict()['error'], index=dest_index.name,
+                    id=record['_id']
+                ))
+                continue
+            if result['result'] == 'created':
+                created += 1
+            else:
+                updated += 1
+        if params.get('refresh') in ('', 'true'):
+            dest_index.refresh()
+        status = {
+            'total': len(found), 'created': created, 'updated': updated,
+            'deleted': 0, 'batches': 1, 'version_conflicts': len(failures),
+            'noops': 0, 'requests_per_second': float(
+                params.get('requests_per_second', -1)
+            ),
+        }
+        response = dict(
+            status, took=1, timed_out=False, failures=failures
+        )
+        if params.get('wait_for_completion') != 'false':
+            return response
+        task_id = 'fake:{}'.format(len(self.tasks) + 1)
+        self.tasks[task_id] = {
+            'completed': True,
+            'task': {
+                'node': 'fake', 'id': len(self.tasks) + 1,
+                'action': 'indices:data/write/reindex', 'status': status,
+            },
+            'response': response,
+        }
+        return {'task': task_id}
+
+    def get_task(self, task_id):
+        if task_id not in self.tasks:
+            raise FakeError(
+                404, 'resource_not_found_exception',
+                'task [%s] isn\'t running and hasn\'t stored its results'
+                % task_id
+            )
+        return copy.deepcopy(self.tasks[task_id])
+
+    # Requests
+
+    def _refresh_written(self, params, names):
+        if params.get('refresh') in ('', 'true', 'wait_for'):
+            for name in set(name for name in names if name):
+                for index in self._resolve(name, allow_missing=True):
+                    index.refresh()
+
+    def _route(self, method, parts, params, body):
+        """
+        Return the endpoint name and the response of a request.
+        """
+        endpoints = [i for i, part in enumerate(parts) if part.startswith('_')]
+        if not parts:
+            return 'info', {
+                'name': 'fake', 'cluster_name': 'fake',
+                'version': {'number': self.version},
+                'tagline': 'You Know, for Search',
+            }
+        if not endpoints:
+            return self._route_document(method, parts, params, body)
+
+        pos = endpoints[0]
+        endpoint, prefix, suffix = parts[pos], parts[:pos], parts[pos + 1:]
+        name = prefix[0] if prefix else None
+        doc_type = prefix[1] if len(prefix) > 1 else None
+
+        if endpoint == '_bulk':
+            lines = self._read_lines(body)
+            response = self.bulk(name, doc_type, lines)
+            self._refresh_written(params, [name] + [
+                meta.get('_index') for line in lines
+                for meta in line.values() if isinstance(meta, dict)
+            ])
+            return 'bulk', response
+        if endpoint == '_search' and suffix[:1] == ['scroll'] or \
+                endpoint == '_search' and not prefix and 'scroll_id' in \
+                (body or {}):
+            scroll_id = (suffix[1:] or [None])[0] or \
+                params.get('scroll_id') or (body or {}).get('scroll_id')
+            if method == 'DELETE':
+                return 'clear_scroll', self.clear_scroll(
+                    _as_list(scroll_id) if scroll_id else list(self.scrolls)
+                )
+            return 'scroll', self.scroll(scroll_id)
+        if endpoint == '_search':
+            return 'search', self.search(name, doc_type, body, params)
+        if endpoint == '_count':
+            return 'count', self.count_docs(name, doc_type, body)
+        if endpoint == '_msearch':
+            return 'msearch', self.msearch(
+                name, doc_type, self._read_lines(body)
+            )
+        if endpoint == '_mget':
+            return 'mget', self.mget(name, doc_type, body,
+                                     params.get('_source'))
+        if endpoint == '_delete_by_query':
+            response = self.delete_by_query(name, doc_type, body)
+            self._refresh_written(params, [name])
+            return 'delete_by_query', response
+        if endpoint == '_reindex':
+            return 'reindex', self.reindex(body, params)
+        if endpoint == '_tasks' and suffix:
+            return 'get_task', self.get_task(suffix[0])
+        if endpoint == '_refresh':
+            return 'refresh', self.refresh(name)
+        if endpoint == '_mapping':
+            doc_type = (suffix or [doc_type])[0] or params.get('type')
+            if method in ('PUT', 'POST'):
+                return 'put_mapping', self.put_mapping(name, doc_type, body)
+            return 'get_mapping', self.get_mapping(name, doc_type)
+        if endpoint == '_settings':
+            if method == 'PUT':
+                return 'put_settings', self.put_settings(name, body)
+            return 'get_settings', self.get_settings(name)
+        if endpoint == '_aliases' and method == 'POST':
+            return 'update_aliases', self.update_aliases(body)
+        if endpoint in ('_alias', '_aliases'):
+            alias = (suffix or [None])[0]
+            if method == 'PUT':
+                return 'update_aliases', self.update_aliases({'actions': [
+                    {'add': {'index': name, 'alias': alias}}
+                ]})
+            if method == 'DELETE':
+                return 'update_aliases', self.update_aliases({'actions': [
+                    {'remove': {'index': name, 'alias': alias}}
+                ]})
+            return 'get_alias', self.get_aliases(name, alias)
+        if endpoint == '_cluster' and suffix[:1] == ['health']:
+            return 'health', {'status': 'green', 'timed_out': False}
+        if pos == 2 and endpoint in ('_update', '_create') or pos == 3:
+            # /index/type/id/_update or /index/type/id/_create
+            return self._route_document(method, parts, params, body)
+        raise _unsupported('%s /%s' % (method, '/'.join(parts)))
+
+    def _route_document(self, method, parts, params, body):
+        if len(parts) == 1:
+            name = parts[0]
+            if method == 'HEAD':
+                self._resolve(name)
+                return 'exists', None
+            if method == 'PUT':
+                return 'create_index', self.create_index(name, body)
+            if method == 'DELETE':
+                return 'delete_index', self.delete_index(name)
+            mappings = self.get_mapping(name)
+            return 'get_index', dict(
+                (index, dict(mapping, settings=self.get_settings(index)[index]
+                             ['settings'], aliases=self.get_aliases(index)
+                             [index]['aliases']))
+                for index, mapping in mappings.items()
+            )
+
+        name, doc_type = parts[0], parts[1]
+        doc_id = parts[2] if len(parts) > 2 else None
+        op = parts[3] if len(parts) > 3 else None
+        if method in ('GET', 'HEAD'):
+            response = self.get_doc(name, doc_type, doc_id,
+                                    params.get('_source'))
+            status = 200 if response['found'] else 404
+            if method == 'HEAD':
+                return 'exists', FakeResponse(status, None)
+            return 'get', FakeResponse(status, response)
+
+        if op == '_update':
+            endpoint = 'update'
+            response = self.update_doc(name, doc_type, doc_id, body)
+        elif method == 'DELETE':
+            endpoint = 'delete'
+            response = self.delete_doc(name, doc_type, doc_id)
+        else:
+            endpoint = 'index'
+            op_type = 'create' if op == '_create' else \
+                params.get('op_type', 'index')
+            response = self.index_doc(name, doc_type, doc_id, body, op_type)
+        self._refresh_written(params, [name])
+        return endpoint, FakeResponse(response.pop('status'), response)
+
+    def _read_lines(self, body):
+        if body is None:
+            return []
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+    def handle(self, method, url, params, body):
+        """
+        Return the endpoint, the status and the response of a request.
+        """
+        path = url.split('?', 1)[0]
+        parts = [unquote(part) for part in path.split('/') if part]
+        with self._lock:
+            try:
+                if body is not None and not any(
+                        p in ('_bulk', '_msearch') for p in parts):
+                    if isinstance(body, bytes):
+                        body = body.decode('utf-8')
+                    body = json.loads(body)
+                endpoint, response = self._route(method, parts, params, body)
+            except FakeError as e:
+                return _endpoint_name(method, parts), e.status, e.to_dict()
+        if isinstance(response, FakeResponse):
+            return endpoint, response.status, response.data
+        return endpoint, 200, response
+
+
+def _endpoint_name(method, parts):
+    for part in parts:
+        if part.startswith('_'):
+            return part.lstrip('_')
+    return method.lower()
+
+
+fake_cluster = FakeCluster()
+
+
+class FakeConnection(Connection):
+    """
+    ``Connection`` sending the requests to a ``FakeCluster`` in memory,
+    ``fake_cluster`` by default.
+    """
+    def __init__(self, cluster=None, **kwargs):
+        super(FakeConnection, self).__init__(**kwargs)
+        self.cluster = cluster if cluster is not None else fake_cluster
+
+    def perform_request(self, method, url, params=None, body=None,
+                        timeout=None, ignore=(), headers=None):
+        params = dict(
+            (key, value.decode('utf-8') if isinstance(value, bytes) else value)
+            for key, value in (params or {}).items()
+        )
+        endpoint, status, data = self.cluster.handle(
+            method, url, params, body
+        )
+        raw = '' if data is None or method == 'HEAD' else json.dumps(data)
+        self.cluster.record(FakeRequest(
+            method, url, endpoint, status, len(body or b''),
+            len(raw.encode('utf-8'))
+        ))
+        if not 200 <= status < 300 and status not in ignore:
+            self._raise_error(status, raw)
+        return status, {'content-type': 'application/json'}, raw
+
+
+class FakeConnections(object):
+    """
+    Send the requests of the ``aliases`` connections to ``cluster`` (a new
+    ``FakeCluster`` by default), and restore the configured connections
+    afterwards. Like the patchers of ``mock``, it is a context manager or
+    can be started and stopped::
+
+        with FakeConnections() as cluster:
+            car.save()
+
+        def setUp(self):
+            patcher = FakeConnections()
+            self.cluster = patcher.start()
+            self.addCleanup(patcher.stop)
+    """
+    def __init__(self, cluster=None, aliases=('default',)):
+        self.cluster = cluster if cluster is not None else FakeCluster()
+        self.aliases = aliases
+        self._saved = None
+
+    def start(self):
+        # configure() updates the dicts in place
+        self._saved = dict(connections._conns), dict(connections._kwargs)
+        connections.configure(**dict(
+            (alias, {'connection_class': FakeConnection,
+                     'cluster': self.cluster})
+            for alias in self.aliases
+        ))
+        return self.cluster
+
+    def stop(self):
+        connections._conns, connections._kwargs = self._saved
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
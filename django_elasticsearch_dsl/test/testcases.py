@@ -1,29 +1,158 @@
+import atexit
+from collections import defaultdict
 import re
+
+from django.test import runner
+from elasticsearch_dsl.connections import connections
+
 from ..registries import registry
 
 
+# The connection aliases of the indices created for the whole test session,
+# by suffixed name
+_session_indices = {}
+
+
+def _delete_session_indices():
+    for name, using in _session_indices.items():
+        connections.get_connection(using).indices.delete(
+            index=name, ignore=[404, 400]
+        )
+    _session_indices.clear()
+
+
 class ESTestCase(object):
+    """
+    Mixin running the tests of a ``TestCase`` with the registered indices
+    renamed with a suffix, which are emptied between the tests.
+
+    ``index_scope`` is when the indices are created and deleted:
+
+    - ``'test'``: before and after every test.
+    - ``'class'``: once for the test case, the documents are deleted (by
+      query) between the tests.
+    - ``'session'``: once for the process, the documents are deleted (by
+      query) between the tests.
+
+    The suffix contains the id of the worker with ``manage.py test
+    --parallel``, so the workers can share a cluster.
+    """
     _index_suffixe = '_ded_test'
+    index_scope = 'test'
 
-    def setUp(self):
+    @classmethod
+    def get_index_suffix(cls):
+        worker_id = getattr(runner, '_worker_id', 0)
+        if worker_id:
+            return '{}_{}'.format(cls._index_suffixe, worker_id)
+        return cls._index_suffixe
+
+    @classmethod
+    def _rename_indices(cls):
+        suffix = cls.get_index_suffix()
         for doc in registry.get_documents():
-            doc._doc_type.index += self._index_suffixe
+            doc._doc_type.index += suffix
 
         for index in registry.get_indices():
-            index._name += self._index_suffixe
-            index.delete(ignore=[404, 400])
-            index.create()
-
-        super(ESTestCase, self).setUp()
+            index._name += suffix
 
-    def tearDown(self):
-        pattern = re.compile(self._index_suffixe + '$')
+    @classmethod
+    def _restore_indices(cls):
+        pattern = re.compile(re.escape(cls.get_index_suffix()) + '$')
 
         for doc in registry.get_documents():
             doc._doc_type.index = pattern.sub('', doc._doc_type.index)
 
         for index in registry.get_indices():
-            index.delete(ignore=[404, 400])
             index._name = pattern.sub('', index._name)
 
+    @classmethod
+    def _create_indices(cls):
+        for index in registry.get_indices():
+            index.delete(ignore=[404, 400])
+            index.create()
+
+    @classmethod
+    def _delete_indices(cls):
+        for index in registry.get_indices():
+            index.delete(ignore=[404, 400])
+
+    @classmethod
+    def _create_session_indices(cls):
+        if not _session_indices:
+            atexit.register(_delete_session_indices)
+        for index in registry.get_indices():
+            if index._name not in _session_indices:
+                index.delete(ignore=[404, 400])
+                index.create()
+                _session_indices[index._name] = index._using
+
+    @classmethod
+    def _reset_indices(cls):
+        """
+        Delete all the documents of the indices, which is much cheaper than
+        recreating them.
+        """
+        names = defaultdict(list)
+        for index in registry.get_indices():
+            names[index._using].append(index._name)
+
+        for using, indices in names.items():
+            es = connections.get_connection(using)
+            index = ','.join(indices)
+            # Only the refreshed documents are deleted by query
+            es.indices.refresh(index=index)
+            es.delete_by_query(
+                index=index, body={'query': {'match_all': {}}},
+                conflicts='proceed', refresh=True
+            )
+
+    @classmethod
+    def setUpClass(cls):
+        if cls.index_scope in ('class', 'session'):
+            cls._rename_indices()
+            if cls.index_scope == 'class':
+                cls._create_indices()
+            else:
+                cls._create_session_indices()
+        super(ESTestCase, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(ESTestCase, cls).tearDownClass()
+        if cls.index_scope in ('class', 'session'):
+            if cls.index_scope == 'class':
+                cls._delete_indices()
+            cls._restore_indices()
+
+    def setUp(self):
+        if self.index_scope == 'test':
+            self._rename_indices()
+            self._create_indices()
+        else:
+            self._reset_indices()
+
+        super(ESTestCase, self).setUp()
+
+    def tearDown(self):
+        if self.index_scope == 'test':
+            self._delete_indices()
+            self._restore_indices()
+
         super(ESTestCase, self).tearDown()
+
+
+class ESTestRunner(runner.DiscoverRunner):
+    """
+    Test runner deleting the ``'session'`` indices of the workers of
+    ``--parallel``: the worker processes exit without running the ``atexit``
+    handlers which delete them.
+    """
+    def teardown_test_environment(self, **kwargs):
+        super(ESTestRunner, self).teardown_test_environment(**kwargs)
+        for worker_id in range(1, self.parallel + 1):
+            suffix = '{}_{}'.format(ESTestCase._index_suffixe, worker_id)
+            for index in registry.get_indices():
+                connections.get_connection(index._using).indices.delete(
+                    index=index._name + suffix, ignore=[404, 400]
+                )
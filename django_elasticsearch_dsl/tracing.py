@@ -0,0 +1,115 @@
+"""
+Spans of the indexing and the searches, sent to the tracer configured with
+the ``ELASTICSEARCH_DSL_TRACING`` setting (``registry.tracer``).
+
+The spans, and their attributes, are:
+
+- ``ded.signal``: a handler of the signal processor (``signal``,
+  ``model``).
+- ``ded.registry.update``, ``ded.registry.update_related`` and
+  ``ded.registry.delete_related``: the fan-out of a model instance to its
+  documents (``model``, ``action``, ``documents``).
+- ``ded.bulk``: the bulk actions of a document (``document``, ``index``,
+  ``success``, ``errors``).
+- ``ded.bulk.request``: a bulk request (``document``, ``bytes``).
+- ``ded.prepare``: the preparation of a document (``document``, ``pk``).
+- ``ded.search.execute``: a search (``index``, ``cached``, ``hits``,
+  ``took``).
+- ``ded.search.to_queryset``: the queryset of the hits of a search
+  (``model``, ``pk_count``).
+"""
+import threading
+from timeit import default_timer
+
+from .registries import registry
+
+
+class Tracer(object):
+    """
+    Receiver of the spans, to be subclassed to bridge them to a tracing
+    system. The spans of a thread are nested: a span is started and ended
+    while its parent is active.
+    """
+    def start_span(self, name, attributes):
+        """
+        Start the span ``name`` and return a handle passed to ``end_span``.
+        """
+        return None
+
+    def end_span(self, handle, attributes, error=None):
+        """
+        End the span of ``handle``. ``attributes`` are all the attributes of
+        the span, including the ones set after its start, and ``error`` is
+        the exception raised in the span, if any.
+        """
+
+
+class RecordedSpan(object):
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.start = default_timer()
+        self.duration = None
+        self.error = None
+
+    def __repr__(self):
+        return '<RecordedSpan {}>'.format(self.name)
+
+
+class RecordingTracer(Tracer):
+    """
+    Keep the ended spans in ``spans``, for the tests and the debugging.
+    """
+    def __init__(self):
+        self.spans = []
+        self._local = threading.local()
+
+    def start_span(self, name, attributes):
+        stack = self._local.__dict__.setdefault('stack', [])
+        span = RecordedSpan(name, attributes, stack[-1] if stack else None)
+        stack.append(span)
+        return span
+
+    def end_span(self, handle, attributes, error=None):
+        self._local.stack.pop()
+        handle.attributes = attributes
+        handle.duration = default_timer() - handle.start
+        handle.error = error
+        self.spans.append(handle)
+
+
+class Span(object):
+    """
+    Context manager of a span, doing nothing without tracer.
+    """
+    __slots__ = ('tracer', 'name', 'attributes', 'handle')
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.handle = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        if self.tracer is not None:
+            self.handle = self.tracer.start_span(
+                self.name, dict(self.attributes)
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.tracer is not None:
+            self.tracer.end_span(self.handle, self.attributes, exc_value)
+        return False
+
+
+def span(name, **attributes):
+    """
+    Return the ``Span`` context manager of ``name``, sent to
+    ``registry.tracer``.
+    """
+    return Span(registry.tracer, name, attributes)
@@ -14,3 +14,15 @@ def import_class(path):
                           "" % (module_path, class_name))
 
     return getattr(module_itself, class_name)
+
+
+def get_doc_type(search):
+    """
+    Return the doc types of a search (or multi search) to send in the request,
+    with all the supported versions of elasticsearch-dsl: before 6.0 the
+    ``_doc_type`` of the search are already the names of the doc types.
+    """
+    get_doc_type = getattr(search, '_get_doc_type', None)
+    if get_doc_type is not None:
+        return get_doc_type()
+    return search._doc_type
@@ -58,6 +58,30 @@ def make_parser():
         const='localhost:9200',
         help="To run integration test against an Elasticsearch server",
     )
+    parser.add_argument(
+        '--bench',
+        nargs='*',
+        metavar='benchmark',
+        help="Run the benchmarks (all by default) instead of the tests",
+    )
+    parser.add_argument(
+        '--bench-save',
+        metavar='results.json',
+        help="Save the results of the benchmarks as a JSON baseline",
+    )
+    parser.add_argument(
+        '--bench-compare',
+        metavar='baseline.json',
+        help="Compare the results of the benchmarks with a JSON baseline, "
+             "and fail on regressions",
+    )
+    parser.add_argument(
+        '--bench-threshold',
+        type=float,
+        default=0.25,
+        help="Relative change of a measure considered a regression "
+             "(default: 0.25)",
+    )
     return parser
 
 
@@ -66,6 +90,17 @@ def run_tests(*test_args):
     if args.elasticsearch:
         os.environ.setdefault('ELASTICSEARCH_URL', args.elasticsearch)
 
+    if args.bench is not None:
+        get_settings()
+        from tests.benchmarks import run
+        regressions = run(
+            args.bench,
+            save=args.bench_save,
+            baseline=args.bench_compare,
+            threshold=args.bench_threshold,
+        )
+        sys.exit(bool(regressions))
+
     if not test_args:
         test_args = ['tests']
 
@@ -44,6 +44,9 @@ setup(
     install_requires=[
         'elasticsearch-dsl>=2.1.0,<7.0.0',
     ],
+    extras_require={
+        'async': ['elasticsearch-async>=6.0.0,<7.0.0'],
+    },
     license="Apache Software License 2.0",
     zip_safe=False,
     keywords='django elasticsearch elasticsearch-dsl',
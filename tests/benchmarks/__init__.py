@@ -0,0 +1,85 @@
+"""
+Benchmarks, run with ``python runtests.py --bench [name ...]``.
+
+Each benchmark module has a ``run(stdout)`` function printing its results
+and returning them as a dict of measures. The measures of a run can be
+saved as a JSON baseline (``--bench-save``) and compared to a baseline
+(``--bench-compare``): the measures named ``*_per_sec`` are better when
+higher, the others when lower.
+"""
+from importlib import import_module
+import json
+import platform
+import sys
+
+import django
+from django.test.runner import DiscoverRunner
+
+
+BENCHMARKS = [
+    'indexing',
+    'ordering',
+    'raw',
+]
+
+
+def is_regression(name, baseline, value, threshold):
+    if not baseline or value is None:
+        return False
+    change = (value - baseline) / float(abs(baseline))
+    if name.endswith('_per_sec'):
+        return change < -threshold
+    return change > threshold
+
+
+def compare(baseline, results, threshold, stdout=sys.stdout):
+    """
+    Print the changes of ``results`` against ``baseline`` and return the
+    names of the measures worse by more than ``threshold`` (a fraction).
+    """
+    regressions = []
+    stdout.write("\ncomparison with the baseline\n")
+    for name in sorted(set(baseline) & set(results)):
+        value, base = results[name], baseline[name]
+        if value is None or base is None:
+            continue
+        change = (value - base) / float(abs(base)) * 100 if base else 0.0
+        regression = is_regression(name, base, value, threshold)
+        if regression:
+            regressions.append(name)
+        stdout.write("{:<48}{:>12.2f}{:>12.2f}{:>+9.1f}%{}\n".format(
+            name, base, value, change, '  REGRESSION' if regression else ''
+        ))
+    return regressions
+
+
+def run(names=None, stdout=sys.stdout, save=None, baseline=None,
+        threshold=0.25):
+    """
+    Run the benchmarks ``names`` (all by default), and return the names of
+    the measures regressing from the ``baseline`` file.
+    """
+    results = {}
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        for name in names or BENCHMARKS:
+            module = import_module('tests.benchmarks.{}'.format(name))
+            for key, value in (module.run(stdout) or {}).items():
+                results['{}.{}'.format(name, key)] = value
+    finally:
+        runner.teardown_databases(old_config)
+
+    if save:
+        with open(save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if baseline:
+        with open(baseline) as f:
+            return compare(json.load(f)['results'], results, threshold,
+                           stdout)
+    return []
@@ -0,0 +1,145 @@
+"""
+Measure the cost of indexing the cars of ``tests.models``: preparing the
+documents, building and sending the bulk actions, the overhead of the
+signals on the saves and ``Search.to_queryset``.
+
+The requests are sent to the in-memory ``FakeConnection``, so the
+measures don't include the network nor elasticsearch.
+"""
+from django.test.utils import override_settings
+
+from django_elasticsearch_dsl.fields import DEDField
+
+from ..documents import CarDocument
+from ..models import Car
+from .utils import (
+    best_time,
+    count_queries,
+    create_fixtures,
+    delete_fixtures,
+    fake_elasticsearch,
+    peak_memory,
+    percentile,
+    timings,
+)
+
+
+CARS = 500
+SAVES = 200
+REPEAT = 3
+
+
+def bench_prepare(doc, cars):
+    def prepare():
+        for car in cars:
+            doc.prepare(car)
+
+    return {
+        'prepare.docs_per_sec': len(cars) / best_time(prepare, REPEAT),
+        'prepare.queries_per_doc': count_queries(prepare) / float(len(cars)),
+        'prepare.peak_kib': peak_memory(prepare),
+    }
+
+
+def bench_get_value_from_instance(doc, cars):
+    fields = [
+        field for name, field in doc._doc_type._fields().items()
+        if isinstance(field, DEDField) and
+        not hasattr(doc, 'prepare_{}'.format(name))
+    ]
+
+    def get_values():
+        for car in cars:
+            for field in fields:
+                field.get_value_from_instance(car)
+
+    return {
+        'get_value_from_instance.fields_per_sec': (
+            len(cars) * len(fields) / best_time(get_values, REPEAT)
+        ),
+    }
+
+
+def bench_get_actions(doc):
+    def get_actions():
+        list(doc._get_actions(doc.get_queryset(), 'index'))
+
+    return {
+        'get_actions.docs_per_sec': CARS / best_time(get_actions, REPEAT),
+        'get_actions.queries': count_queries(get_actions),
+        'get_actions.peak_kib': peak_memory(get_actions),
+    }
+
+
+def bench_update(doc, cluster):
+    def update():
+        doc.update(doc.get_queryset())
+
+    cluster.reset_stats()
+    update()
+    return {
+        'update.docs_per_sec': CARS / best_time(update, REPEAT),
+        'update.requests': cluster.count(),
+        'update.bytes_per_doc': cluster.bytes_sent() / float(CARS),
+    }
+
+
+def bench_save(cluster):
+    car = Car.objects.select_related('manufacturer').first()
+
+    def save():
+        car.save()
+
+    with override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False):
+        base = timings(save, SAVES)
+        base_queries = count_queries(save)
+    cluster.reset_stats()
+    synced = timings(save, SAVES)
+    requests = cluster.count() / float(SAVES)
+    synced_queries = count_queries(save)
+
+    return {
+        'save.p50_overhead_ms': (
+            percentile(synced, 50) - percentile(base, 50)) * 1000,
+        'save.p99_overhead_ms': (
+            percentile(synced, 99) - percentile(base, 99)) * 1000,
+        'save.extra_queries': synced_queries - base_queries,
+        'save.requests': requests,
+    }
+
+
+def bench_to_queryset(cluster):
+    cluster.refresh(None)
+    s = CarDocument.search()[:CARS]
+
+    def to_queryset():
+        list(s.to_queryset())
+
+    return {
+        'to_queryset.ms': best_time(to_queryset, REPEAT) * 1000,
+        'to_queryset.queries': count_queries(to_queryset),
+    }
+
+
+def run(stdout):
+    results = {}
+    with fake_elasticsearch() as cluster:
+        create_fixtures(CARS)
+        try:
+            doc = CarDocument()
+            cars = list(doc.get_queryset())
+            results.update(bench_prepare(doc, cars))
+            results.update(bench_get_value_from_instance(doc, cars))
+            results.update(bench_get_actions(doc))
+            results.update(bench_update(doc, cluster))
+            results.update(bench_save(cluster))
+            results.update(bench_to_queryset(cluster))
+        finally:
+            delete_fixtures()
+
+    stdout.write("indexing of {} cars (best of {})\n".format(CARS, REPEAT))
+    for name, value in sorted(results.items()):
+        stdout.write("{:<40}{:>14}\n".format(
+            name, 'n/a' if value is None else '{:.2f}'.format(value)
+        ))
+    return results
@@ -0,0 +1,53 @@
+"""
+Compare the ordering strategies of ``Search.to_queryset`` by number of hits.
+"""
+import random
+import timeit
+
+from django_elasticsearch_dsl.ordering import ordering_strategies
+
+from ..models import Category
+
+
+SIZES = [10, 100, 1000, 5000]
+REPEAT = 5
+
+
+def run(stdout):
+    Category.objects.bulk_create([
+        Category(title=str(i), slug=str(i)) for i in range(max(SIZES))
+    ])
+    all_pks = [str(pk) for pk in Category.objects.values_list('pk', flat=True)]
+    qs = Category.objects.all()
+    names = sorted(
+        name for name, strategy in ordering_strategies.items()
+        if strategy.is_available(qs)
+    )
+
+    stdout.write("to_queryset ordering (best of {}, ms)\n".format(REPEAT))
+    stdout.write("{:>8}".format("hits"))
+    for name in names:
+        stdout.write("{:>16}".format(name))
+    stdout.write("\n")
+
+    results = {}
+    for size in SIZES:
+        pks = random.sample(all_pks, size)
+        stdout.write("{:>8}".format(size))
+        for name in names:
+            strategy = ordering_strategies[name]
+
+            def evaluate():
+                list(strategy.order(qs.filter(pk__in=pks), pks))
+
+            try:
+                best = min(timeit.repeat(evaluate, number=1, repeat=REPEAT))
+            except Exception as e:
+                stdout.write("{:>16}".format(type(e).__name__))
+            else:
+                results['{}.{}_ms'.format(name, size)] = best * 1000
+                stdout.write("{:>16.2f}".format(best * 1000))
+        stdout.write("\n")
+
+    Category.objects.all().delete()
+    return results
@@ -0,0 +1,63 @@
+"""
+Compare the cost of wrapping the hits of a response with ``Search.raw()``.
+"""
+import timeit
+
+from elasticsearch_dsl import DocType
+
+from django_elasticsearch_dsl.search import Search
+
+
+SIZES = [100, 1000, 10000]
+REPEAT = 5
+
+
+class BenchDocument(DocType):
+    pass
+
+
+def _response(size):
+    return {'hits': {'total': size, 'hits': [
+        {
+            '_index': 'bench', '_type': 'doc', '_id': str(i), '_score': 1.0,
+            '_source': {
+                'title': 'Title {}'.format(i), 'price': i * 1.5,
+                'tags': ['a', 'b'], 'owner': {'name': 'x', 'id': i},
+            },
+        }
+        for i in range(size)
+    ]}}
+
+
+def run(stdout):
+    searches = [
+        ('document', Search(doc_type=[BenchDocument])),
+        ('hit', Search()),
+        ('raw', Search().raw()),
+        ('raw dict', Search().raw(as_dict=True)),
+    ]
+
+    stdout.write(
+        "iterate the hits of a response (best of {}, ms)\n".format(REPEAT)
+    )
+    stdout.write("{:>8}".format("hits"))
+    for name, search in searches:
+        stdout.write("{:>12}".format(name))
+    stdout.write("\n")
+
+    results = {}
+    for size in SIZES:
+        data = _response(size)
+        stdout.write("{:>8}".format(size))
+        for name, search in searches:
+
+            def evaluate():
+                for hit in search._response_class(search, data):
+                    pass
+
+            best = min(timeit.repeat(evaluate, number=1, repeat=REPEAT))
+            results['{}.{}_ms'.format(name.replace(' ', '_'), size)] = \
+                best * 1000
+            stdout.write("{:>12.2f}".format(best * 1000))
+        stdout.write("\n")
+    return results
@@ -0,0 +1,127 @@
+"""
+Measures, fixtures and elasticsearch stand-in shared by the benchmarks.
+"""
+from contextlib import contextmanager
+from datetime import date
+import timeit
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.test import FakeConnections, fake_cluster
+
+from ..models import Ad, Car, Category, Manufacturer
+
+try:
+    import tracemalloc
+except ImportError:  # python < 3.4
+    tracemalloc = None
+
+
+def best_time(func, repeat=5):
+    """
+    Return the best duration of ``repeat`` calls of ``func``, in seconds.
+    """
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def timings(func, number):
+    """
+    Return the durations of ``number`` calls of ``func``, in seconds.
+    """
+    return [timeit.timeit(func, number=1) for _ in range(number)]
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[int(round(percent / 100.0 * (len(values) - 1)))]
+
+
+def count_queries(func):
+    """
+    Return the number of SQL queries run by ``func``.
+    """
+    # The log of the queries is bounded
+    reset_queries()
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return len(context.captured_queries)
+
+
+def peak_memory(func):
+    """
+    Return the peak of the memory allocated by ``func``, in KiB, or
+    ``None`` without ``tracemalloc``.
+    """
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024.0
+
+
+@contextmanager
+def fake_elasticsearch():
+    """
+    Send the requests of the default connection to an empty in-memory
+    cluster, with the registered indices created.
+    """
+    fake_cluster.reset()
+    try:
+        with FakeConnections(fake_cluster):
+            for index in registry.get_indices():
+                index.create()
+            yield fake_cluster
+    finally:
+        fake_cluster.reset()
+
+
+def create_fixtures(cars, manufacturers=10, categories=20, ads_per_car=2,
+                    categories_per_car=2):
+    """
+    Create ``cars`` cars, with their manufacturers, categories and ads,
+    without sending the signals.
+    """
+    Manufacturer.objects.bulk_create([
+        Manufacturer(
+            name='Manufacturer {}'.format(i), country_code='FR',
+            created=date(1900, 1, 1)
+        ) for i in range(manufacturers)
+    ])
+    Category.objects.bulk_create([
+        Category(title='Category {}'.format(i), slug='category-{}'.format(i))
+        for i in range(categories)
+    ])
+    manufacturer_pks = list(Manufacturer.objects.values_list('pk', flat=True))
+    category_pks = list(Category.objects.values_list('pk', flat=True))
+
+    Car.objects.bulk_create([
+        Car(
+            name='Car {}'.format(i), launched=date(2000 + i % 20, 1, 1),
+            manufacturer_id=manufacturer_pks[i % manufacturers]
+        ) for i in range(cars)
+    ])
+    car_pks = list(Car.objects.values_list('pk', flat=True))
+    Car.categories.through.objects.bulk_create([
+        Car.categories.through(
+            car_id=pk, category_id=category_pks[(i + j) % categories]
+        )
+        for i, pk in enumerate(car_pks) for j in range(categories_per_car)
+    ])
+    Ad.objects.bulk_create([
+        Ad(
+            title='Ad {}'.format(j), description='<p>Ad {}</p>'.format(j),
+            url='http://example.com/{}'.format(j), car_id=pk
+        )
+        for pk in car_pks for j in range(ads_per_car)
+    ])
+
+
+def delete_fixtures():
+    for model in (Ad, Car.categories.through, Car, Category, Manufacturer):
+        model.objects.all()._raw_delete(connection.alias)
@@ -5,6 +5,21 @@ from django.db import models
 from django_elasticsearch_dsl.documents import DocType
 
 
+class Clock(object):
+    """
+    Manual clock for the ``clock`` and ``sleep`` arguments, a sleep only
+    advances the time.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
 class WithFixturesMixin(object):
 
     class ModelA(models.Model):
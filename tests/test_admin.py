@@ -0,0 +1,108 @@
+from django.contrib.admin import AdminSite, ModelAdmin
+from django.test import TestCase
+from mock import Mock, patch
+
+from django_elasticsearch_dsl.admin import (
+    DocumentCountPaginator,
+    DocumentSearchMixin,
+)
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.search import Search
+
+from .models import Category
+
+
+class CategoryDocument(object):
+    search = Mock()
+
+
+class CategoryAdmin(DocumentSearchMixin, ModelAdmin):
+    search_fields = ['title']
+    search_document = CategoryDocument
+
+
+class DocumentSearchMixinTestCase(TestCase):
+    def setUp(self):
+        Category.objects.bulk_create([
+            Category(title='blue', slug=str(i)) for i in range(3)
+        ])
+        self.pks = [
+            str(pk) for pk in Category.objects.values_list('pk', flat=True)
+        ]
+        self.admin = CategoryAdmin(Category, AdminSite())
+        self.queryset = Category.objects.all()
+
+        CategoryDocument.search = Mock(return_value=Search(index='cat'))
+        self.execute = patch.object(
+            Search, 'execute', autospec=True,
+            return_value=Mock(_get_ids=Mock(return_value=self.pks[:2]))
+        ).start()
+        self.addCleanup(patch.stopall)
+
+    def test_search_results(self):
+        qs, use_distinct = self.admin.get_search_results(
+            None, self.queryset, 'red'
+        )
+
+        self.assertFalse(use_distinct)
+        self.assertEqual(
+            sorted(str(c.pk) for c in qs), sorted(self.pks[:2])
+        )
+        s = self.execute.call_args[0][0]
+        self.assertEqual(s.to_dict(), {
+            'query': {'multi_match': {'query': 'red', 'lenient': True}},
+            '_source': {'excludes': ['*']},
+            'from': 0,
+            'size': 1000,
+        })
+
+    def test_search_document_fields(self):
+        self.admin.search_document_fields = ['title', 'slug']
+        self.admin.get_search_results(None, self.queryset, 'red')
+        s = self.execute.call_args[0][0]
+        self.assertEqual(
+            s.to_dict()['query']['multi_match']['fields'], ['title', 'slug']
+        )
+
+    def test_no_search_term(self):
+        qs, use_distinct = self.admin.get_search_results(
+            None, self.queryset, ''
+        )
+        self.assertEqual(qs.count(), 3)
+        self.assertFalse(self.execute.called)
+
+    def test_registry_document(self):
+        self.admin.search_document = None
+        with patch.object(registry, 'get_documents',
+                          return_value={CategoryDocument}) as get_documents:
+            self.assertIs(self.admin.get_search_document(), CategoryDocument)
+            get_documents.assert_called_once_with([Category])
+
+    def test_paginator(self):
+        paginator = self.admin.get_paginator(None, self.queryset, 10)
+        self.assertIsInstance(paginator, DocumentCountPaginator)
+        self.assertIs(paginator.document, CategoryDocument)
+
+
+class DocumentCountPaginatorTestCase(TestCase):
+    def setUp(self):
+        Category.objects.bulk_create([
+            Category(title=str(i), slug=str(i)) for i in range(3)
+        ])
+        self.document = Mock()
+        self.document.search.return_value.count.return_value = 50000000
+
+    def test_unfiltered_count(self):
+        paginator = DocumentCountPaginator(
+            Category.objects.all(), 100, document=self.document
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 50000000)
+            self.assertEqual(paginator.num_pages, 500000)
+
+    def test_filtered_count(self):
+        paginator = DocumentCountPaginator(
+            Category.objects.filter(title='1'), 100, document=self.document
+        )
+        self.assertEqual(paginator.count, 1)
+        self.assertFalse(self.document.search.called)
@@ -0,0 +1,196 @@
+import json
+import sys
+import threading
+from unittest import TestCase, skipIf
+
+from elasticsearch.helpers import BulkIndexError
+from elasticsearch.serializer import JSONSerializer
+from mock import Mock, patch
+
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.search import Search
+from django_elasticsearch_dsl.tracing import RecordingTracer
+
+from .test_documents import Car, CarDocument
+
+
+@skipIf(sys.version_info < (3, 6), 'the asyncio API requires python 3.6')
+class AsyncTestCase(TestCase):
+    def setUp(self):
+        import asyncio
+        from django_elasticsearch_dsl import aio
+
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+        self.es = Mock(transport=Mock(serializer=JSONSerializer()))
+        aio.connections.add_connection('default', self.es)
+        self.addCleanup(aio.connections.remove_connection, 'default')
+
+    def _returns(self, *values):
+        results = iter(values)
+
+        def future(*args, **kwargs):
+            f = self.loop.create_future()
+            f.set_result(next(results))
+            return f
+        return Mock(side_effect=future)
+
+    def _bulk_response(self, *statuses):
+        return {'items': [
+            {'index': {'_id': str(i), 'status': status}}
+            for i, status in enumerate(statuses)
+        ]}
+
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_bulk(self):
+        from django_elasticsearch_dsl import aio
+
+        self.es.bulk = self._returns(
+            self._bulk_response(201, 201), self._bulk_response(200)
+        )
+        actions = [{'_index': 'i', '_id': i, '_source': {'a': i}}
+                   for i in range(3)]
+        self.assertEqual(
+            self._run(aio.bulk(self.es, actions, chunk_size=2)), (3, [])
+        )
+
+        bodies = [
+            [json.loads(line) for line in c[0][0].splitlines()]
+            for c in self.es.bulk.call_args_list
+        ]
+        self.assertEqual(len(bodies), 2)
+        self.assertIn(
+            [{'index': {'_index': 'i', '_id': 2}}, {'a': 2}], bodies
+        )
+        self.assertTrue(
+            all(c[0][0].endswith('\n') for c in self.es.bulk.call_args_list)
+        )
+
+    def test_bulk_bounded_concurrency(self):
+        from django_elasticsearch_dsl import aio
+
+        requests = []
+        in_flight = []
+
+        def bulk(body, **kwargs):
+            requests.append(self.loop.create_future())
+            in_flight.append(sum(not f.done() for f in requests))
+            self.loop.call_later(
+                0.001, requests[-1].set_result, self._bulk_response(201)
+            )
+            return requests[-1]
+        self.es.bulk = Mock(side_effect=bulk)
+
+        threads = set()
+
+        def actions():
+            for i in range(10):
+                threads.add(threading.current_thread())
+                yield {'_index': 'i', '_id': i, '_source': {}}
+
+        self.assertEqual(self._run(aio.bulk(
+            self.es, actions(), chunk_size=1, max_concurrency=3
+        )), (10, []))
+        self.assertEqual(len(requests), 10)
+        self.assertEqual(max(in_flight), 3)
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_bulk_errors(self):
+        from django_elasticsearch_dsl import aio
+
+        self.es.bulk = self._returns(self._bulk_response(201, 409))
+        actions = [{'_index': 'i', '_id': i, '_source': {}} for i in range(2)]
+        with self.assertRaises(BulkIndexError):
+            self._run(aio.bulk(self.es, actions))
+
+        self.es.bulk = self._returns(self._bulk_response(201, 409))
+        success, errors = self._run(
+            aio.bulk(self.es, actions, raise_on_error=False)
+        )
+        self.assertEqual(success, 1)
+        self.assertEqual(errors, [{'index': {'_id': '1', 'status': 409}}])
+
+    def test_aupdate(self):
+        self.es.bulk = self._returns(self._bulk_response(201))
+        doc = CarDocument()
+        car = Car(name="Type 57", price=5400000.0, pk=51)
+        with patch.object(CarDocument, '_after_send') as after_send:
+            self.assertEqual(self._run(doc.aupdate(car)), (1, []))
+            after_send.assert_called_once_with(True)
+
+        self.assertTrue(self.es.bulk.call_args[1]['refresh'])
+        op = json.loads(self.es.bulk.call_args[0][0].splitlines()[0])
+        self.assertEqual(op['index']['_id'], 51)
+
+    def test_aexecute(self):
+        self.es.search = self._returns({'hits': {'total': 1, 'hits': [
+            {'_index': 'foo', '_type': 'doc', '_id': '1', '_source': {}}
+        ]}})
+        s = Search(index='foo')
+        response = self._run(s.aexecute())
+
+        self.assertEqual(response.hits.total, 1)
+        self.assertIs(s.execute(), response)
+        self.assertEqual(self.es.search.call_args[1]['index'], ['foo'])
+
+    def test_aexecute_single_flight(self):
+        from django_elasticsearch_dsl.singleflight import SingleFlight
+
+        self.es.search = self._returns({'hits': {'total': 1, 'hits': []}})
+        single_flight = SingleFlight()
+        with patch.object(registry, 'single_flight', single_flight), \
+                patch.object(single_flight, 'do',
+                             wraps=single_flight.do) as do:
+            response = self._run(Search(index='foo').aexecute())
+
+        self.assertEqual(response.hits.total, 1)
+        self.assertEqual(do.call_count, 1)
+        self.assertEqual(single_flight.in_flight(), {})
+
+    def test_aexecute_span(self):
+        self.es.search = self._returns({'took': 3, 'hits': {
+            'total': 0, 'hits': []
+        }})
+        tracer = RecordingTracer()
+        with patch.object(registry, 'tracer', tracer):
+            self._run(Search(index='foo').aexecute())
+
+        self.assertEqual([s.name for s in tracer.spans],
+                         ['ded.search.execute'])
+        self.assertEqual(tracer.spans[0].attributes, {
+            'index': 'foo', 'cached': False, 'hits': 0, 'took': 3
+        })
+
+    def test_aiterate(self):
+        def hits(*ids):
+            return {'_scroll_id': 'scroll', 'hits': {'hits': [
+                {'_index': 'foo', '_type': 'doc', '_id': str(pk),
+                 '_source': {}}
+                for pk in ids
+            ]}}
+
+        self.es.search = self._returns(hits(1, 2))
+        self.es.scroll = self._returns(hits(3), hits())
+        self.es.clear_scroll = self._returns(None)
+
+        async_iterator = Search(index='foo').aiterate(size=2)
+
+        def collect():
+            ids = []
+            while True:
+                try:
+                    hit = self._run(async_iterator.__anext__())
+                except StopAsyncIteration:  # noqa: F821
+                    return ids
+                ids.append(hit.meta.id)
+
+        self.assertEqual(collect(), ['1', '2', '3'])
+        self.assertEqual(self.es.search.call_args[1]['size'], 2)
+        self.assertEqual(self.es.search.call_args[1]['body']['sort'], '_doc')
+        self.es.clear_scroll.assert_called_once_with(
+            body={'scroll_id': ['scroll']}, ignore=(404,)
+        )
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from elasticsearch.exceptions import ConnectionError
+from elasticsearch.serializer import JSONSerializer
+from mock import Mock, patch
+
+from django_elasticsearch_dsl.breaker import CircuitBreaker, Spool
+from django_elasticsearch_dsl.registries import DocumentRegistry
+
+from .fixtures import WithFixturesMixin
+
+
+class SpoolTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_write_and_read(self):
+        spool = Spool(self.directory)
+        self.assertTrue(spool.is_empty())
+
+        spool.write(['{"a": 1}', '{"b": "é"}'])
+        segments = spool.segments()
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(
+            list(spool.read(segments[0])), [{'a': 1}, {'b': 'é'}]
+        )
+
+    def test_size_rotation(self):
+        spool = Spool(self.directory, max_bytes=9)
+        spool.write(['{"a": 1}', '{"a": 2}'])
+        spool.write(['{"a": 3}'])
+        spool.write(['{"a": 4}'])
+
+        segments = spool.segments()
+        self.assertEqual(len(segments), 3)
+        self.assertEqual(
+            [entry['a'] for path in segments for entry in spool.read(path)],
+            [1, 2, 3, 4]
+        )
+
+    def test_reopen_appends_to_last_segment(self):
+        Spool(self.directory).write(['{"a": 1}'])
+        spool = Spool(self.directory)
+        spool.write(['{"a": 2}'])
+
+        self.assertEqual(len(spool.segments()), 1)
+
+    def test_reject_invalid_lines(self):
+        spool = Spool(self.directory)
+        spool.write(['{"a": 1}', '{"a": 2, "b"', '{"a": 3}'])
+
+        with patch('django_elasticsearch_dsl.breaker.logger') as logger:
+            entries = list(spool.read(spool.segments()[0]))
+        self.assertEqual(entries, [{'a': 1}, {'a': 3}])
+        logger.warning.assert_called_once()
+        rejected = os.path.join(
+            self.directory, 'rejected-{}.ndjson'.format(os.getpid())
+        )
+        with open(rejected) as rejected_file:
+            self.assertEqual(rejected_file.read(), '{"a": 2, "b"\n')
+
+    def _write_segment(self, name, lines):
+        with open(os.path.join(self.directory, name), 'w') as segment:
+            segment.write(''.join(line + '\n' for line in lines))
+
+    def test_segments_by_process(self):
+        self._write_segment('spool-1-0000000001.ndjson', ['{"a": 1}'])
+        self._write_segment('spool-0000000001.ndjson', ['{"a": 2}'])
+        self._write_segment('spool-2-0000000001.ndjson', ['{"a": 3}'])
+
+        with patch('django_elasticsearch_dsl.breaker._is_alive',
+                   side_effect=lambda pid: pid == 2):
+            spool = Spool(self.directory)
+        spool.write(['{"a": 4}'])
+
+        # The segments of the dead processes are adopted, not the ones of
+        # the running process 2
+        self.assertEqual(
+            [entry['a'] for path in spool.segments()
+             for entry in spool.read(path)],
+            [2, 1, 4]
+        )
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, 'spool-2-0000000001.ndjson')
+        ))
+
+
+class CircuitBreakerTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.spool = Spool(directory)
+
+        self.client = Mock()
+        self.client.transport.serializer = JSONSerializer()
+        patcher = patch(
+            'django_elasticsearch_dsl.breaker.connections.get_connection',
+            Mock(return_value=self.client)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('django_elasticsearch_dsl.breaker.logger')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.breaker = CircuitBreaker(
+            self.spool, failure_threshold=2, reset_timeout=3600
+        )
+        self.addCleanup(self.breaker.stop)
+        # The tests replay the spool themselves
+        patcher = patch.object(self.breaker, '_start_replayer')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.doc = Mock()
+        self.doc._doc_type.using = 'default'
+
+    def _actions(self, *ids, **kwargs):
+        return [
+            {'_op_type': kwargs.get('action', 'index'), '_index': 'index',
+             '_id': pk, '_source': {'id': pk}}
+            for pk in ids
+        ]
+
+    def _spooled(self):
+        return [
+            entry for path in self.spool.segments()
+            for entry in self.spool.read(path)
+        ]
+
+    def test_closed(self):
+        self.doc._send_actions.return_value = (1, [])
+        self.assertEqual(
+            self.breaker.send(self.doc, self._actions(1), refresh=False),
+            (1, [])
+        )
+        self.doc._send_actions.assert_called_once_with(
+            self._actions(1), refresh=False
+        )
+        self.assertFalse(self.breaker.is_open)
+        self.assertTrue(self.spool.is_empty())
+
+    def test_failure_below_threshold_raises(self):
+        self.doc._send_actions.side_effect = ConnectionError
+        with self.assertRaises(ConnectionError):
+            self.breaker.send(self.doc, self._actions(1))
+        self.assertFalse(self.breaker.is_open)
+
+    def test_open_after_threshold(self):
+        self.doc._send_actions.side_effect = ConnectionError
+        with self.assertRaises(ConnectionError):
+            self.breaker.send(self.doc, self._actions(1))
+
+        self.breaker.send(self.doc, self._actions(2))
+        self.assertTrue(self.breaker.is_open)
+
+        self.breaker.send(self.doc, self._actions(3, action='delete'))
+        self.assertEqual(self.doc._send_actions.call_count, 2)
+        self.assertEqual(self._spooled(), [
+            {'using': 'default', 'action': action}
+            for action in self._actions(2) + self._actions(3, action='delete')
+        ])
+
+    def test_spill(self):
+        self.breaker.spill(self.doc, self._actions(1))
+        self.assertFalse(self.breaker.is_open)
+        self.assertTrue(self.breaker.is_spilling)
+
+        # Spooled after the spilled update, not sent before it
+        self.breaker.send(self.doc, self._actions(2))
+        self.assertFalse(self.doc._send_actions.called)
+        self.assertEqual(self._spooled(), [
+            {'using': 'default', 'action': action}
+            for action in self._actions(1, 2)
+        ])
+
+        with patch('django_elasticsearch_dsl.breaker.bulk') as mock_bulk:
+            self.assertTrue(self.breaker.replay())
+            self.assertEqual(
+                mock_bulk.call_args[1]['actions'], self._actions(1, 2)
+            )
+        self.assertFalse(self.breaker.is_spilling)
+
+        self.doc._send_actions.return_value = (1, [])
+        self.breaker.send(self.doc, self._actions(3))
+        self.doc._send_actions.assert_called_once_with(self._actions(3))
+
+    def test_replay(self):
+        self.breaker.spill(self.doc, self._actions(1))
+
+        with patch('django_elasticsearch_dsl.breaker.bulk') as mock_bulk:
+            self.assertTrue(self.breaker.replay())
+            mock_bulk.assert_called_once_with(
+                client=self.client,
+                actions=self._actions(1),
+                raise_on_error=False
+            )
+
+        self.assertFalse(self.breaker.is_open)
+        self.assertTrue(self.spool.is_empty())
+
+        self.doc._send_actions.return_value = (1, [])
+        self.breaker.send(self.doc, self._actions(2))
+        self.doc._send_actions.assert_called_once_with(self._actions(2))
+
+    def test_replay_rate_limited(self):
+        self.breaker.replay_batch_size = 2
+        actions = self._actions(1, 2, 3)
+        actions[2]['_index'] = 'other'
+        self.breaker.spill(self.doc, self._actions(4) + actions)
+
+        with patch('django_elasticsearch_dsl.breaker.bulk') as mock_bulk, \
+                patch('django_elasticsearch_dsl.breaker.registry') as reg:
+            self.assertTrue(self.breaker.replay())
+
+        batches = [self._actions(4, 1), self._actions(2), actions[2:]]
+        self.assertEqual(
+            [kwargs['actions'] for _, kwargs in mock_bulk.call_args_list],
+            batches
+        )
+        self.assertEqual(
+            [args[:2] for args, _ in
+             reg.rate_limiter.acquire.call_args_list],
+            [(batch[0]['_index'], batch) for batch in batches]
+        )
+
+    def test_replay_invalidates_search_cache(self):
+        self.breaker.spill(self.doc, self._actions(1))
+
+        with patch('django_elasticsearch_dsl.breaker.bulk'), \
+                patch('django_elasticsearch_dsl.breaker.registry') as reg:
+            self.breaker.replay()
+            reg.search_cache.invalidate.assert_called_once_with('index')
+
+    def test_replay_writes_during_replay(self):
+        self.breaker.spill(self.doc, self._actions(1))
+
+        def bulk(**kwargs):
+            # Spooled while the first segment is replayed
+            if kwargs['actions'] == self._actions(1):
+                self.breaker.send(self.doc, self._actions(2))
+
+        with patch('django_elasticsearch_dsl.breaker.bulk',
+                   Mock(side_effect=bulk)) as mock_bulk:
+            self.assertTrue(self.breaker.replay())
+
+        self.assertEqual(
+            [kwargs['actions'] for _, kwargs in mock_bulk.call_args_list],
+            [self._actions(1), self._actions(2)]
+        )
+        self.assertFalse(self.breaker.is_spilling)
+        self.assertTrue(self.spool.is_empty())
+
+    def test_replay_unreachable(self):
+        self.breaker.spill(self.doc, self._actions(1))
+
+        with patch('django_elasticsearch_dsl.breaker.bulk',
+                   Mock(side_effect=ConnectionError)):
+            self.assertFalse(self.breaker.replay())
+
+        self.assertEqual(len(self._spooled()), 1)
+
+    def test_replay_invalid_entries(self):
+        self.spool.write([
+            json.dumps({'using': 'default', 'action': self._actions(1)[0]}),
+            '{"using": "default", "act',
+            '[1, 2]',
+        ])
+        with patch('django_elasticsearch_dsl.breaker.bulk') as mock_bulk:
+            self.assertTrue(self.breaker.replay())
+            mock_bulk.assert_called_once_with(
+                client=self.client,
+                actions=self._actions(1),
+                raise_on_error=False
+            )
+        self.assertTrue(self.spool.is_empty())
+
+    def test_replayer_survives_errors(self):
+        breaker = CircuitBreaker(self.spool, reset_timeout=0.001)
+        self.addCleanup(breaker.stop)
+        with patch.object(breaker, 'replay',
+                          side_effect=[OSError, RuntimeError, True]) as replay:
+            breaker.spill(self.doc, self._actions(1))
+            breaker._replayer.join(5)
+
+        self.assertFalse(breaker._replayer.is_alive())
+        self.assertEqual(replay.call_count, 3)
+
+    def test_open_with_previous_spool(self):
+        self.spool.write([json.dumps({'using': 'default', 'action': {}})])
+        breaker = CircuitBreaker(self.spool, reset_timeout=3600)
+        self.addCleanup(breaker.stop)
+        self.assertTrue(breaker.is_open)
+
+
+class CircuitBreakerSettingsTestCase(TestCase):
+    @override_settings(ELASTICSEARCH_DSL_CIRCUIT_BREAKER={
+        'failure_threshold': 2
+    })
+    def test_spool_dir_required(self):
+        config = apps.get_app_config('django_elasticsearch_dsl')
+        with self.assertRaises(ImproperlyConfigured):
+            config.ready()
+
+
+class RegistryCircuitBreakerTestCase(WithFixturesMixin, TestCase):
+    def setUp(self):
+        self.registry = DocumentRegistry()
+        self.doc_a1 = self._generate_doc_mock(self.ModelA, Mock())
+        self.registry.circuit_breaker = Mock()
+
+    def test_update_through_breaker(self):
+        instance = self.ModelA(pk=3)
+        self.registry.delete(instance, raise_on_error=False)
+
+        self.assertFalse(self.doc_a1.update.called)
+        self.registry.circuit_breaker.send.assert_called_once()
+        args, kwargs = self.registry.circuit_breaker.send.call_args
+        self.assertIsInstance(args[0], self.doc_a1)
+        self.assertEqual(
+            [(a['_op_type'], a['_id']) for a in args[1]], [('delete', 3)]
+        )
+        self.assertEqual(kwargs, {'raise_on_error': False})
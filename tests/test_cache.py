@@ -0,0 +1,175 @@
+from unittest import TestCase
+
+from django.core.exceptions import ImproperlyConfigured
+from elasticsearch_dsl.connections import connections
+from mock import Mock, patch
+
+from django_elasticsearch_dsl.cache import DjangoCache, LRUCache, SearchCache
+from django_elasticsearch_dsl.refresh import CoalescedRefresher
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.search import Search
+
+from .documents import CarDocument
+from .models import Car
+
+
+class LRUCacheTestCase(TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = LRUCache(max_entries=2, clock=lambda: self.now)
+
+    def test_values_are_copied(self):
+        value = {'hits': [{'_id': '1'}]}
+        self.cache.set('a', value)
+        value['hits'][0]['_id'] = '2'
+        self.cache.get('a')['hits'][0]['_id'] = '3'
+        self.assertEqual(self.cache.get('a'), {'hits': [{'_id': '1'}]})
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('a', 1), 1)
+        self.cache.set('a', 'value')
+        self.assertEqual(self.cache.get('a'), 'value')
+
+    def test_timeout(self):
+        self.cache.set('a', 'value', timeout=10)
+        self.now = 9
+        self.assertEqual(self.cache.get('a'), 'value')
+        self.now = 10
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_least_recently_used_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3)
+
+
+class DjangoCacheTestCase(TestCase):
+    def test_get_set(self):
+        cache = DjangoCache()
+        self.addCleanup(cache.clear)
+        cache.set('ded:test', {'a': 1}, 10)
+        self.assertEqual(cache.get('ded:test'), {'a': 1})
+
+
+class SearchCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache = SearchCache(LRUCache())
+
+    def test_key_is_canonical(self):
+        s1 = Search(index='foo').filter('term', a=1).filter('term', b=2)
+        s2 = Search(index='foo').filter('term', a=1).filter('term', b=2)
+        self.assertEqual(self.cache.get_key(s1), self.cache.get_key(s2))
+        self.assertNotEqual(
+            self.cache.get_key(s1),
+            self.cache.get_key(s1.filter('term', c=3))
+        )
+        self.assertNotEqual(
+            self.cache.get_key(s1),
+            self.cache.get_key(s1.index('bar'))
+        )
+
+    def test_key_with_doc_type_names(self):
+        # Before elasticsearch-dsl 6 the doc types of a search are names
+        s = Search(index='foo', doc_type='car')
+        legacy = Mock(_using='default', _index=['foo'], _doc_type=['car'],
+                      _params={}, to_dict=s.to_dict, spec=[
+                          '_using', '_index', '_doc_type', '_params', 'to_dict'
+                      ])
+        self.assertEqual(self.cache.get_key(legacy), self.cache.get_key(s))
+
+    def test_invalidate(self):
+        foo = Search(index='foo')
+        bar = Search(index='bar')
+        all_indices = Search()
+        wildcard = Search(index='ba*')
+        keys = [self.cache.get_key(s) for s in (foo, bar, all_indices,
+                                                wildcard)]
+
+        self.cache.invalidate('foo')
+
+        self.assertNotEqual(self.cache.get_key(foo), keys[0])
+        self.assertEqual(self.cache.get_key(bar), keys[1])
+        self.assertNotEqual(self.cache.get_key(all_indices), keys[2])
+        self.assertNotEqual(self.cache.get_key(wildcard), keys[3])
+
+    def test_evicted_generation_is_not_reused(self):
+        s = Search(index='foo')
+        key = self.cache.get_key(s)
+        self.cache.backend.clear()
+        self.assertNotEqual(self.cache.get_key(s), key)
+
+
+class SearchExecuteCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache = SearchCache(LRUCache(), timeout=30)
+        patcher = patch.object(registry, 'search_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.es = Mock()
+        self.es.search.return_value = {'hits': {'total': 1, 'hits': [
+            {'_index': 'foo', '_type': 'doc', '_id': '1', '_source': {}}
+        ]}}
+        patcher = patch.object(connections, 'get_connection',
+                               return_value=self.es)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cached_response(self):
+        s = Search(index='foo').cache()
+        self.assertEqual(s.execute().hits.total, 1)
+        self.assertEqual(Search(index='foo').cache().execute().hits.total, 1)
+        self.assertEqual(self.es.search.call_count, 1)
+
+        self.cache.invalidate('foo')
+        Search(index='foo').cache().execute()
+        self.assertEqual(self.es.search.call_count, 2)
+
+    def test_coalesced_refresh_invalidates(self):
+        refresher = CoalescedRefresher(interval=3600)
+        self.addCleanup(refresher.cancel)
+        with patch('django_elasticsearch_dsl.documents.bulk'), \
+                patch('django_elasticsearch_dsl.documents.refresher',
+                      refresher), \
+                patch.object(CarDocument, 'connection', self.es):
+            CarDocument().update(Car(), refresh='coalesced')
+
+        # A search between the write and the refresh caches a stale response
+        Search(index='test_cars').cache().execute()
+        Search(index='test_cars').cache().execute()
+        self.assertEqual(self.es.search.call_count, 1)
+
+        refresher.flush()
+        self.es.indices.refresh.assert_called_once_with(
+            index='test_cars', ignore=404
+        )
+        Search(index='test_cars').cache().execute()
+        self.assertEqual(self.es.search.call_count, 2)
+
+    def test_cached_response_is_a_copy(self):
+        hit, = Search(index='foo').cache().raw(as_dict=True).execute()
+        hit['_source']['name'] = 'MUTATED'
+
+        hit, = Search(index='foo').cache().raw(as_dict=True).execute()
+        self.assertEqual(hit['_source'], {})
+        self.assertEqual(self.es.search.call_count, 1)
+
+    def test_not_cached_by_default(self):
+        Search(index='foo').execute()
+        Search(index='foo').execute()
+        self.assertEqual(self.es.search.call_count, 2)
+
+    def test_timeout(self):
+        with patch.object(self.cache.backend, 'set') as set_:
+            Search(index='foo').cache(timeout=5).execute()
+            self.assertEqual(set_.call_args[0][2], 5)
+
+    def test_cache_not_configured(self):
+        with patch.object(registry, 'search_cache', None):
+            with self.assertRaises(ImproperlyConfigured):
+                Search(index='foo').cache()
@@ -1,14 +1,24 @@
+from datetime import date
+import json
+import os
+import tempfile
 from mock import DEFAULT, Mock, patch
 from unittest import TestCase
 
 from django.core.management.base import CommandError
 from django.core.management import call_command
+from django.test import TestCase as DjangoTestCase
 from django.utils.six import StringIO
+from elasticsearch_dsl.connections import connections
 
+from django_elasticsearch_dsl import DocType, fields, profiling
+from django_elasticsearch_dsl.indices import Index
 from django_elasticsearch_dsl.management.commands.search_index import Command
 from django_elasticsearch_dsl.registries import DocumentRegistry
+from django_elasticsearch_dsl.test import FakeConnections
 
 from .fixtures import WithFixturesMixin
+from .models import Car
 
 
 class SearchIndexTestCase(WithFixturesMixin, TestCase):
@@ -158,3 +168,277 @@ class SearchIndexTestCase(WithFixturesMixin, TestCase):
             handles['_delete'].assert_called()
             handles['_create'].assert_not_called()
             handles['_populate'].assert_not_called()
+
+    def test_drain_outbox(self):
+        with patch(
+            'django_elasticsearch_dsl.management.commands.'
+            'search_index.outbox'
+        ) as outbox:
+            outbox.drain.side_effect = [10, 3, 0]
+            call_command('search_index', stdout=self.out,
+                         action='drain_outbox', batch_size=10)
+            self.assertEqual(outbox.drain.call_count, 3)
+            outbox.drain.assert_called_with(batch_size=10)
+
+    def test_drain_outbox_poll_error(self):
+        with patch(
+            'django_elasticsearch_dsl.management.commands.'
+            'search_index.outbox'
+        ) as outbox, patch(
+            'django_elasticsearch_dsl.management.commands.search_index.time'
+        ) as time:
+            outbox.drain.side_effect = [Exception, 3, KeyboardInterrupt]
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('search_index', stdout=self.out,
+                             action='drain_outbox', poll_interval=1)
+            self.assertEqual(outbox.drain.call_count, 3)
+            time.sleep.assert_called_once_with(1)
+            self.assertIn('Sent 3 outbox entries', self.out.getvalue())
+
+    def test_drain_outbox_error(self):
+        with patch(
+            'django_elasticsearch_dsl.management.commands.'
+            'search_index.outbox'
+        ) as outbox:
+            outbox.drain.side_effect = ValueError
+            with self.assertRaises(ValueError):
+                call_command('search_index', stdout=self.out,
+                             action='drain_outbox')
+
+    def test_populate_profile(self):
+        output = os.path.join(tempfile.mkdtemp(), 'profile.json')
+
+        def populate(models, options):
+            profiler = profiling.get_profiler()
+            profiler.call('CarDocument', 'name', lambda: None)
+
+        with patch.object(Command, '_populate', side_effect=populate):
+            call_command('search_index', stdout=self.out, action='populate',
+                         profile=True, profile_output=output)
+
+        self.assertIn('CarDocument', self.out.getvalue())
+        self.assertIsNone(profiling.get_profiler())
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual(
+            [(r['document'], r['field'], r['calls']) for r in results],
+            [('CarDocument', 'name', 1)]
+        )
+
+    def test_profile_requires_populate(self):
+        with self.assertRaises(CommandError):
+            call_command('search_index', stdout=self.out, action='create',
+                         profile=True)
+
+
+class SearchIndexFingerprintTestCase(DjangoTestCase):
+    def setUp(self):
+        self.out = StringIO()
+        patcher = FakeConnections()
+        self.cluster = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        Car.objects.bulk_create([
+            Car(name="508", type='se', launched=date(2010, 9, 9)),
+            Car(name="C3", type='co', launched=date(2002, 4, 1)),
+        ])
+
+    def register(self, model_fields, **attrs):
+        """
+        Register a document of the cars with ``model_fields`` and the
+        ``attrs`` fields in a new registry used by the command.
+        """
+        registry = DocumentRegistry()
+        with patch('django_elasticsearch_dsl.indices.registry', registry):
+            index = Index('fingerprint_cars')
+            index.settings(number_of_shards=attrs.pop('number_of_shards', 1))
+            attrs['Meta'] = type(str('Meta'), (), {
+                'model': Car, 'fields': model_fields, 'ignore_signals': True,
+            })
+            index.doc_type(
+                type(str('FingerprintCarDocument'), (DocType,), attrs)
+            )
+        patcher = patch(
+            'django_elasticsearch_dsl.management.commands.search_index.'
+            'registry', registry
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return index
+
+    def call(self, action, **options):
+        self.out.seek(0)
+        self.out.truncate()
+        call_command('search_index', stdout=self.out, action=action,
+                     force=True, **options)
+        return self.out.getvalue()
+
+    def count_docs(self):
+        return len(self.cluster.indices['fingerprint_cars'].docs)
+
+    def get_mapping(self):
+        mapping, = self.cluster.indices['fingerprint_cars'].mappings.values()
+        return mapping
+
+    def test_fingerprint(self):
+        index = self.register(['name'])
+        fingerprint = index.get_fingerprint()
+
+        self.assertEqual(self.register(['name']).get_fingerprint(),
+                         fingerprint)
+        changed = self.register(['name', 'type']).get_fingerprint()
+        self.assertEqual(changed['settings'], fingerprint['settings'])
+        self.assertNotEqual(changed['mappings'], fingerprint['mappings'])
+        changed = self.register(['name'], number_of_shards=2)
+        self.assertEqual(changed.get_fingerprint()['mappings'],
+                         fingerprint['mappings'])
+        self.assertNotEqual(changed.get_fingerprint()['settings'],
+                            fingerprint['settings'])
+        mapping, = index.to_dict()['mappings'].values()
+        self.assertEqual(mapping['_meta'], {'ded_fingerprint': fingerprint})
+
+    def test_check(self):
+        self.register(['name'])
+        with self.assertRaises(CommandError):
+            self.call('check')
+        self.assertIn("Index 'fingerprint_cars': missing", self.out.getvalue())
+
+        self.call('create')
+        self.assertIn("up to date", self.call('check'))
+
+        self.register(['name', 'type'])
+        with self.assertRaises(CommandError):
+            self.call('check')
+        self.assertIn("mappings changed", self.out.getvalue())
+
+        self.register(['name'], number_of_shards=2)
+        with self.assertRaises(CommandError):
+            self.call('check')
+        self.assertIn("settings changed", self.out.getvalue())
+
+    def test_check_without_fingerprint(self):
+        self.register(['name'])
+        connections.get_connection().indices.create('fingerprint_cars')
+        with self.assertRaises(CommandError):
+            self.call('check')
+        self.assertIn("no fingerprint", self.out.getvalue())
+
+    def test_rebuild_changed(self):
+        self.register(['name'])
+        self.call('rebuild_changed')
+        self.assertEqual(self.count_docs(), 2)
+
+        self.assertIn("is up to date", self.call('rebuild_changed'))
+        self.assertEqual(self.cluster.count('delete_index'), 0)
+
+        # An added field is put in the mappings, without reindexing
+        self.register(['name', 'type'])
+        self.cluster.reset_stats()
+        self.assertIn("Updated the mappings", self.call('rebuild_changed'))
+        self.assertEqual(self.cluster.count('bulk'), 0)
+        self.assertIn('type', self.get_mapping()['properties'])
+        self.assertIn("up to date", self.call('check'))
+
+        # A new field type can't be put, the index is rebuilt
+        self.register(['name'], type=fields.IntegerField())
+        self.cluster.reset_stats()
+        output = self.call('rebuild_changed')
+        self.assertIn("can't be updated", output)
+        self.assertIn("Rebuilding index 'fingerprint_cars'", output)
+        self.assertEqual(self.cluster.count('delete_index'), 1)
+        self.assertEqual(
+            self.get_mapping()['properties']['type']['type'], 'integer'
+        )
+        self.assertEqual(self.count_docs(), 2)
+
+    def get_index_names(self):
+        es = connections.get_connection()
+        return sorted(es.indices.get_alias(index='fingerprint_cars'))
+
+    def test_reindex_from_source(self):
+        self.register(['name'])
+        self.call('rebuild_changed')
+
+        self.register(['name'], type=fields.IntegerField())
+        self.cluster.reset_stats()
+        es = connections.get_connection()
+        with patch.object(es, 'reindex', wraps=es.reindex) as reindex:
+            output = self.call('reindex_from_source', slices=2,
+                               requests_per_second=500)
+
+        new_name, = self.get_index_names()
+        self.assertTrue(new_name.startswith('fingerprint_cars-'))
+        self.assertIn("Copied 2/2 documents into '{}'".format(new_name),
+                      output)
+        self.assertEqual(self.cluster.count('bulk'), 0)
+        self.assertEqual(reindex.call_args[1]['slices'], 2)
+        self.assertEqual(reindex.call_args[1]['requests_per_second'], 500)
+        self.assertFalse(reindex.call_args[1]['wait_for_completion'])
+
+        new_index = self.cluster.indices[new_name]
+        self.assertEqual(new_index.aliases, set(['fingerprint_cars']))
+        self.assertNotIn('fingerprint_cars', self.cluster.indices)
+        self.assertEqual(len(new_index.searchable), 2)
+        self.assertIsNone(new_index.settings['refresh_interval'])
+        mapping, = new_index.mappings.values()
+        self.assertEqual(mapping['properties']['type']['type'], 'integer')
+        self.assertIn("up to date", self.call('check'))
+
+        # The next reindex copies the aliased index
+        self.call('reindex_from_source')
+        newer_name, = self.get_index_names()
+        self.assertNotEqual(newer_name, new_name)
+        self.assertEqual(len(self.cluster.indices[newer_name].docs), 2)
+
+        # The indices of the alias are deleted by the other actions
+        self.call('rebuild')
+        self.assertEqual(list(self.cluster.indices), ['fingerprint_cars'])
+        self.call('reindex_from_source')
+        self.register(['name'], number_of_shards=2)
+        self.assertIn("Rebuilding", self.call('rebuild_changed'))
+        self.assertEqual(list(self.cluster.indices), ['fingerprint_cars'])
+        self.call('reindex_from_source')
+        self.call('delete')
+        self.assertEqual(list(self.cluster.indices), [])
+
+    def test_reindex_from_source_polls(self):
+        self.register(['name'])
+        self.call('rebuild_changed')
+        get_task = self.cluster.get_task
+
+        def running(task_id):
+            task = get_task(task_id)
+            task['completed'] = False
+            task['task']['status'].update(created=1, total=2)
+            return task
+
+        responses = [running, get_task]
+        with patch.object(self.cluster, 'get_task', side_effect=lambda
+                          task_id: responses.pop(0)(task_id)), \
+                patch('django_elasticsearch_dsl.management.commands.'
+                      'search_index.time') as time:
+            output = self.call('reindex_from_source', poll_interval=2)
+
+        time.sleep.assert_called_once_with(2)
+        self.assertIn("Copied 1/2 documents", output)
+        self.assertIn("Copied 2/2 documents", output)
+
+    def test_reindex_from_source_failures(self):
+        self.register(['name'])
+        self.call('rebuild_changed')
+
+        task = {
+            'completed': True,
+            'task': {'status': {'total': 2, 'created': 1, 'updated': 0}},
+            'response': {'failures': [{'id': '2', 'cause': 'mapping'}]},
+        }
+        with patch.object(self.cluster, 'get_task', return_value=task):
+            with self.assertRaises(CommandError):
+                self.call('reindex_from_source')
+
+        self.assertEqual(list(self.cluster.indices), ['fingerprint_cars'])
+
+    def test_reindex_from_source_missing_index(self):
+        self.register(['name'])
+        with self.assertRaises(CommandError):
+            self.call('reindex_from_source')
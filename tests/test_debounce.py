@@ -0,0 +1,187 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from django_elasticsearch_dsl.debounce import Debouncer
+from django_elasticsearch_dsl.documents import DocType
+from django_elasticsearch_dsl.registries import DocumentRegistry
+from django_elasticsearch_dsl.signals import (
+    DebouncedSignalProcessor, RealTimeSignalProcessor
+)
+
+from .fixtures import Clock, WithFixturesMixin
+
+
+class DebouncerTestCase(WithFixturesMixin, TestCase):
+    def setUp(self):
+        self.registry = DocumentRegistry()
+        self.registry._update_doc = Mock()
+        self.doc_a1 = self._generate_doc_mock(self.ModelA, Mock())
+        self.doc_a2 = self._generate_doc_mock(
+            self.ModelA, Mock(), _ignore_signals=True
+        )
+        self.doc_d1 = self._generate_doc_mock(
+            self.ModelD, Mock(), _related_models=[self.ModelE]
+        )
+
+        patcher = patch('django_elasticsearch_dsl.debounce.registry',
+                        self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.clock = Clock()
+        self.debouncer = Debouncer(
+            window=1, max_latency=5, max_pending=100, clock=self.clock
+        )
+
+    def _sent(self):
+        return [
+            (type(args[0]), list(args[1]), kwargs)
+            for args, kwargs in self.registry._update_doc.call_args_list
+        ]
+
+    def _get_object_list_by_pks(self, pks, action):
+        return pks
+
+    def test_keep_latest_action(self):
+        with patch.object(DocType, '_get_object_list_by_pks',
+                          self._get_object_list_by_pks):
+            self.debouncer.add_instance(self.ModelA(pk=1))
+            self.debouncer.add_instance(self.ModelA(pk=1))
+            self.debouncer.add_instance(self.ModelA(pk=2))
+            self.debouncer.add_instance(self.ModelA(pk=2), action='delete')
+
+            self.clock.now += 0.5
+            self.debouncer.flush()
+            self.assertFalse(self.registry._update_doc.called)
+
+            self.clock.now += 1
+            self.debouncer.flush()
+
+        self.assertEqual(sorted(self._sent(), key=lambda s: s[1]), [
+            (self.doc_a1, [1], {'action': 'index'}),
+            (self.doc_a1, [2], {'action': 'delete', 'raise_on_error': False}),
+        ])
+
+    def test_window_restarts_until_max_latency(self):
+        with patch.object(DocType, '_get_object_list_by_pks',
+                          self._get_object_list_by_pks):
+            for i in range(5):
+                self.debouncer.add(self.doc_a1, 1)
+                self.clock.now += 0.9
+                self.debouncer.flush()
+                self.assertFalse(self.registry._update_doc.called)
+
+            self.debouncer.add(self.doc_a1, 1)
+            self.clock.now += 0.9
+            self.debouncer.flush()
+
+        self.assertEqual(self._sent(), [
+            (self.doc_a1, [1], {'action': 'index'}),
+        ])
+
+    def test_document_window(self):
+        class Doc(DocType):
+            class Meta:
+                model = self.ModelA
+                debounce_window = 10
+
+        self.debouncer.add(Doc, 1)
+        self.clock.now += 2
+        self.debouncer.flush()
+        self.assertFalse(self.registry._update_doc.called)
+
+        self.clock.now += 3
+        with patch.object(DocType, '_get_object_list_by_pks',
+                          self._get_object_list_by_pks):
+            self.debouncer.flush()
+        self.assertEqual(self._sent(), [(Doc, [1], {'action': 'index'})])
+
+    def test_max_pending(self):
+        self.debouncer.max_pending = 2
+        with patch.object(DocType, '_get_object_list_by_pks',
+                          self._get_object_list_by_pks):
+            self.debouncer.add(self.doc_a1, 1)
+            self.assertFalse(self.registry._update_doc.called)
+            self.debouncer.add(self.doc_a1, 2)
+
+        self.assertEqual(
+            [(doc, sorted(pks), kwargs) for doc, pks, kwargs in self._sent()],
+            [(self.doc_a1, [1, 2], {'action': 'index'})]
+        )
+
+    def test_run_closes_old_connections(self):
+        self.debouncer.add(self.doc_a1, 1)
+        self.clock.now += 1
+
+        def flush():
+            self.debouncer._stopped = True
+            raise RuntimeError
+
+        with patch('django_elasticsearch_dsl.debounce.'
+                   'close_old_connections') as close_old_connections, \
+                patch('django_elasticsearch_dsl.debounce.logger') as logger, \
+                patch.object(self.debouncer, 'flush', side_effect=flush):
+            self.debouncer._run()
+
+        self.assertEqual(close_old_connections.call_count, 2)
+        logger.exception.assert_called_once()
+
+    def test_get_related_pks(self):
+        self.doc_d1.get_instances_from_related.return_value = [
+            self.ModelD(pk=3), self.ModelD(pk=4)
+        ]
+        self.assertEqual(
+            self.debouncer.get_related_pks(self.ModelE(pk=1)),
+            [(self.doc_d1, 3), (self.doc_d1, 4)]
+        )
+
+        self.doc_d1.get_instances_from_related.return_value = None
+        self.assertEqual(
+            self.debouncer.get_related_pks(self.ModelE(pk=1)), []
+        )
+
+
+class DebouncedSignalProcessorTestCase(TestCase):
+    def setUp(self):
+        self.processor = DebouncedSignalProcessor.__new__(
+            DebouncedSignalProcessor
+        )
+        self.processor.debouncer = Mock()
+        self.processor.debouncer.get_related_pks.return_value = [('doc', 3)]
+        self.instance = Mock()
+
+    @patch('django_elasticsearch_dsl.signals.atexit')
+    @patch('django_elasticsearch_dsl.signals.Debouncer')
+    def test_stop_at_exit(self, debouncer_class, atexit):
+        processor = DebouncedSignalProcessor.__new__(DebouncedSignalProcessor)
+        with patch.object(RealTimeSignalProcessor, 'setup'), \
+                patch.object(RealTimeSignalProcessor, 'teardown'):
+            processor.setup()
+            atexit.register.assert_called_once_with(
+                debouncer_class.return_value.stop
+            )
+            processor.teardown()
+        atexit.unregister.assert_called_once_with(
+            debouncer_class.return_value.stop
+        )
+        debouncer_class.return_value.stop.assert_called_once_with()
+
+    def test_handle_save(self):
+        self.processor.handle_save(None, self.instance)
+        self.processor.debouncer.add_instance.assert_called_once_with(
+            self.instance
+        )
+        self.processor.debouncer.add_all.assert_called_once_with(
+            [('doc', 3)]
+        )
+
+    def test_handle_delete(self):
+        self.processor.handle_pre_delete(None, self.instance)
+        self.processor.handle_delete(None, self.instance)
+        self.processor.debouncer.add_all.assert_called_once_with(
+            [('doc', 3)]
+        )
+        self.processor.debouncer.add_instance.assert_called_once_with(
+            self.instance, action='delete'
+        )
@@ -1,5 +1,6 @@
 from unittest import TestCase
 
+from django.core.exceptions import ImproperlyConfigured
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from elasticsearch_dsl import GeoPoint
@@ -54,6 +55,29 @@ class DocTypeTestCase(TestCase):
     def test_model_class_added(self):
         self.assertEqual(CarDocument._doc_type.model, Car)
 
+    def test_model_fields(self):
+        class CarDocument2(DocType):
+            color = fields.TextField(attr='name')
+            manufacturer = fields.IntegerField(attr='manufacturer_id')
+            maker = fields.ObjectField(attr='manufacturer')
+            type = fields.StringField()
+
+            class Meta:
+                model = Car
+                fields = ['price', 'not_indexed']
+
+            def prepare_not_indexed(self, instance):
+                return ''
+
+        self.assertEqual(
+            CarDocument2._doc_type.model_fields,
+            {
+                'color': Car._meta.get_field('name'),
+                'manufacturer': Car._meta.get_field('manufacturer'),
+                'price': Car._meta.get_field('price'),
+            }
+        )
+
     def test_ignore_signal_default(self):
         self.assertFalse(CarDocument._doc_type.ignore_signals)
 
@@ -76,6 +100,21 @@ class DocTypeTestCase(TestCase):
 
         self.assertFalse(CarDocument2._doc_type.auto_refresh)
 
+    def test_auto_refresh_policy_added(self):
+        class CarDocument2(DocType):
+            class Meta:
+                model = Car
+                auto_refresh = 'coalesced'
+
+        self.assertEqual(CarDocument2._doc_type.auto_refresh, 'coalesced')
+
+    def test_invalid_auto_refresh_policy(self):
+        with self.assertRaises(ImproperlyConfigured):
+            class CarDocument2(DocType):
+                class Meta:
+                    model = Car
+                    auto_refresh = 'sometimes'
+
     def test_queryset_pagination_added(self):
         class CarDocument2(DocType):
             class Meta:
@@ -254,6 +293,67 @@ class DocTypeTestCase(TestCase):
             doc.update(car)
             self.assertNotIn('refresh', mock.call_args_list[0][1])
 
+    def test_model_instance_update_refresh_wait_for(self):
+        doc = CarDocument()
+        car = Car()
+        with patch('django_elasticsearch_dsl.documents.bulk') as mock:
+            doc.update(car, refresh='wait_for')
+            self.assertEqual(mock.call_args_list[0][1]['refresh'], 'wait_for')
+
+    def test_model_instance_update_refresh_coalesced(self):
+        doc = CarDocument()
+        car = Car()
+        with patch('django_elasticsearch_dsl.documents.bulk') as mock, \
+                patch('django_elasticsearch_dsl.documents.refresher') as ref:
+            doc.update(car, refresh='coalesced')
+            self.assertNotIn('refresh', mock.call_args_list[0][1])
+            ref.schedule.assert_called_once_with(doc.connection, 'car_index')
+
+    def test_model_instance_update_invalidates_search_cache(self):
+        doc = CarDocument()
+        car = Car()
+        with patch('django_elasticsearch_dsl.documents.bulk'), \
+                patch('django_elasticsearch_dsl.documents.registry') as reg:
+            reg.metrics = None
+            reg.tracer = None
+            doc.update(car)
+            reg.search_cache.invalidate.assert_called_once_with('car_index')
+
+    def test_model_instance_update_no_refresh_invalidates_later(self):
+        doc = CarDocument()
+        car = Car()
+        with patch('django_elasticsearch_dsl.documents.bulk'), \
+                patch('django_elasticsearch_dsl.documents.registry') as reg, \
+                patch('django_elasticsearch_dsl.documents.refresher') as ref:
+            reg.metrics = None
+            reg.tracer = None
+            doc.update(car, refresh=False)
+            reg.search_cache.invalidate.assert_called_once_with('car_index')
+            ref.schedule.assert_called_once_with(
+                doc.connection, 'car_index', refresh=False
+            )
+
+    def test_update_by_pks_delete(self):
+        doc = CarDocument()
+        with patch('django_elasticsearch_dsl.documents.bulk') as mock:
+            doc.update_by_pks(['4', '5'], action='delete')
+            actions = list(mock.call_args_list[0][1]['actions'])
+            self.assertEqual(['4', '5'], [a['_id'] for a in actions])
+            self.assertEqual(['delete', 'delete'],
+                             [a['_op_type'] for a in actions])
+
+    def test_update_by_pks_index(self):
+        doc = CarDocument()
+        with patch.object(CarDocument, 'get_queryset') as get_queryset, \
+                patch.object(CarDocument, 'update') as update:
+            doc.update_by_pks(['4', '5'])
+            get_queryset.return_value.filter.assert_called_once_with(
+                pk__in=['4', '5']
+            )
+            update.assert_called_once_with(
+                get_queryset.return_value.filter.return_value, action='index'
+            )
+
     def test_model_instance_iterable_update_with_pagination(self):
         class CarDocument2(DocType):
             class Meta:
@@ -0,0 +1,240 @@
+from datetime import date
+from unittest import TestCase
+
+from django.test import TestCase as DjangoTestCase
+from elasticsearch import Elasticsearch, NotFoundError, TransportError
+from elasticsearch.helpers import bulk, scan
+from elasticsearch_dsl.connections import connections
+
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.test import (
+    ESTestCase,
+    FakeCluster,
+    FakeConnection,
+    FakeConnections,
+    fake_cluster,
+)
+
+from .documents import CarDocument
+from .models import Car, Manufacturer
+
+
+class FakeConnectionsTestCase(TestCase):
+    def test_restore(self):
+        es = connections.get_connection()
+        with FakeConnections(aliases=('default', 'fake')) as cluster:
+            fake = connections.get_connection()
+            self.assertIsNot(fake, es)
+            self.assertIs(fake.transport.get_connection().cluster, cluster)
+
+        self.assertIs(connections.get_connection(), es)
+        self.assertNotIsInstance(
+            connections.get_connection().transport.get_connection(),
+            FakeConnection
+        )
+        with self.assertRaises(KeyError):
+            connections.get_connection('fake')
+
+
+class FakeConnectionTestCase(TestCase):
+    def setUp(self):
+        self.cluster = FakeCluster()
+        self.es = Elasticsearch(
+            connection_class=FakeConnection, cluster=self.cluster
+        )
+        self.es.indices.create('cars', body={
+            'settings': {'number_of_shards': 1},
+            'mappings': {'car': {'properties': {
+                'name': {'type': 'text'}, 'year': {'type': 'integer'},
+            }}},
+        })
+        bulk(self.es, [
+            {'_index': 'cars', '_type': 'car', '_id': i,
+             'name': 'Car %s' % name, 'year': 2000 + i}
+            for i, name in enumerate(['one', 'two', 'three'])
+        ])
+
+    def search(self, **body):
+        return self.es.search(index='cars', body=body)
+
+    def test_index(self):
+        self.assertTrue(self.es.indices.exists('cars'))
+        self.assertFalse(self.es.indices.exists('planes'))
+        self.assertEqual(
+            self.es.indices.get_mapping('cars')['cars']['mappings']['car'],
+            {'properties': {
+                'name': {'type': 'text'}, 'year': {'type': 'integer'},
+            }}
+        )
+        with self.assertRaises(TransportError) as cm:
+            self.es.indices.create('cars')
+        self.assertEqual(cm.exception.status_code, 400)
+
+        self.es.indices.delete('cars')
+        self.assertFalse(self.es.indices.exists('cars'))
+        with self.assertRaises(NotFoundError):
+            self.es.indices.delete('cars')
+
+    def test_delete_alias(self):
+        self.es.indices.put_alias(index='cars', name='vehicles')
+        with self.assertRaises(TransportError) as cm:
+            self.es.indices.delete('vehicles')
+        self.assertEqual(cm.exception.status_code, 400)
+
+        self.es.indices.delete('veh*')
+        self.assertTrue(self.es.indices.exists('cars'))
+        self.es.indices.delete('car*')
+        self.assertFalse(self.es.indices.exists('cars'))
+
+    def test_put_mapping(self):
+        self.es.indices.put_mapping(doc_type='car', index='cars', body={
+            'properties': {'type': {'type': 'keyword'}}
+        })
+        mapping = self.es.indices.get_mapping('cars')['cars']['mappings']
+        self.assertEqual(
+            sorted(mapping['car']['properties']), ['name', 'type', 'year']
+        )
+        with self.assertRaises(TransportError) as cm:
+            self.es.indices.put_mapping(doc_type='car', index='cars', body={
+                'properties': {'year': {'type': 'keyword'}}
+            })
+        self.assertEqual(cm.exception.status_code, 400)
+
+    def test_documents_searchable_after_refresh(self):
+        self.assertEqual(self.search()['hits']['total'], 0)
+        self.assertTrue(
+            self.es.get(index='cars', doc_type='car', id='1')['found']
+        )
+
+        self.es.indices.refresh('cars')
+        self.assertEqual(self.search()['hits']['total'], 3)
+
+    def test_get_mget(self):
+        self.assertEqual(
+            self.es.get(index='cars', doc_type='car', id='1')['_source'],
+            {'name': 'Car two', 'year': 2001}
+        )
+        with self.assertRaises(NotFoundError):
+            self.es.get(index='cars', doc_type='car', id='9')
+
+        docs = self.es.mget(index='cars', doc_type='car', body={
+            'ids': ['2', '9']
+        })['docs']
+        self.assertEqual([d['found'] for d in docs], [True, False])
+
+    def test_bulk_update_delete(self):
+        bulk(self.es, [
+            {'_op_type': 'update', '_index': 'cars', '_type': 'car',
+             '_id': 0, 'doc': {'year': 1999}},
+            {'_op_type': 'delete', '_index': 'cars', '_type': 'car',
+             '_id': 1},
+        ], refresh=True)
+
+        hits = self.search(sort=['year'])['hits']['hits']
+        self.assertEqual([h['_id'] for h in hits], ['0', '2'])
+        self.assertEqual(hits[0]['_source']['year'], 1999)
+
+        success, errors = bulk(self.es, [
+            {'_op_type': 'delete', '_index': 'cars', '_type': 'car',
+             '_id': 1},
+        ], raise_on_error=False)
+        self.assertEqual(errors[0]['delete']['status'], 404)
+
+    def test_queries(self):
+        self.es.indices.refresh('cars')
+
+        def ids(query, **body):
+            hits = self.search(query=query, sort=['_id'], **body)
+            return [hit['_id'] for hit in hits['hits']['hits']]
+
+        self.assertEqual(ids({'match_all': {}}), ['0', '1', '2'])
+        self.assertEqual(ids({'term': {'year': 2001}}), ['1'])
+        self.assertEqual(ids({'terms': {'year': [2000, 2002]}}), ['0', '2'])
+        self.assertEqual(ids({'ids': {'values': [2, 0]}}), ['0', '2'])
+        self.assertEqual(ids({'match': {'name': 'THREE'}}), ['2'])
+        self.assertEqual(ids({'range': {'year': {'gt': 2000}}}), ['1', '2'])
+        self.assertEqual(ids({'bool': {
+            'filter': [{'match': {'name': 'car'}}],
+            'must_not': [{'term': {'year': 2001}}],
+        }}), ['0', '2'])
+        with self.assertRaises(TransportError):
+            ids({'fuzzy': {'name': 'car'}})
+
+    def test_sort_pagination_source(self):
+        self.es.indices.refresh('cars')
+
+        response = self.search(
+            sort=[{'year': 'desc'}], size=1, _source=['year']
+        )
+        hit = response['hits']['hits'][0]
+        self.assertEqual(response['hits']['total'], 3)
+        self.assertEqual((hit['_id'], hit['sort']), ('2', [2002]))
+        self.assertEqual(hit['_source'], {'year': 2002})
+
+        hits = self.search(sort=[{'year': 'desc'}], search_after=[2002])
+        self.assertEqual(
+            [h['_id'] for h in hits['hits']['hits']], ['1', '0']
+        )
+        hits = self.search(sort=['_id'], **{'from': 2})['hits']['hits']
+        self.assertEqual([h['_id'] for h in hits], ['2'])
+
+    def test_scroll(self):
+        self.es.indices.refresh('cars')
+        ids = [hit['_id'] for hit in scan(self.es, index='cars', size=2)]
+
+        self.assertEqual(sorted(ids), ['0', '1', '2'])
+        self.assertEqual(self.cluster.count('scroll'), 2)
+        self.assertEqual(self.cluster.scrolls, {})
+
+    def test_stats(self):
+        self.cluster.reset_stats()
+        self.es.indices.refresh('cars')
+        self.search()
+
+        self.assertEqual(self.cluster.count(), 2)
+        self.assertEqual(self.cluster.count('search'), 1)
+        self.assertEqual(self.cluster.bytes_sent('search'), len(b'{}'))
+        self.assertGreater(self.cluster.bytes_received('search'), 0)
+        self.assertEqual(
+            self.cluster.bytes_received(),
+            sum(r.bytes_received for r in self.cluster.requests)
+        )
+
+
+class FakeESTestCase(ESTestCase, DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(FakeESTestCase, cls).setUpClass()
+        cls._patcher = FakeConnections(fake_cluster)
+        cls._patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._patcher.stop()
+        super(FakeESTestCase, cls).tearDownClass()
+
+    def setUp(self):
+        fake_cluster.reset()
+        super(FakeESTestCase, self).setUp()
+
+    def test_index_and_search(self):
+        manufacturer = Manufacturer.objects.create(
+            name="Peugeot", created=date(1900, 10, 9), country_code="FR"
+        )
+        fake_cluster.reset_stats()
+        car = Car.objects.create(
+            name="508", launched=date(2010, 9, 9), manufacturer=manufacturer
+        )
+        # A bulk request per document of the model
+        self.assertEqual(fake_cluster.count('bulk'), len([
+            doc for doc in registry.get_documents([Car])
+            if not doc._doc_type.ignore_signals
+        ]))
+
+        s = CarDocument.search().query('match', manufacturer__name='peugeot')
+        self.assertEqual(s.count(), 1)
+        self.assertEqual(list(s.to_queryset()), [car])
+        self.assertEqual(s.execute()[0].manufacturer.country, 'France')
+
+        car.delete()
+        self.assertEqual(CarDocument.search().count(), 0)
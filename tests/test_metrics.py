@@ -0,0 +1,105 @@
+from datetime import date
+from unittest import TestCase
+
+from django.test import TestCase as DjangoTestCase
+from elasticsearch_dsl.connections import connections
+
+from django_elasticsearch_dsl.metrics import InMemoryExporter
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.test import FakeConnections
+
+from .documents import CarDocument
+from .models import Car
+
+
+class InMemoryExporterTestCase(TestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter(buckets={'latency': [0.1, 1]})
+
+    def test_counter(self):
+        self.exporter.inc('docs', document='A')
+        self.exporter.inc('docs', 2, document='A')
+        self.exporter.inc('docs', document='B')
+
+        self.assertEqual(self.exporter.get_counter('docs', document='A'), 3)
+        self.assertEqual(self.exporter.get_counter('docs', document='C'), 0)
+
+    def test_histogram(self):
+        for value in (0.05, 0.5, 5):
+            self.exporter.observe('latency', value)
+
+        self.assertEqual(self.exporter.get_histogram('latency'), {
+            'count': 3, 'sum': 5.55, 'buckets': [(0.1, 1), (1, 2)],
+        })
+        self.assertIsNone(self.exporter.get_histogram('unknown'))
+
+    def test_render(self):
+        self.assertEqual(self.exporter.render(), '')
+
+        self.exporter.inc('docs', document='A "quoted"')
+        self.exporter.observe('latency', 0.5, index='cars')
+        self.assertEqual(self.exporter.render(), '\n'.join([
+            '# TYPE docs counter',
+            'docs{document="A \\"quoted\\""} 1.0',
+            '# TYPE latency histogram',
+            'latency_bucket{index="cars",le="0.1"} 0',
+            'latency_bucket{index="cars",le="1"} 1',
+            'latency_bucket{index="cars",le="+Inf"} 1',
+            'latency_sum{index="cars"} 0.5',
+            'latency_count{index="cars"} 1',
+        ]) + '\n')
+
+
+class MetricsTestCase(DjangoTestCase):
+    def setUp(self):
+        patcher = FakeConnections()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        registry.metrics = InMemoryExporter()
+        self.addCleanup(setattr, registry, 'metrics', None)
+
+    def test_indexing(self):
+        metrics = registry.metrics
+        Car.objects.create(name="508", launched=date(2010, 9, 9))
+
+        for name in ('ded_documents_prepared_total',
+                     'ded_documents_indexed_total'):
+            self.assertEqual(
+                metrics.get_counter(name, document='CarDocument'), 1
+            )
+        bulk_bytes = metrics.get_histogram(
+            'ded_bulk_request_bytes', document='CarDocument'
+        )
+        self.assertEqual(bulk_bytes['count'], 1)
+        self.assertGreater(bulk_bytes['sum'], 0)
+        self.assertEqual(metrics.get_histogram(
+            'ded_bulk_request_seconds', document='CarDocument'
+        )['count'], 1)
+        self.assertEqual(metrics.get_histogram(
+            'ded_signal_handler_seconds', signal='post_save',
+            model='tests.Car'
+        )['count'], 1)
+
+    def test_bulk_errors(self):
+        CarDocument().update(
+            [Car(pk=1), Car(pk=2)], action='delete', raise_on_error=False
+        )
+        self.assertEqual(registry.metrics.get_counter(
+            'ded_bulk_item_errors_total', document='CarDocument'
+        ), 2)
+        self.assertEqual(registry.metrics.get_counter(
+            'ded_documents_prepared_total', document='CarDocument'
+        ), 0)
+
+    def test_search(self):
+        index = CarDocument._doc_type.index
+        connections.get_connection().indices.create(index)
+        CarDocument.search().execute()
+
+        self.assertEqual(registry.metrics.get_histogram(
+            'ded_search_seconds', index=index
+        )['count'], 1)
+        took = registry.metrics.get_histogram(
+            'ded_search_took_seconds', index=index
+        )
+        self.assertEqual(took['sum'], 0.001)
@@ -0,0 +1,70 @@
+from django.test import TestCase
+from mock import Mock, patch
+
+from django_elasticsearch_dsl.ordering import (
+    ArrayPositionOrdering,
+    CaseOrdering,
+    PythonOrdering,
+    get_ordering_strategy,
+    ordering_strategies,
+)
+from django_elasticsearch_dsl.search import Search
+
+from .models import Category
+
+
+class OrderingStrategyTestCase(TestCase):
+    def setUp(self):
+        Category.objects.bulk_create([
+            Category(title=str(i), slug=str(i)) for i in range(5)
+        ])
+        pks = list(Category.objects.values_list('pk', flat=True))
+        self.pks = [str(pk) for pk in reversed(pks)]
+        self.qs = Category.objects.filter(pk__in=self.pks)
+
+    def _assert_ordered(self, qs):
+        self.assertEqual([str(c.pk) for c in qs], self.pks)
+
+    def test_case_ordering(self):
+        self._assert_ordered(CaseOrdering().order(self.qs, self.pks))
+
+    def test_python_ordering(self):
+        qs = PythonOrdering().order(self.qs.order_by('pk'), self.pks)
+        self._assert_ordered(qs)
+        self._assert_ordered(qs.select_related())
+
+    def test_array_position_availability(self):
+        self.assertFalse(ArrayPositionOrdering().is_available(self.qs))
+
+    def test_get_ordering_strategy(self):
+        strategy = Mock(spec=CaseOrdering())
+        self.assertIs(
+            get_ordering_strategy(strategy, self.qs, self.pks), strategy
+        )
+        self.assertIs(
+            get_ordering_strategy('python', self.qs, self.pks),
+            ordering_strategies['python']
+        )
+        self.assertIs(
+            get_ordering_strategy(True, self.qs, self.pks),
+            ordering_strategies['case']
+        )
+        with self.settings(ELASTICSEARCH_DSL_CASE_ORDERING_MAX_HITS=2):
+            # The python ordering is only used when asked, as it can't be
+            # sliced
+            self.assertIs(
+                get_ordering_strategy(True, self.qs, self.pks),
+                ordering_strategies['case']
+            )
+            with patch.object(ArrayPositionOrdering, 'is_available',
+                              Mock(return_value=True)):
+                self.assertIs(
+                    get_ordering_strategy(True, self.qs, self.pks),
+                    ordering_strategies['array_position']
+                )
+
+    def test_to_queryset(self):
+        s = Search(model=Category)
+        response = Mock(_get_ids=Mock(return_value=self.pks))
+        with patch.object(Search, 'execute', Mock(return_value=response)):
+            self._assert_ordered(s.to_queryset(keep_order='python'))
@@ -0,0 +1,200 @@
+from django.test import TestCase
+from elasticsearch.exceptions import ConnectionError
+from mock import ANY, Mock, patch
+
+from django_elasticsearch_dsl import outbox
+from django_elasticsearch_dsl.documents import DocType
+from django_elasticsearch_dsl.models import OutboxEntry
+from django_elasticsearch_dsl.registries import DocumentRegistry
+from django_elasticsearch_dsl.signals import OutboxSignalProcessor
+
+from .models import Ad, Car
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.registry = DocumentRegistry()
+
+        class CarDoc(DocType):
+            class Meta:
+                model = Car
+                related_models = [Ad]
+
+            def get_instances_from_related(self, related_instance):
+                return related_instance.car
+
+        class IgnoredCarDoc(DocType):
+            class Meta:
+                model = Car
+                ignore_signals = True
+
+        CarDoc.update_by_pks = Mock(return_value=(1, []))
+        IgnoredCarDoc.update_by_pks = Mock()
+        self.registry.register(Mock(), CarDoc)
+        self.registry.register(Mock(), IgnoredCarDoc)
+        self.CarDoc = CarDoc
+        self.car_doc_path = outbox.get_document_path(CarDoc)
+
+        patcher = patch('django_elasticsearch_dsl.outbox.registry',
+                        self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue(self):
+        outbox.enqueue(Car(pk=12))
+        outbox.enqueue(Car(pk=12), action='delete')
+
+        self.assertEqual(
+            list(OutboxEntry.objects.values_list(
+                'document', 'object_id', 'action'
+            )),
+            [
+                (self.car_doc_path, '12', 'index'),
+                (self.car_doc_path, '12', 'delete'),
+            ]
+        )
+
+    def test_enqueue_related(self):
+        outbox.enqueue_related(Ad(pk=3, car=Car(pk=7)))
+
+        self.assertEqual(
+            list(OutboxEntry.objects.values_list(
+                'document', 'object_id', 'action'
+            )),
+            [(self.car_doc_path, '7', 'index')]
+        )
+
+    def test_enqueue_autosync_disabled(self):
+        with self.settings(ELASTICSEARCH_DSL_AUTOSYNC=False):
+            outbox.enqueue(Car(pk=12))
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_drain_collapses_entries(self):
+        for pk, action in [('1', 'index'), ('2', 'index'), ('1', 'delete'),
+                           ('2', 'index'), ('3', 'index')]:
+            OutboxEntry.objects.create(
+                document=self.car_doc_path, object_id=pk, action=action
+            )
+        OutboxEntry.objects.create(
+            document='unknown.Doc', object_id='4', action='index'
+        )
+
+        self.assertEqual(outbox.drain(), 6)
+        self.assertFalse(OutboxEntry.objects.exists())
+
+        self.CarDoc.update_by_pks.assert_any_call(
+            ['1'], action='delete', raise_on_error=False
+        )
+        self.CarDoc.update_by_pks.assert_any_call(
+            ANY, action='index', raise_on_error=False
+        )
+        self.assertEqual(self.CarDoc.update_by_pks.call_count, 2)
+        index_call = [
+            call for call in self.CarDoc.update_by_pks.call_args_list
+            if call[1]['action'] == 'index'
+        ][0]
+        self.assertEqual(sorted(index_call[0][0]), ['2', '3'])
+        self.assertEqual(outbox.drain(), 0)
+
+    def test_drain_batch_size(self):
+        for pk in range(3):
+            OutboxEntry.objects.create(
+                document=self.car_doc_path, object_id=pk, action='index'
+            )
+
+        self.assertEqual(outbox.drain(batch_size=2), 2)
+        self.assertEqual(OutboxEntry.objects.count(), 1)
+
+    def test_drain_keeps_entries_when_unreachable(self):
+        OutboxEntry.objects.create(
+            document=self.car_doc_path, object_id='1', action='index'
+        )
+        self.CarDoc.update_by_pks.side_effect = ConnectionError
+
+        with self.assertRaises(ConnectionError):
+            outbox.drain()
+        entry = OutboxEntry.objects.get()
+        self.assertEqual(entry.attempts, 0)
+
+    def test_drain_keeps_failed_entries(self):
+        for pk in ['1', '2', '3']:
+            OutboxEntry.objects.create(
+                document=self.car_doc_path, object_id=pk, action='index'
+            )
+        OutboxEntry.objects.create(
+            document=self.car_doc_path, object_id='4', action='delete'
+        )
+        self.CarDoc.update_by_pks.side_effect = [
+            (1, [
+                {'index': {'_id': '2', 'status': 400,
+                           'error': {'type': 'mapper_parsing_exception'}}},
+                {'index': {'_id': '3', 'status': 400,
+                           'error': {'type': 'mapper_parsing_exception'}}},
+            ]),
+            (0, [{'delete': {'_id': '4', 'status': 404}}]),
+        ]
+
+        self.assertEqual(outbox.drain(), 4)
+
+        self.assertEqual(
+            list(OutboxEntry.objects.values_list('object_id', 'attempts')),
+            [('2', 1), ('3', 1)]
+        )
+        self.assertIn('mapper_parsing_exception',
+                      OutboxEntry.objects.get(object_id='2').error)
+
+    def test_drain_isolates_failed_entries(self):
+        for pk in ['1', '2']:
+            OutboxEntry.objects.create(
+                document=self.car_doc_path, object_id=pk, action='index'
+            )
+
+        def update_by_pks(pks, **kwargs):
+            if '2' in pks:
+                raise ValueError('prepare failed')
+            return len(pks), []
+        self.CarDoc.update_by_pks.side_effect = update_by_pks
+
+        self.assertEqual(outbox.drain(), 2)
+
+        entry = OutboxEntry.objects.get()
+        self.assertEqual((entry.object_id, entry.attempts), ('2', 1))
+        self.assertIn('prepare failed', entry.error)
+
+    def test_drain_dead_letters(self):
+        OutboxEntry.objects.create(
+            document=self.car_doc_path, object_id='1', action='index'
+        )
+        OutboxEntry.objects.create(
+            document=self.car_doc_path, object_id='1', action='index'
+        )
+        self.CarDoc.update_by_pks.side_effect = ValueError
+
+        self.assertEqual(outbox.drain(max_attempts=2), 2)
+        self.assertEqual(outbox.drain(max_attempts=2), 1)
+        self.assertEqual(outbox.drain(max_attempts=2), 0)
+
+        self.assertEqual(
+            list(OutboxEntry.objects.values_list('attempts', flat=True)),
+            [2]
+        )
+
+
+class OutboxSignalProcessorTestCase(TestCase):
+    def setUp(self):
+        self.processor = OutboxSignalProcessor.__new__(OutboxSignalProcessor)
+
+    @patch('django_elasticsearch_dsl.signals.outbox')
+    def test_handle_save(self, mock_outbox):
+        car = Car(pk=1)
+        self.processor.handle_save(Car, car)
+        mock_outbox.enqueue.assert_called_once_with(car)
+        mock_outbox.enqueue_related.assert_called_once_with(car)
+
+    @patch('django_elasticsearch_dsl.signals.outbox')
+    def test_handle_delete(self, mock_outbox):
+        car = Car(pk=1)
+        self.processor.handle_pre_delete(Car, car)
+        self.processor.handle_delete(Car, car)
+        mock_outbox.enqueue_related.assert_called_once_with(car)
+        mock_outbox.enqueue.assert_called_once_with(car, action='delete')
@@ -0,0 +1,128 @@
+from unittest import TestCase
+
+from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger
+from elasticsearch_dsl.connections import connections
+from mock import Mock, patch
+
+from django_elasticsearch_dsl.paginator import ESCursorPaginator, ESPaginator
+from django_elasticsearch_dsl.search import Search
+
+
+class PaginatorTestCase(TestCase):
+    def setUp(self):
+        self.es = Mock()
+        patcher = patch.object(connections, 'get_connection',
+                               return_value=self.es)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _response(self, ids, total):
+        return {'hits': {'total': total, 'hits': [
+            {'_index': 'foo', '_type': 'doc', '_id': str(pk),
+             '_source': {}, 'sort': [pk * 10, str(pk)]}
+            for pk in ids
+        ]}}
+
+    def _body(self, call=-1):
+        return self.es.search.call_args_list[call][1]['body']
+
+
+class ESCursorPaginatorTestCase(PaginatorTestCase):
+    def test_first_page(self):
+        self.es.search.return_value = self._response([1, 2, 3], 10)
+        paginator = ESCursorPaginator(Search(index='foo').sort('-date'), 2)
+        page = paginator.page()
+
+        self.assertEqual(
+            self._body()['sort'], [{'date': {'order': 'desc'}}, {'_id': 'asc'}]
+        )
+        self.assertEqual(self._body()['size'], 3)
+        self.assertNotIn('search_after', self._body())
+        self.assertEqual([hit.meta.id for hit in page], ['1', '2'])
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.total, 10)
+        self.assertEqual(
+            paginator.decode_cursor(page.next_cursor), [20, '2']
+        )
+
+    def test_next_page(self):
+        self.es.search.return_value = self._response([3], 3)
+        paginator = ESCursorPaginator(Search(index='foo'), 2)
+        page = paginator.page(paginator.encode_cursor([20, '2']))
+
+        self.assertEqual(self._body()['search_after'], [20, '2'])
+        self.assertEqual(len(page), 1)
+        self.assertFalse(page.has_next())
+        self.assertIsNone(page.next_cursor)
+
+    def test_tiebreaker_already_sorted(self):
+        paginator = ESCursorPaginator(Search().sort('-_id'), 2)
+        self.assertEqual(paginator.search._sort, [{'_id': {'order': 'desc'}}])
+
+    def test_invalid_cursor(self):
+        paginator = ESCursorPaginator(Search(), 2)
+        for cursor in ('not a cursor', paginator.encode_cursor({'a': 1})):
+            with self.assertRaises(InvalidPage):
+                paginator.page(cursor)
+
+    def test_to_queryset(self):
+        self.es.search.return_value = self._response([2, 1], 2)
+        search = Search(index='foo')
+        page = ESCursorPaginator(search, 2).page()
+        with patch.object(Search, '_get_queryset') as get_queryset:
+            page.to_queryset()
+            get_queryset.assert_called_once_with(['2', '1'], True)
+
+
+class ESPaginatorTestCase(PaginatorTestCase):
+    def test_page(self):
+        self.es.search.return_value = self._response([3, 4], 5)
+        paginator = ESPaginator(Search(index='foo'), 2)
+        page = paginator.page(2)
+
+        self.assertEqual(self.es.search.call_count, 1)
+        self.assertEqual(self._body()['from'], 2)
+        self.assertEqual(self._body()['size'], 2)
+        self.assertEqual([hit.meta.id for hit in page], ['3', '4'])
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.start_index(), 3)
+        self.assertEqual(page.response.hits.total, 5)
+
+    def test_max_result_window(self):
+        self.es.search.return_value = self._response([5, 6], 100)
+        paginator = ESPaginator(Search(), 2, max_result_window=6)
+        page = paginator.page(3)
+
+        self.assertEqual(paginator.total, 100)
+        self.assertEqual(paginator.count, 6)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertFalse(page.has_next())
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+
+    def test_invalid_page(self):
+        self.es.search.return_value = self._response([], 2)
+        paginator = ESPaginator(Search(), 2)
+        with self.assertRaises(PageNotAnInteger):
+            paginator.page('a')
+        with self.assertRaises(EmptyPage):
+            paginator.page(0)
+        with self.assertRaises(EmptyPage):
+            paginator.page(2)
+
+    def test_orphans(self):
+        self.es.search.side_effect = [
+            self._response([3, 4], 5), self._response([5], 5)
+        ]
+        paginator = ESPaginator(Search(), 2, orphans=1)
+        page = paginator.page(2)
+
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertEqual([hit.meta.id for hit in page], ['3', '4', '5'])
+        self.assertEqual(self._body()['from'], 4)
+
+    def test_count_without_page(self):
+        self.es.count.return_value = {'count': 7}
+        self.assertEqual(ESPaginator(Search(), 2).num_pages, 4)
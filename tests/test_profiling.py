@@ -0,0 +1,95 @@
+from datetime import date
+
+import django
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from django_elasticsearch_dsl import DocType, fields
+from django_elasticsearch_dsl.profiling import (
+    Profiler, get_profiler, profile
+)
+
+from .models import Car, Manufacturer
+
+
+class ProfiledCarDocument(DocType):
+    manufacturer = fields.ObjectField(properties={
+        'name': fields.StringField(),
+        'country': fields.StringField(),
+    })
+
+    class Meta:
+        model = Car
+        index = 'profiled_car_index'
+        fields = ['name']
+        ignore_signals = True
+
+    def prepare_name(self, car):
+        return car.name.upper()
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        Manufacturer.objects.bulk_create([Manufacturer(
+            name="Peugeot", created=date(1900, 10, 9), country_code="FR"
+        )])
+        Car.objects.bulk_create([
+            Car(name=name, launched=date(2010, 9, 9),
+                manufacturer=Manufacturer.objects.get())
+            for name in ("508", "208")
+        ])
+
+    def test_not_profiling(self):
+        self.assertIsNone(get_profiler())
+        doc = ProfiledCarDocument()
+        self.assertEqual(
+            doc.prepare(Car.objects.first()),
+            {'name': '508', 'manufacturer': {
+                'name': 'Peugeot', 'country': 'France'
+            }}
+        )
+
+    def test_profile(self):
+        doc = ProfiledCarDocument()
+        with profile() as profiler:
+            self.assertIs(get_profiler(), profiler)
+            for car in Car.objects.order_by('pk'):
+                doc.prepare(car)
+        self.assertIsNone(get_profiler())
+
+        results = dict(
+            ((r['document'], r['field']), r)
+            for r in profiler.get_results()
+        )
+        self.assertEqual(sorted(results), [
+            ('ProfiledCarDocument', 'manufacturer'),
+            ('ProfiledCarDocument', 'manufacturer.country'),
+            ('ProfiledCarDocument', 'manufacturer.name'),
+            ('ProfiledCarDocument', 'name'),
+        ])
+        manufacturer = results['ProfiledCarDocument', 'manufacturer']
+        self.assertEqual(manufacturer['calls'], 2)
+        if django.VERSION >= (2, 0):
+            # One query per car, to fetch its manufacturer
+            self.assertEqual(manufacturer['queries'], 2)
+            self.assertEqual(results[
+                'ProfiledCarDocument', 'manufacturer.name'
+            ]['queries'], 0)
+        else:
+            self.assertIsNone(manufacturer['queries'])
+        self.assertGreaterEqual(
+            manufacturer['time'],
+            results['ProfiledCarDocument', 'manufacturer.name']['time']
+        )
+        self.assertEqual(
+            profiler.get_results()[0]['field'], 'manufacturer'
+        )
+
+    def test_queries_not_counted(self):
+        profiler = Profiler(count_queries=False)
+        profiler.call('CarDocument', 'name', lambda: None)
+        self.assertIsNone(profiler.get_results()[0]['queries'])
+
+        out = StringIO()
+        profiler.write_table(out)
+        self.assertTrue(out.getvalue().splitlines()[1].endswith(' ?'))
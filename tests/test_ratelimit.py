@@ -0,0 +1,145 @@
+from unittest import TestCase
+
+from django.core.exceptions import ImproperlyConfigured
+from elasticsearch.serializer import JSONSerializer
+from mock import Mock
+
+from django_elasticsearch_dsl.ratelimit import RateLimiter, TokenBucket
+from django_elasticsearch_dsl.registries import DocumentRegistry
+
+from .fixtures import Clock, WithFixturesMixin
+
+
+class TokenBucketTestCase(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.bucket = TokenBucket(10, 20, clock=self.clock)
+
+    def test_consume(self):
+        self.assertEqual(self.bucket.level, 20)
+        self.assertEqual(self.bucket.consume(15), 0)
+        self.assertEqual(self.bucket.level, 5)
+        self.assertEqual(self.bucket.consume(10), 0.5)
+        self.assertEqual(self.bucket.level, -5)
+
+        self.clock.now += 1
+        self.assertEqual(self.bucket.level, 5)
+        self.clock.now += 10
+        self.assertEqual(self.bucket.level, 20)
+
+    def test_request_bigger_than_capacity(self):
+        self.assertTrue(self.bucket.can_consume(100))
+        self.assertEqual(self.bucket.consume(100), 0)
+        self.assertFalse(self.bucket.can_consume(1))
+        self.assertEqual(self.bucket.consume(20), 10)
+
+
+class RateLimiterTestCase(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.doc = Mock()
+        self.doc._doc_type.index = 'cars'
+        self.doc.connection.transport.serializer.dumps.side_effect = (
+            lambda action: 'x' * 10
+        )
+        self.send = Mock()
+
+    def _limiter(self, **kwargs):
+        return RateLimiter(clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_block(self):
+        limiter = self._limiter(docs_per_second=2, bytes_per_second=100)
+        limiter.send(self.doc, [{}, {}], self.send, refresh=False)
+        self.assertEqual(self.clock.now, 1000)
+        limiter.send(self.doc, [{}], self.send)
+        self.assertEqual(self.clock.now, 1000.5)
+
+        self.send.assert_any_call(self.doc, [{}, {}], refresh=False)
+        self.assertEqual(self.send.call_count, 2)
+
+    def test_bytes_limit(self):
+        limiter = self._limiter(bytes_per_second=20)
+        limiter.send(self.doc, [{}, {}, {}, {}], self.send)
+        self.assertEqual(self.clock.now, 1000)
+        limiter.send(self.doc, [{}], self.send)
+        self.assertEqual(self.clock.now, 1001.5)
+
+    def test_index_limit(self):
+        limiter = self._limiter(
+            docs_per_second=100, indices={'cars': {'docs_per_second': 1}}
+        )
+        limiter.send(self.doc, [{}], self.send)
+        limiter.send(self.doc, [{}], self.send)
+        self.assertEqual(self.clock.now, 1001)
+
+        other_doc = Mock()
+        other_doc._doc_type.index = 'ads'
+        limiter.send(other_doc, [{}], self.send)
+        self.assertEqual(self.clock.now, 1001)
+
+        levels = limiter.get_levels()
+        self.assertEqual(levels['cars'], {'docs': 0})
+        self.assertEqual(levels[None], {'docs': 99})
+        self.assertEqual(levels['queued'], 0)
+
+    def test_queue(self):
+        limiter = self._limiter(docs_per_second=1, mode='queue')
+        limiter.send(self.doc, [{}], self.send)
+        self.assertEqual(self.send.call_count, 1)
+
+        limiter.send(self.doc, [{'_id': 2}], self.send)
+        limiter.join()
+        self.send.assert_called_with(self.doc, [{'_id': 2}])
+        self.assertEqual(self.clock.now, 1001)
+
+    def test_spill(self):
+        breaker = Mock(is_spilling=False)
+        limiter = self._limiter(
+            docs_per_second=1, mode='spill', circuit_breaker=breaker
+        )
+        limiter.send(self.doc, [{}], self.send)
+        limiter.send(self.doc, [{'_id': 2}], self.send)
+
+        self.assertEqual(self.send.call_count, 1)
+        breaker.spill.assert_called_once_with(self.doc, [{'_id': 2}])
+
+        # Spilled in order until the spool is replayed
+        breaker.is_spilling = True
+        self.clock.now += 1
+        limiter.send(self.doc, [{'_id': 3}], self.send)
+        breaker.spill.assert_called_with(self.doc, [{'_id': 3}])
+        self.assertEqual(limiter.get_levels()[None], {'docs': 1})
+
+        breaker.is_spilling = False
+        limiter.send(self.doc, [{'_id': 4}], self.send)
+        self.send.assert_called_with(self.doc, [{'_id': 4}])
+
+    def test_acquire(self):
+        limiter = self._limiter(docs_per_second=1, mode='spill',
+                                circuit_breaker=Mock())
+        limiter.acquire('cars', [{}, {}], JSONSerializer())
+        limiter.acquire('cars', [{}], JSONSerializer())
+        self.assertEqual(self.clock.now, 1002)
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RateLimiter(mode='drop')
+        with self.assertRaises(ImproperlyConfigured):
+            RateLimiter(mode='spill')
+
+
+class RegistryRateLimiterTestCase(WithFixturesMixin, TestCase):
+    def setUp(self):
+        self.registry = DocumentRegistry()
+        self.doc_a1 = self._generate_doc_mock(self.ModelA, Mock())
+        self.registry.rate_limiter = Mock()
+
+    def test_update_through_rate_limiter(self):
+        instance = self.ModelA(pk=3)
+        self.registry.update(instance)
+
+        self.assertFalse(self.doc_a1.update.called)
+        args, kwargs = self.registry.rate_limiter.send.call_args
+        self.assertIsInstance(args[0], self.doc_a1)
+        self.assertEqual([a['_id'] for a in args[1]], [3])
+        self.assertEqual(args[2], self.registry._send_actions)
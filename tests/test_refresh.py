@@ -0,0 +1,105 @@
+from unittest import TestCase
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six
+from elasticsearch.exceptions import ConnectionError
+from mock import Mock, call, patch
+
+from django_elasticsearch_dsl.refresh import (
+    CoalescedRefresher,
+    get_refresh_policy,
+)
+
+
+class GetRefreshPolicyTestCase(TestCase):
+    def test_policies(self):
+        self.assertIs(get_refresh_policy(True), True)
+        self.assertIs(get_refresh_policy('true'), True)
+        self.assertIs(get_refresh_policy(False), False)
+        self.assertIs(get_refresh_policy('false'), False)
+        self.assertEqual(get_refresh_policy('wait_for'), 'wait_for')
+        self.assertEqual(get_refresh_policy('coalesced'), 'coalesced')
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_refresh_policy('always')
+
+
+class CoalescedRefresherTestCase(TestCase):
+    def setUp(self):
+        self.refresher = CoalescedRefresher(interval=60)
+        self.connection = Mock()
+
+    def tearDown(self):
+        self.refresher.cancel()
+
+    def test_schedule_coalesces_refreshes(self):
+        with patch('threading.Timer') as timer:
+            self.refresher.schedule(self.connection, 'index_a')
+            self.refresher.schedule(self.connection, 'index_a')
+            self.refresher.schedule(self.connection, 'index_b')
+            timer.assert_called_once_with(60, self.refresher.flush)
+
+        self.refresher.flush()
+        self.assertEqual(self.connection.indices.refresh.call_count, 2)
+        self.connection.indices.refresh.assert_any_call(
+            index='index_a', ignore=404
+        )
+        self.connection.indices.refresh.assert_any_call(
+            index='index_b', ignore=404
+        )
+
+    def test_flush_invalidates_search_cache_after_refresh(self):
+        with patch('django_elasticsearch_dsl.refresh.registry') as reg:
+            manager = Mock()
+            manager.attach_mock(self.connection.indices.refresh, 'refresh')
+            manager.attach_mock(reg.search_cache.invalidate, 'invalidate')
+
+            self.refresher.schedule(self.connection, 'index_a')
+            self.refresher.schedule(self.connection, 'index_b',
+                                    refresh=False)
+            self.refresher.schedule(self.connection, 'index_b')
+            self.refresher.schedule(self.connection, 'index_c',
+                                    refresh=False)
+            self.refresher.flush()
+
+        six.assertCountEqual(self, manager.mock_calls, [
+            call.refresh(index='index_a', ignore=404),
+            call.invalidate('index_a'),
+            call.refresh(index='index_b', ignore=404),
+            call.invalidate('index_b'),
+            call.invalidate('index_c'),
+        ])
+        self.assertLess(
+            manager.mock_calls.index(
+                call.refresh(index='index_a', ignore=404)
+            ),
+            manager.mock_calls.index(call.invalidate('index_a'))
+        )
+
+    def test_flush_failure(self):
+        self.connection.indices.refresh.side_effect = [
+            ConnectionError('N/A', 'unreachable', None), None
+        ]
+        self.refresher.schedule(self.connection, 'index_a')
+        self.refresher.schedule(self.connection, 'index_b')
+        with patch('django_elasticsearch_dsl.refresh.logger') as logger:
+            self.refresher.flush()
+
+        self.assertEqual(self.connection.indices.refresh.call_count, 2)
+        logger.exception.assert_called_once()
+
+    def test_flush_without_pending_writes(self):
+        self.refresher.flush()
+        self.connection.indices.refresh.assert_not_called()
+
+    def test_cancel(self):
+        self.refresher.schedule(self.connection, 'index_a')
+        self.refresher.cancel()
+        self.refresher.flush()
+        self.connection.indices.refresh.assert_not_called()
+
+    def test_interval_from_settings(self):
+        with patch('django_elasticsearch_dsl.refresh.DEDConfig') as config:
+            config.refresh_interval.return_value = 5
+            self.assertEqual(CoalescedRefresher().interval, 5)
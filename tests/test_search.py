@@ -0,0 +1,304 @@
+from django.test import TestCase
+from elasticsearch.exceptions import TransportError
+from elasticsearch_dsl import Search as DSLSearch
+from elasticsearch_dsl.connections import connections
+from mock import Mock, patch
+
+from django_elasticsearch_dsl import DocType, fields
+from django_elasticsearch_dsl.exceptions import ReadOnlyInstanceError
+from django_elasticsearch_dsl.search import (
+    MultiSearch,
+    RawHit,
+    RawResponse,
+    Search,
+)
+
+from .models import Car, Category, Manufacturer
+
+
+class CategoryDocument(DocType):
+    name = fields.TextField(attr='title')
+
+    class Meta:
+        model = Category
+        fields = ['slug', 'icon']
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        Category.objects.bulk_create([
+            Category(title=str(i), slug=str(i)) for i in range(5)
+        ])
+        self.pks = [
+            str(pk) for pk in Category.objects.values_list('pk', flat=True)
+        ]
+        self.search = Search(model=Category)
+
+    def _hits(self, pks):
+        return [{'_id': pk} for pk in pks]
+
+    def test_iterate_models(self):
+        pks = self.pks[::-1] + ['999']
+        with patch.object(Search, 'scan', autospec=True) as scan:
+            scan.return_value = iter(self._hits(pks))
+            with self.assertNumQueries(3):
+                instances = list(self.search.iterate_models(batch_size=2))
+
+            s = scan.call_args[0][0]
+            self.assertEqual(s.to_dict()['_source'], {'excludes': ['*']})
+            self.assertEqual(
+                s._params, {'size': 2, 'preserve_order': False}
+            )
+            self.assertEqual(s._raw, 'dict')
+
+        self.assertEqual([str(c.pk) for c in instances], self.pks[::-1])
+
+    def test_iterate_models_without_hits(self):
+        with patch.object(Search, 'scan', Mock(return_value=iter([]))):
+            with self.assertNumQueries(0):
+                self.assertEqual(list(self.search.iterate_models()), [])
+
+    def _response(self, hits):
+        return Mock(hits=hits)
+
+    def test_to_models(self):
+        search = Search(model=Category)
+        with patch.object(Search, 'to_queryset') as to_queryset:
+            to_queryset.return_value = iter(['category'])
+            self.assertEqual(search.to_models(), ['category'])
+            to_queryset.assert_called_once_with(keep_order=True)
+
+    def test_to_models_from_source(self):
+        search = Search(model=Category, doc_type=[CategoryDocument])
+        hits = [
+            {'_id': self.pks[1], '_source': {'name': 'b', 'slug': 'b-slug'}},
+            {'_id': self.pks[0], '_source': {'name': 'a'}},
+        ]
+        with patch.object(Search, 'execute', autospec=True) as execute:
+            execute.return_value = self._response(hits)
+            with self.assertNumQueries(0):
+                instances = search.to_models(from_source=True)
+
+            s = execute.call_args[0][0]
+            self.assertEqual(s.to_dict()['_source'], ['name', 'slug'])
+            self.assertEqual(s._raw, 'dict')
+
+        self.assertEqual(
+            [(c.pk, c.title) for c in instances],
+            [(int(self.pks[1]), 'b'), (int(self.pks[0]), 'a')]
+        )
+        self.assertEqual(instances[0].slug, 'b-slug')
+
+        # The fields missing from the _source are loaded from the db
+        with self.assertNumQueries(1):
+            self.assertEqual(instances[1].slug, '0')
+
+        with self.assertRaises(ReadOnlyInstanceError):
+            instances[0].save()
+        with self.assertRaises(ReadOnlyInstanceError):
+            instances[0].delete()
+
+    def test_to_models_from_source_without_document(self):
+        with self.assertRaises(ValueError):
+            self.search.to_models(from_source=True)
+
+
+class CarDocument(DocType):
+    class Meta:
+        model = Car
+        fields = ['name']
+
+    def get_queryset(self):
+        return super(CarDocument, self).get_queryset().select_related(
+            'manufacturer'
+        )
+
+
+class ToQuerysetTestCase(TestCase):
+    def setUp(self):
+        Manufacturer.objects.bulk_create([
+            Manufacturer(name='Peugeot', created='1900-01-01')
+        ])
+        manufacturer = Manufacturer.objects.get()
+        Car.objects.bulk_create([
+            Car(name=str(i), launched='2000-01-01', manufacturer=manufacturer)
+            for i in range(3)
+        ])
+        self.pks = [str(pk) for pk in Car.objects.values_list('pk', flat=True)]
+
+        response = Mock(_get_ids=Mock(return_value=self.pks))
+        patcher = patch.object(Search, 'execute', return_value=response)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _evaluate(self, qs):
+        return [(car.name, car.manufacturer.name) for car in qs]
+
+    def test_document_queryset(self):
+        s = Search(model=Car, doc_type=[CarDocument])
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self._evaluate(s.to_queryset())), 3)
+
+    def test_default_manager_without_document(self):
+        s = Search(model=Car)
+        with self.assertNumQueries(4):
+            self._evaluate(s.to_queryset())
+
+    def test_options(self):
+        s = Search(model=Car)
+        with self.assertNumQueries(1):
+            qs = s.to_queryset(select_related=['manufacturer'],
+                               only=['name', 'manufacturer__name'])
+            self._evaluate(qs)
+        self.assertEqual(
+            qs[0].get_deferred_fields(), {'launched', 'type'}
+        )
+        with self.assertNumQueries(2):
+            self._evaluate(s.to_queryset(prefetch_related=['manufacturer']))
+        self.assertIs(
+            s.to_queryset(select_related=True).query.select_related, True
+        )
+
+    def test_queryset(self):
+        s = Search(model=Car, doc_type=[CarDocument])
+        qs = s.to_queryset(queryset=Car.objects.filter(name='1'))
+        self.assertEqual([car.name for car in qs], ['1'])
+
+    def test_iterate_models(self):
+        s = Search(model=Car, doc_type=[CarDocument])
+        hits = iter([{'_id': pk} for pk in self.pks])
+        with patch.object(Search, 'scan', return_value=hits):
+            with self.assertNumQueries(1):
+                instances = list(s.iterate_models(
+                    only=['name', 'manufacturer__name']
+                ))
+                self.assertEqual(len(self._evaluate(instances)), 3)
+        self.assertIn('launched', instances[0].get_deferred_fields())
+
+
+class RawSearchTestCase(TestCase):
+    def setUp(self):
+        self.hits = [
+            {'_index': 'foo', '_type': 'doc', '_id': '2', '_score': 2.0,
+             '_source': {'a': 1}},
+            {'_index': 'foo', '_type': 'doc', '_id': '1', '_score': 1.0,
+             '_source': {'a': 2}},
+        ]
+        self.es = Mock()
+        self.es.search.return_value = {
+            'hits': {'total': 2, 'hits': self.hits},
+            'aggregations': {'a': {'value': 3}},
+        }
+        patcher = patch.object(connections, 'get_connection',
+                               return_value=self.es)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_execute_without_cache_nor_single_flight(self):
+        s = Search(index='foo')
+        with patch.object(DSLSearch, 'execute', autospec=True,
+                          side_effect=DSLSearch.execute) as execute:
+            response = s.execute()
+            self.assertIs(s.execute(), response)
+
+        execute.assert_called_once_with(s, ignore_cache=True)
+        self.assertEqual(response.hits.total, 2)
+
+    def test_execute(self):
+        response = Search(index='foo').raw().execute()
+
+        self.assertIsInstance(response, RawResponse)
+        self.assertEqual(response.total, 2)
+        self.assertEqual(response.aggregations, {'a': {'value': 3}})
+        hit = response[0]
+        self.assertIsInstance(hit, RawHit)
+        self.assertEqual(
+            (hit._id, hit._score, hit._source), ('2', 2.0, {'a': 1})
+        )
+        self.assertFalse(hasattr(hit, '__dict__'))
+        self.assertEqual(hit.to_dict(), self.hits[0])
+
+    def test_execute_as_dict(self):
+        response = Search(index='foo').raw(as_dict=True).execute()
+        self.assertEqual(list(response), self.hits)
+
+    def test_raw_is_cloned(self):
+        s = Search(index='foo').raw()
+        self.assertIsInstance(s.filter('term', a=1).execute(), RawResponse)
+        self.assertNotIsInstance(Search(index='foo').execute(), RawResponse)
+
+    def test_to_queryset(self):
+        s = Search(index='foo', model=Category)
+        with patch.object(Search, '_get_queryset') as get_queryset:
+            s.to_queryset()
+            self.assertEqual(get_queryset.call_args[0], (['2', '1'], True))
+
+            s = s.raw()
+            s.execute()
+            s.to_queryset()
+            self.assertEqual(get_queryset.call_args[0], (['2', '1'], True))
+
+        body = self.es.search.call_args_list[0][1]['body']
+        self.assertEqual(body['_source'], {'excludes': ['*']})
+
+    def test_scan(self):
+        with patch('django_elasticsearch_dsl.search.scan') as scan:
+            scan.return_value = iter(self.hits)
+            hits = list(Search(index='foo').raw().params(size=5).scan())
+
+        self.assertEqual([hit._id for hit in hits], ['2', '1'])
+        scan.assert_called_once_with(
+            self.es, query=Search().to_dict(), index=['foo'], doc_type=[],
+            size=5
+        )
+
+    def test_count_after_execute(self):
+        s = Search(index='foo').raw()
+        response = s.execute()
+        self.assertEqual(response.hits.total, 2)
+        self.assertEqual(s.count(), 2)
+        self.assertFalse(self.es.count.called)
+
+
+class MultiSearchTestCase(TestCase):
+    def setUp(self):
+        self.es = Mock()
+        self.es.msearch.return_value = {'responses': [
+            {'hits': {'total': 2, 'hits': [
+                {'_index': 'foo', '_type': 'doc', '_id': '2', '_source': {}},
+                {'_index': 'foo', '_type': 'doc', '_id': '1', '_source': {}},
+            ]}},
+            {'error': {'type': 'index_not_found_exception'}},
+        ]}
+        patcher = patch.object(connections, 'get_connection',
+                               return_value=self.es)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.s1 = Search(index='foo', model=Category).filter('term', a=1)
+        self.s2 = Search(index='bar')
+        self.ms = MultiSearch().add(self.s1).add(self.s2)
+
+    def test_execute(self):
+        r1, r2 = self.ms.execute(raise_on_error=False)
+
+        self.assertEqual(self.es.msearch.call_count, 1)
+        body = self.es.msearch.call_args[1]['body']
+        self.assertEqual(body[0], {'index': ['foo']})
+        self.assertEqual(body[2], {'index': ['bar']})
+        self.assertEqual(r1.hits.total, 2)
+        self.assertIsNone(r2)
+        self.assertIs(self.s1.execute(), r1)
+        self.assertEqual(self.es.search.call_count, 0)
+
+    def test_to_queryset(self):
+        r1, r2 = self.ms.execute(raise_on_error=False)
+        with patch.object(Search, '_get_queryset') as get_queryset:
+            r1.to_queryset()
+            get_queryset.assert_called_with(['2', '1'], True)
+            self.s1.to_queryset(keep_order=False)
+            self.assertEqual(get_queryset.call_args[0], (['2', '1'], False))
+
+    def test_raise_on_error(self):
+        with self.assertRaises(TransportError):
+            self.ms.execute()
@@ -0,0 +1,120 @@
+import sys
+import threading
+import time
+from unittest import TestCase, skipIf
+
+from elasticsearch_dsl.connections import connections
+from mock import Mock, patch
+
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.search import Search
+from django_elasticsearch_dsl.singleflight import SingleFlight
+
+
+class SingleFlightTestCase(TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.calls = []
+
+    def _fn(self, result='result'):
+        def fn():
+            self.calls.append(result)
+            self.release.wait(5)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return fn
+
+    def _start(self, count, fn, **kwargs):
+        results = []
+
+        def run():
+            try:
+                results.append(self.single_flight.do('key', fn, **kwargs))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=run) for i in range(count)]
+        threads[0].start()
+        while 'key' not in self.single_flight.in_flight():
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while self.single_flight.in_flight()['key'] < count - 1:
+            time.sleep(0.001)
+        return threads, results
+
+    def _join(self, threads):
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+    def test_shared_result(self):
+        threads, results = self._start(5, self._fn())
+        self._join(threads)
+
+        self.assertEqual(self.calls, ['result'])
+        self.assertEqual(results, ['result'] * 5)
+        self.assertEqual(self.single_flight.in_flight(), {})
+
+    def test_shared_exception(self):
+        error = ValueError()
+        threads, results = self._start(3, self._fn(error))
+        self._join(threads)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [error] * 3)
+
+    def test_max_wait(self):
+        threads, results = self._start(1, self._fn('leader'))
+        result = self.single_flight.do('key', lambda: 'own', max_wait=0.01)
+        self._join(threads)
+
+        self.assertEqual(result, 'own')
+        self.assertEqual(results, ['leader'])
+
+    def test_sequential_calls_not_shared(self):
+        self.release.set()
+        self.single_flight.do('key', self._fn('a'))
+        self.single_flight.do('key', self._fn('b'))
+        self.assertEqual(self.calls, ['a', 'b'])
+
+    @skipIf(sys.version_info < (3, 4), 'asyncio requires python 3.4')
+    def test_do_async(self):
+        import asyncio
+
+        self.release.set()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        future = self.single_flight.do_async('key', self._fn(), loop=loop)
+        self.assertEqual(loop.run_until_complete(future), 'result')
+
+
+class SearchSingleFlightTestCase(TestCase):
+    def setUp(self):
+        self.single_flight = Mock(
+            do=Mock(side_effect=lambda key, fn: fn())
+        )
+        patcher = patch.object(registry, 'single_flight', self.single_flight)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.es = Mock()
+        self.es.search.return_value = {'hits': {'total': 1, 'hits': []}}
+        patcher = patch.object(connections, 'get_connection',
+                               return_value=self.es)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_execute_through_single_flight(self):
+        self.assertEqual(
+            Search(index='foo').filter('term', a=1).execute().hits.total, 1
+        )
+        Search(index='foo').filter('term', a=1).execute()
+        Search(index='foo').filter('term', a=2).execute()
+
+        keys = [c[0][0] for c in self.single_flight.do.call_args_list]
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+        self.assertEqual(self.es.search.call_count, 3)
@@ -0,0 +1,155 @@
+from mock import patch
+from unittest import TestCase
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.six import StringIO
+from elasticsearch_dsl.connections import connections
+
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.search import Search
+from django_elasticsearch_dsl.slowlog import (
+    SlowLog, get_fingerprint, normalize
+)
+from django_elasticsearch_dsl.test import FakeConnections
+
+
+class NormalizeTestCase(TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize({
+            'query': {'bool': {'filter': [
+                {'term': {'color': 'blue'}},
+                {'terms': {'pk': [1, 2, 3]}},
+                {'range': {'price': {'gte': 10, 'format': 'epoch_millis'}}},
+                {'exists': {'field': 'ads'}},
+            ]}},
+            'sort': [{'name': {'order': 'asc'}}],
+            '_source': ['name'],
+            'size': 10,
+        }), {
+            'query': {'bool': {'filter': [
+                {'term': {'color': '?'}},
+                {'terms': {'pk': '?'}},
+                {'range': {'price': {'gte': '?', 'format': 'epoch_millis'}}},
+                {'exists': {'field': 'ads'}},
+            ]}},
+            'sort': [{'name': {'order': 'asc'}}],
+            '_source': ['name'],
+            'size': '?',
+        })
+
+    def test_fingerprint(self):
+        def fingerprint(search):
+            return get_fingerprint(search.to_dict())[0]
+
+        search = Search().filter('terms', pk=[1, 2]).query(
+            'match', name='car'
+        )
+        self.assertEqual(
+            fingerprint(search),
+            fingerprint(Search().filter('terms', pk=[3]).query(
+                'match', name='bus'
+            ))
+        )
+        self.assertNotEqual(
+            fingerprint(search),
+            fingerprint(Search().filter('terms', pk=[1, 2]).query(
+                'match', color='car'
+            ))
+        )
+
+
+class SlowLogTestCase(TestCase):
+    def setUp(self):
+        self.slow_log = SlowLog(threshold=0.5, buckets=[0.1, 1],
+                                max_fingerprints=2)
+        patcher = patch('django_elasticsearch_dsl.slowlog.logger')
+        self.logger = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_record(self):
+        for name, elapsed in (('a', 0.05), ('b', 0.7), ('c', 0.2)):
+            self.slow_log.record(
+                Search(index='cars').query('match', name=name), elapsed
+            )
+        self.slow_log.record(Search().query('term', color='blue'), 0.3)
+
+        stats = self.slow_log.get_stats()
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(stats[0]['index'], 'cars')
+        self.assertEqual(stats[0]['count'], 3)
+        self.assertAlmostEqual(stats[0]['total'], 0.95)
+        self.assertAlmostEqual(stats[0]['mean'], 0.95 / 3)
+        self.assertEqual(stats[0]['max'], 0.7)
+        self.assertEqual(stats[0]['buckets'], [1, 3])
+        self.assertEqual(stats[0]['p99'], 1)
+        self.assertEqual(
+            stats[0]['query'], '{"query":{"match":{"name":"?"}}}'
+        )
+        self.assertEqual(stats[1]['index'], '_all')
+        self.assertEqual(self.slow_log.get_stats(limit=1), stats[:1])
+
+        self.logger.warning.assert_called_once_with(
+            "Slow search (%.3fs) on %s, fingerprint %s: %s", 0.7, 'cars',
+            stats[0]['fingerprint'], '{"query": {"match": {"name": "b"}}}'
+        )
+
+    def test_max_fingerprints(self):
+        for name in ('a', 'b', 'c'):
+            self.slow_log.record(Search().query('term', **{name: 1}), 0.6)
+
+        self.assertEqual(len(self.slow_log.get_stats()), 2)
+        self.assertEqual(self.logger.warning.call_count, 3)
+
+    def test_reset(self):
+        search = Search().query('match', name='car')
+        self.slow_log.record(search, 0.1)
+        self.slow_log.reset()
+        self.assertEqual(self.slow_log.get_stats(), [])
+
+        self.slow_log.record(search, 0.1)
+        self.assertEqual(self.slow_log.get_stats()[0]['count'], 1)
+
+
+class SlowLogSearchTestCase(TestCase):
+    def setUp(self):
+        patcher = FakeConnections()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        registry.slow_log = SlowLog()
+        self.addCleanup(setattr, registry, 'slow_log', None)
+
+    def test_execute(self):
+        connections.get_connection().indices.create('cars')
+        Search(index='cars').query('match', name='car').execute()
+        Search(index='cars').query('match', name='bus').execute()
+
+        stats, = registry.slow_log.get_stats()
+        self.assertEqual(stats['count'], 2)
+
+    def test_command(self):
+        registry.slow_log.record(Search(index='cars').query(
+            'match', name='car'
+        ), 0.2)
+        out = StringIO()
+        call_command('search_slowlog', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split()[:3], ['Fingerprint', 'Index',
+                                                'Count'])
+        fingerprint = registry.slow_log.get_stats()[0]['fingerprint']
+        self.assertEqual(
+            lines[1].split(),
+            [fingerprint, 'cars', '1', '0.200', '0.200', '0.250', '0.200']
+        )
+        self.assertEqual(lines[-1], '{}: {}'.format(
+            fingerprint, '{"query":{"match":{"name":"?"}}}'
+        ))
+
+        call_command('search_slowlog', reset=True, stdout=out)
+        self.assertEqual(registry.slow_log.get_stats(), [])
+
+    def test_command_disabled(self):
+        registry.slow_log = None
+        with self.assertRaises(CommandError):
+            call_command('search_slowlog')
@@ -0,0 +1,115 @@
+from datetime import date
+from unittest import TestCase
+
+from django.test import TestCase as DjangoTestCase
+from django.test.runner import DiscoverRunner
+from elasticsearch_dsl.connections import connections
+from mock import patch
+
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.test import (
+    ESTestCase,
+    ESTestRunner,
+    FakeConnections,
+)
+from django_elasticsearch_dsl.test.testcases import (
+    _delete_session_indices,
+    _session_indices,
+)
+
+from .documents import CarDocument
+from .models import Car
+
+
+class FakeClusterMixin(object):
+    @classmethod
+    def setUpClass(cls):
+        cls._patcher = FakeConnections()
+        cls.cluster = cls._patcher.start()
+        super(FakeClusterMixin, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(FakeClusterMixin, cls).tearDownClass()
+        cls._patcher.stop()
+
+    def index_car(self):
+        self.assertEqual(CarDocument.search().count(), 0)
+        Car.objects.create(name="508", launched=date(2010, 9, 9))
+        self.assertEqual(CarDocument.search().count(), 1)
+        self.assertEqual(
+            self.cluster.count('create_index'), len(registry.get_indices())
+        )
+
+
+class ClassScopeTestCase(FakeClusterMixin, ESTestCase, DjangoTestCase):
+    index_scope = 'class'
+
+    @classmethod
+    def tearDownClass(cls):
+        super(ClassScopeTestCase, cls).tearDownClass()
+        assert not cls.cluster.indices
+        assert not CarDocument._doc_type.index.endswith('_ded_test')
+
+    def test_indices_renamed(self):
+        self.assertEqual(CarDocument._doc_type.index, 'test_cars_ded_test')
+        self.assertEqual(
+            sorted(self.cluster.indices),
+            sorted(index._name for index in registry.get_indices())
+        )
+
+    def test_index_once(self):
+        self.index_car()
+
+    def test_index_twice(self):
+        self.index_car()
+
+
+class SessionScopeTestCase(FakeClusterMixin, ESTestCase, DjangoTestCase):
+    index_scope = 'session'
+
+    @classmethod
+    def tearDownClass(cls):
+        super(SessionScopeTestCase, cls).tearDownClass()
+        assert cls.cluster.indices
+        with FakeConnections(cls.cluster):
+            _delete_session_indices()
+        assert not cls.cluster.indices
+
+    def test_session_indices(self):
+        self.assertEqual(
+            set(_session_indices),
+            set(index._name for index in registry.get_indices())
+        )
+
+    def test_index_once(self):
+        self.index_car()
+
+    def test_index_twice(self):
+        self.index_car()
+
+
+class IndexSuffixTestCase(TestCase):
+    def test_suffix(self):
+        self.assertEqual(ESTestCase.get_index_suffix(), '_ded_test')
+
+    @patch('django.test.runner._worker_id', 3, create=True)
+    def test_parallel_worker_suffix(self):
+        self.assertEqual(ESTestCase.get_index_suffix(), '_ded_test_3')
+
+
+class ESTestRunnerTestCase(TestCase):
+    @patch.object(DiscoverRunner, 'teardown_test_environment')
+    def test_delete_worker_session_indices(self, teardown):
+        with FakeConnections() as cluster:
+            es = connections.get_connection()
+            for name in ('test_cars', 'test_cars_ded_test_1',
+                         'test_cars_ded_test_2', 'test_cars_ded_test_3'):
+                es.indices.create(index=name)
+
+            ESTestRunner(parallel=2).teardown_test_environment()
+
+        teardown.assert_called_once_with()
+        self.assertEqual(
+            sorted(cluster.indices), ['test_cars', 'test_cars_ded_test_3']
+        )
@@ -0,0 +1,112 @@
+from datetime import date
+from unittest import TestCase
+
+from django.test import TestCase as DjangoTestCase
+
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.test import FakeConnections
+from django_elasticsearch_dsl.tracing import RecordingTracer, Span, span
+
+from .documents import CarDocument
+from .models import Car
+
+
+class SpanTestCase(TestCase):
+    def test_without_tracer(self):
+        with span('ded.test', a=1) as test_span:
+            test_span.set_attribute('b', 2)
+        self.assertIsNone(registry.tracer)
+        self.assertEqual(test_span.attributes, {'a': 1, 'b': 2})
+
+    def test_nesting_and_errors(self):
+        tracer = RecordingTracer()
+        with Span(tracer, 'parent', {}):
+            with self.assertRaises(ValueError):
+                with Span(tracer, 'child', {'a': 1}) as child:
+                    child.set_attribute('b', 2)
+                    raise ValueError
+
+        child, parent = tracer.spans
+        self.assertEqual(child.name, 'child')
+        self.assertIs(child.parent, parent)
+        self.assertIsNone(parent.parent)
+        self.assertEqual(child.attributes, {'a': 1, 'b': 2})
+        self.assertIsInstance(child.error, ValueError)
+        self.assertIsNone(parent.error)
+        self.assertGreaterEqual(parent.duration, child.duration)
+
+
+class TracingTestCase(DjangoTestCase):
+    def setUp(self):
+        patcher = FakeConnections()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tracer = registry.tracer = RecordingTracer()
+        self.addCleanup(setattr, registry, 'tracer', None)
+
+    def get_spans(self, name):
+        return [s for s in self.tracer.spans if s.name == name]
+
+    def test_indexing(self):
+        car = Car.objects.create(name="508", launched=date(2010, 9, 9))
+
+        signal_span, = self.get_spans('ded.signal')
+        self.assertEqual(signal_span.attributes, {
+            'signal': 'post_save', 'model': 'tests.Car'
+        })
+        update_span, = self.get_spans('ded.registry.update')
+        self.assertIs(update_span.parent, signal_span)
+        self.assertEqual(update_span.attributes['action'], 'index')
+
+        bulk_span = next(
+            s for s in self.get_spans('ded.bulk')
+            if s.attributes['document'] == 'CarDocument'
+        )
+        self.assertIs(bulk_span.parent, update_span)
+        self.assertEqual(bulk_span.attributes, {
+            'document': 'CarDocument',
+            'index': str(CarDocument._doc_type.index),
+            'success': 1,
+            'errors': 0,
+        })
+        children = [s for s in self.tracer.spans if s.parent is bulk_span]
+        self.assertEqual(
+            [s.name for s in children], ['ded.prepare', 'ded.bulk.request']
+        )
+        self.assertEqual(children[0].attributes, {
+            'document': 'CarDocument', 'pk': car.pk
+        })
+        self.assertGreater(children[1].attributes['bytes'], 0)
+        self.assertEqual(
+            update_span.attributes['documents'],
+            len(self.get_spans('ded.bulk'))
+        )
+
+    def test_bulk_errors(self):
+        CarDocument().update(
+            [Car(pk=1), Car(pk=2)], action='delete', raise_on_error=False
+        )
+        bulk_span, = self.get_spans('ded.bulk')
+        self.assertEqual(bulk_span.attributes['success'], 0)
+        self.assertEqual(bulk_span.attributes['errors'], 2)
+        self.assertEqual(self.get_spans('ded.prepare'), [])
+
+    def test_search(self):
+        car = Car(pk=1, name="508", launched=date(2010, 9, 9))
+        CarDocument().update(car, refresh=True)
+        Car.objects.bulk_create([car])
+        del self.tracer.spans[:]
+
+        qs = CarDocument.search().to_queryset()
+
+        self.assertEqual(list(qs), [car])
+        execute_span, queryset_span = self.tracer.spans
+        self.assertEqual(execute_span.name, 'ded.search.execute')
+        self.assertIs(execute_span.parent, queryset_span)
+        self.assertEqual(execute_span.attributes['index'],
+                         str(CarDocument._doc_type.index))
+        self.assertEqual(execute_span.attributes['hits'], 1)
+        self.assertFalse(execute_span.attributes['cached'])
+        self.assertEqual(queryset_span.attributes, {
+            'model': 'tests.Car', 'pk_count': 1
+        })